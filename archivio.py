@@ -0,0 +1,262 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy.orm import Session
+import config
+from database import DATABASE_PATH, crea_engine, engine
+from models import Lavoro, Timbratura
+from versioni import chiavi_intervallo, incrementa_versione
+
+# 🔹 Archivio degli anni chiusi: timbrature e lavoro di un anno vengono spostati in un file
+# SQLite separato (archivio_<anno>.db) e il database principale resta piccolo.
+# Le letture storiche (attività, esportazioni, PDF...) usano sessione_storica(), che collega
+# con ATTACH solo gli archivi degli anni richiesti e vi sovrappone viste temporanee
+# "timbrature" e "lavoro" (main UNION ALL archivi): le query esistenti non cambiano.
+# I riepiloghi mensili restano nel database principale; le righe archiviate non producono
+# tombstone nel registro modifiche. Gli anni archiviati sono chiusi: le scritture con una data
+# o un id di quegli anni vengono rifiutate (AnnoArchiviato, 409 negli endpoint).
+
+TABELLE = (Timbratura, Lavoro)
+
+# Archivi collegabili con ATTACH a una connessione (SQLITE_LIMIT_ATTACHED, 10 nelle build standard)
+_memoria = sqlite3.connect(":memory:")
+MAX_ARCHIVI = _memoria.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(_memoria, "getlimit") else 10
+_memoria.close()
+
+CARTELLA = config.ARCHIVIO_DIR or os.path.dirname(os.path.abspath(DATABASE_PATH))
+NOME_FILE = re.compile(r"archivio_(\d{4})\.db")
+
+_anni = (None, [])
+_anni_lock = threading.Lock()
+
+
+class AnnoArchiviato(ValueError):
+    """ Scrittura su una data o una riga di un anno già archiviato """
+
+
+class TroppiArchivi(ValueError):
+    """ Lettura storica su più anni archiviati di quanti SQLite ne possa collegare insieme """
+
+
+def percorso_archivio(anno: int) -> str:
+    return os.path.join(CARTELLA, f"archivio_{anno}.db")
+
+
+def anni_archiviati():
+    """ Anni con un file di archivio, riletti solo quando cambia il contenuto della cartella """
+    global _anni
+    try:
+        modificata = os.stat(CARTELLA).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _anni_lock:
+        if _anni[0] != modificata:
+            trovati = (NOME_FILE.fullmatch(nome) for nome in os.listdir(CARTELLA))
+            _anni = (modificata, sorted(int(m.group(1)) for m in trovati if m))
+        return _anni[1]
+
+
+def verifica_anno_aperto(giorno: date):
+    """ Solleva AnnoArchiviato se giorno appartiene a un anno archiviato """
+    if giorno.year in anni_archiviati():
+        raise AnnoArchiviato(f"L'anno {giorno.year} è archiviato: timbrature e lavori non sono modificabili.")
+
+
+def periodi_storici(data_da: date, data_a: date):
+    """
+    Suddivide [data_da, data_a] in periodi consecutivi con al più MAX_ARCHIVI anni archiviati
+    ciascuno, da leggere uno alla volta con sessione_storica()
+    """
+    anni = [anno for anno in anni_archiviati() if data_da.year <= anno <= data_a.year]
+    periodi = []
+    inizio = data_da
+    for i in range(MAX_ARCHIVI, len(anni), MAX_ARCHIVI):
+        periodi.append((inizio, date(anni[i - 1], 12, 31)))
+        inizio = date(anni[i - 1] + 1, 1, 1)
+    periodi.append((inizio, data_a))
+    return periodi
+
+
+def verifica_non_archiviata(db: Session, modello, id_riga: int):
+    """ Per una riga assente dal database principale: AnnoArchiviato se è stata spostata in un archivio """
+    anni = anni_archiviati()
+    if not anni:
+        return
+    for data_da, data_a in periodi_storici(date(anni[0], 1, 1), date(anni[-1], 12, 31)):
+        with sessione_storica(db, data_da, data_a) as storico:
+            riga = storico.query(modello.data).filter(modello.id == id_riga).first()
+        if riga is not None:
+            raise AnnoArchiviato(f"{modello.__tablename__} {id_riga} appartiene all'anno archiviato {riga.data.year}.")
+
+
+def _colonne(modello) -> str:
+    return ", ".join(colonna.name for colonna in modello.__table__.columns)
+
+
+def _valore_data(modello, giorno: date):
+    """ Valore di giorno come salvato nella colonna data del modello (stringa o intero, vedi SCHEMA_COMPATTO) """
+    converti = modello.__table__.c.data.type.bind_processor(engine.dialect)
+    return converti(giorno) if converti else giorno
+
+
+def _collega(dbapi_connection, anni):
+    cursor = dbapi_connection.cursor()
+    try:
+        for anno in anni:
+            cursor.execute(f"ATTACH DATABASE ? AS archivio_{anno}", (percorso_archivio(anno),))
+        for modello in TABELLE:
+            tabella, colonne = modello.__tablename__, _colonne(modello)
+            sorgenti = [f"SELECT {colonne} FROM main.{tabella}"]
+            sorgenti += [f"SELECT {colonne} FROM archivio_{anno}.{tabella}" for anno in anni]
+            cursor.execute(f"CREATE TEMP VIEW {tabella} AS " + " UNION ALL ".join(sorgenti))
+    finally:
+        cursor.close()
+
+
+def _scollega(dbapi_connection, anni):
+    cursor = dbapi_connection.cursor()
+    try:
+        for modello in TABELLE:
+            cursor.execute(f"DROP VIEW IF EXISTS temp.{modello.__tablename__}")
+        for anno in anni:
+            cursor.execute(f"DETACH DATABASE archivio_{anno}")
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def sessione_storica(db: Session, data_da: date, data_a: date):
+    """
+    Sessione di sola lettura in cui "timbrature" e "lavoro" comprendono anche gli archivi
+    degli anni di [data_da, data_a]. Se nessun archivio è coinvolto restituisce db.
+    Oltre MAX_ARCHIVI anni archiviati solleva TroppiArchivi (vedi periodi_storici).
+    """
+    anni = [anno for anno in anni_archiviati() if data_da.year <= anno <= data_a.year]
+    if not anni:
+        yield db
+        return
+    if len(anni) > MAX_ARCHIVI:
+        raise TroppiArchivi(
+            f"Il periodo comprende {len(anni)} anni archiviati: se ne possono leggere al massimo {MAX_ARCHIVI} insieme."
+        )
+
+    # Connessione dedicata: ATTACH e viste vengono rimossi prima di restituirla al pool
+    # (DETACH richiede che la transazione della sessione sia già chiusa)
+    conn = engine.connect()
+    try:
+        _collega(conn.connection, anni)
+        with Session(bind=conn, autoflush=False) as storico:
+            yield storico
+        _scollega(conn.connection, anni)
+    except BaseException:
+        conn.invalidate()
+        raise
+    finally:
+        conn.close()
+
+
+def _crea_file(percorso: str):
+    """ File di archivio con lo stesso schema (e gli stessi indici) delle tabelle principali """
+    engine_archivio = crea_engine(f"sqlite:///{percorso}", pragmas={"journal_mode": "DELETE"})
+    try:
+        for modello in TABELLE:
+            modello.__table__.create(bind=engine_archivio, checkfirst=True)
+    finally:
+        engine_archivio.dispose()
+
+
+def _sposta(anno: int, percorso: str):
+    """
+    Copia le righe dell'anno nel file di archivio e le cancella dal database principale in
+    un'unica transazione BEGIN IMMEDIATE sulla stessa connessione: nessuna scrittura concorrente
+    può inserirsi fra copia e cancellazione. Restituisce le righe spostate per tabella.
+    """
+    inizio, fine = date(anno, 1, 1), date(anno + 1, 1, 1)
+    conteggi = {}
+    conn = engine.execution_options(scrittura=True).connect()
+    try:
+        # ATTACH e DETACH non sono ammessi dentro una transazione
+        cursor = conn.connection.cursor()
+        cursor.execute("ATTACH DATABASE ? AS archivio", (percorso,))
+        cursor.close()
+        try:
+            with Session(bind=conn, autoflush=False) as db:
+                # Senza AUTOINCREMENT SQLite riassegna gli id più alti dopo una cancellazione: la riga con
+                # l'id massimo deve restare nel database principale, o un nuovo id coinciderebbe con uno archiviato
+                for modello in TABELLE:
+                    ultima = db.query(modello.data).order_by(modello.id.desc()).first()
+                    if ultima is not None and inizio <= ultima.data < fine:
+                        raise ValueError(
+                            f"L'ultima riga inserita in {modello.__tablename__} è del {anno}: "
+                            f"archiviare dopo aver registrato dati più recenti."
+                        )
+
+                for modello in TABELLE:
+                    tabella, colonne = modello.__tablename__, _colonne(modello)
+                    risultato = db.connection().exec_driver_sql(
+                        f"INSERT OR REPLACE INTO archivio.{tabella} ({colonne}) "
+                        f"SELECT {colonne} FROM main.{tabella} WHERE data >= ? AND data < ?",
+                        (_valore_data(modello, inizio), _valore_data(modello, fine))
+                    )
+                    conteggi[tabella] = risultato.rowcount
+                    db.query(modello).filter(modello.data >= inizio, modello.data < fine).delete(synchronize_session=False)
+                    # Le letture non storiche (es. /timbrature del mese) cambiano contenuto: nuovi ETag e report
+                    incrementa_versione(db, *chiavi_intervallo(tabella, inizio, date(anno, 12, 31)))
+                db.commit()
+        finally:
+            cursor = conn.connection.cursor()
+            cursor.execute("DETACH DATABASE archivio")
+            cursor.close()
+    finally:
+        conn.close()
+    return conteggi
+
+
+def archivia(anno: int):
+    """
+    Sposta timbrature e lavori dell'anno (chiuso) in archivio_<anno>.db.
+    Il primo archivio dell'anno viene scritto in un file temporaneo che prende il nome definitivo
+    (ed entra nelle letture storiche) solo dopo il commit dello spostamento. Se il processo si
+    interrompe prima, il file temporaneo resta e una nuova esecuzione lo riprende: le righe già
+    copiate vengono sovrascritte (stessi id), quelle già cancellate sono solo nel file temporaneo.
+    Restituisce le righe spostate per tabella.
+    """
+    if anno >= date.today().year:
+        raise ValueError(f"L'anno {anno} non è ancora chiuso.")
+
+    percorso = percorso_archivio(anno)
+    destinazione = percorso if os.path.exists(percorso) else percorso + ".tmp"
+    _crea_file(destinazione)
+    conteggi = _sposta(anno, destinazione)
+    if destinazione != percorso:
+        os.replace(destinazione, percorso)
+    return conteggi
+
+
+if __name__ == "__main__":
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Archivio per anno di timbrature e lavori.")
+    sottocomandi = parser.add_subparsers(dest="comando", required=True)
+    comando_archivia = sottocomandi.add_parser("archivia", help="Sposta gli anni indicati nei file di archivio")
+    comando_archivia.add_argument("anni", type=int, nargs="+")
+    sottocomandi.add_parser("elenco", help="Elenca gli anni archiviati")
+    args = parser.parse_args()
+
+    init_db()
+    if args.comando == "elenco":
+        for anno in anni_archiviati():
+            print(f"{anno}: {percorso_archivio(anno)}")
+    else:
+        for anno in args.anni:
+            try:
+                conteggi = archivia(anno)
+            except ValueError as e:
+                print(f"⚠️ {e}")
+                continue
+            print(f"✅ {anno} archiviato: " + ", ".join(f"{tabella} {n}" for tabella, n in conteggi.items()))
+        print("ℹ️ Lo spazio liberato nel database principale si recupera con VACUUM.")
@@ -0,0 +1,50 @@
+import time
+import urllib.error
+import urllib.request
+import config
+
+# 🔹 Attesa dell'avvio del server per i launcher (start.py, app_launcher.py):
+# /health viene interrogato con attese crescenti invece di dormire un tempo fisso.
+# Solo libreria standard: start.py non deve importare l'applicazione.
+
+
+def url_locale(percorso: str = "") -> str:
+    """ Indirizzo del server per i client sulla stessa macchina """
+    # 0.0.0.0 / :: accettano connessioni da tutte le interfacce, compresa quella locale
+    host = "127.0.0.1" if config.HOST in ("", "0.0.0.0", "::") else config.HOST
+    return f"http://{host}:{config.PORT}{percorso}"
+
+
+URL_SALUTE = url_locale("/health")
+
+
+def server_pronto(url: str = URL_SALUTE) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as risposta:
+            return risposta.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def attendi_server(
+    url: str = URL_SALUTE,
+    timeout: float = 60,
+    attesa_iniziale: float = 0.05,
+    attesa_massima: float = 1.0,
+    in_esecuzione=lambda: True
+) -> bool:
+    """
+    Attende che /health risponda 200, raddoppiando l'attesa fra un tentativo e l'altro
+    fino a attesa_massima. Restituisce False allo scadere del timeout o se in_esecuzione()
+    indica che il processo del server è terminato.
+    """
+    scadenza = time.monotonic() + timeout
+    attesa = attesa_iniziale
+    while time.monotonic() < scadenza:
+        if server_pronto(url):
+            return True
+        if not in_esecuzione():
+            return False
+        time.sleep(attesa)
+        attesa = min(attesa * 2, attesa_massima)
+    return False
@@ -0,0 +1,265 @@
+"""
+Test di carico degli endpoint di routes.py, eseguiti in-process sull'app ASGI (httpx.ASGITransport):
+per ogni scenario throughput e latenze p50/p95/p99. I risultati vengono salvati in JSON e
+possono essere confrontati con un'esecuzione precedente per segnalare le regressioni.
+
+Uso: python benchmarks/carico_api.py [--richieste 200] [--concorrenza 4] [--confronta precedente.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CARTELLA_RISULTATI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "risultati")
+
+
+def percentile(valori, p: float) -> float:
+    """ Percentile con il metodo nearest-rank su valori già ordinati """
+    if not valori:
+        return 0.0
+    indice = max(0, min(len(valori) - 1, round(p / 100 * len(valori) + 0.5) - 1))
+    return valori[indice]
+
+
+class Contesto:
+    """ Parametri casuali ma validi per le richieste, ricavati dai dati generati """
+
+    def __init__(self, id_utenti, anni: int, fine: date, seed: int):
+        self.rng = random.Random(seed)
+        self.id_utenti = id_utenti
+        self.fine = fine
+        self.inizio = date(fine.year - anni, fine.month, 1)
+        self.prossimo_giorno = fine
+
+    def giorno(self) -> date:
+        return self.inizio + timedelta(days=self.rng.randint(0, (self.fine - self.inizio).days))
+
+    def mese(self):
+        giorno = self.giorno()
+        return giorno.year, giorno.month
+
+    def utente(self) -> int:
+        return self.rng.choice(self.id_utenti)
+
+    def intervallo(self, giorni: int):
+        data_da = self.giorno()
+        return data_da.isoformat(), min(data_da + timedelta(days=giorni - 1), self.fine).isoformat()
+
+    def nuova_timbratura(self):
+        # Giorni successivi ai dati generati: ogni inserimento crea una riga nuova
+        self.prossimo_giorno += timedelta(days=1)
+        return {"id_utente": self.utente(), "data": self.prossimo_giorno.isoformat(),
+                "orario_ingresso": "08:00", "orario_uscita": "17:00"}
+
+
+def scenari(ctx: Contesto):
+    """ nome -> funzione che restituisce (metodo, url, argomenti per httpx) """
+
+    def attivita_mese():
+        data_da, data_a = ctx.intervallo(31)
+        return "GET", "/attivita", {"params": {"data_da": data_da, "data_a": data_a}}
+
+    def attivita_anno_totali():
+        data_da, data_a = ctx.intervallo(365)
+        return "GET", "/attivita", {"params": {"data_da": data_da, "data_a": data_a, "totals_only": True}}
+
+    def attivita_paginata():
+        data_da, data_a = ctx.intervallo(365)
+        return "GET", "/attivita", {"params": {"data_da": data_da, "data_a": data_a, "limit": 100}}
+
+    def dashboard():
+        data_da, data_a = ctx.intervallo(92)
+        return "GET", "/dashboard/summary", {"params": {"data_da": data_da, "data_a": data_a}}
+
+    def timbrature_mese():
+        anno, mese = ctx.mese()
+        return "GET", "/esportazione/timbrature", {"params": {"utente": ctx.utente(), "mese": mese, "anno": anno}}
+
+    def riepilogo_ore():
+        return "GET", "/riepilogo/ore", {"params": {"anno": ctx.mese()[0]}}
+
+    def esporta_timbrature_pdf():
+        anno, mese = ctx.mese()
+        return "GET", "/esporta/timbrature", {"params": {"utente": ctx.utente(), "mese": mese, "anno": anno}}
+
+    def esporta_attivita_pdf():
+        data_da, data_a = ctx.intervallo(31)
+        return "GET", "/esporta/attivita", {"params": {"data_da": data_da, "data_a": data_a}}
+
+    def esporta_attivita_csv():
+        data_da, data_a = ctx.intervallo(92)
+        return "GET", "/esporta/attivita.csv", {"params": {"data_da": data_da, "data_a": data_a}}
+
+    def inserisci_lavoro():
+        return "POST", "/lavoro/nuovo", {"json": {
+            "data": ctx.giorno().isoformat(), "cliente": f"Cliente carico {ctx.rng.randint(1, 10 ** 6)}",
+            "contratto": 1200.0, "saldato": 600.0, "commessa": "MOV", "saldo": "Bonifico", "extra_consegna": 0.0
+        }}
+
+    return {
+        "users": lambda: ("GET", "/users", {}),
+        "timbrature_giorno": lambda: ("GET", "/timbrature", {"params": {"utente": ctx.utente(), "data": ctx.giorno().isoformat()}}),
+        "lavoro_giorno": lambda: ("POST", "/lavoro", {"json": {"data": ctx.giorno().isoformat()}}),
+        "attivita_mese": attivita_mese,
+        "attivita_paginata": attivita_paginata,
+        "attivita_anno_totali": attivita_anno_totali,
+        "dashboard_trimestre": dashboard,
+        "timbrature_mese": timbrature_mese,
+        "riepilogo_ore_anno": riepilogo_ore,
+        "esporta_timbrature_pdf": esporta_timbrature_pdf,
+        "esporta_attivita_pdf": esporta_attivita_pdf,
+        "esporta_attivita_csv": esporta_attivita_csv,
+        "inserisci_timbratura": lambda: ("POST", "/timbrature", {"json": ctx.nuova_timbratura()}),
+        "inserisci_lavoro": inserisci_lavoro,
+    }
+
+
+async def esegui_scenario(client, richiesta, richieste: int, concorrenza: int, riscaldamento: int, pulisci_cache):
+    for _ in range(riscaldamento):
+        metodo, url, argomenti = richiesta()
+        await client.request(metodo, url, **argomenti)
+
+    latenze = []
+    errori = {}
+    restanti = [richieste]
+
+    async def worker():
+        while restanti[0] > 0:
+            restanti[0] -= 1
+            metodo, url, argomenti = richiesta()
+            if pulisci_cache:
+                pulisci_cache()
+            inizio = time.perf_counter()
+            risposta = await client.request(metodo, url, **argomenti)
+            await risposta.aread()
+            latenze.append(time.perf_counter() - inizio)
+            if risposta.status_code >= 400:
+                errori[risposta.status_code] = errori.get(risposta.status_code, 0) + 1
+
+    inizio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concorrenza)))
+    durata = time.perf_counter() - inizio
+
+    latenze.sort()
+    return {
+        "richieste": len(latenze),
+        "errori": {str(codice): n for codice, n in sorted(errori.items())},
+        "durata_s": round(durata, 3),
+        "richieste_al_secondo": round(len(latenze) / durata, 1) if durata else 0.0,
+        "media_ms": round(sum(latenze) / len(latenze) * 1000, 2) if latenze else 0.0,
+        "p50_ms": round(percentile(latenze, 50) * 1000, 2),
+        "p95_ms": round(percentile(latenze, 95) * 1000, 2),
+        "p99_ms": round(percentile(latenze, 99) * 1000, 2),
+    }
+
+
+def confronta(attuale: dict, precedente: dict, soglia: float):
+    """ Scenari peggiorati oltre la soglia (frazione) in p95 o in throughput """
+    regressioni = []
+    for nome, r in attuale["scenari"].items():
+        prima = precedente.get("scenari", {}).get(nome)
+        if not prima:
+            continue
+        if prima["p95_ms"] and r["p95_ms"] > prima["p95_ms"] * (1 + soglia):
+            regressioni.append(f"{nome}: p95 {prima['p95_ms']} -> {r['p95_ms']} ms")
+        if prima["richieste_al_secondo"] and r["richieste_al_secondo"] < prima["richieste_al_secondo"] * (1 - soglia):
+            regressioni.append(f"{nome}: throughput {prima['richieste_al_secondo']} -> {r['richieste_al_secondo']} req/s")
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database", help="Database da usare; se non esiste viene creato e popolato (default: file temporaneo)")
+    parser.add_argument("--utenti", type=int, default=20)
+    parser.add_argument("--anni", type=int, default=3)
+    parser.add_argument("--lavori-al-giorno", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--richieste", type=int, default=200, help="Richieste misurate per scenario")
+    parser.add_argument("--concorrenza", type=int, default=4, help="Richieste contemporanee")
+    parser.add_argument("--riscaldamento", type=int, default=5, help="Richieste non misurate prima di ogni scenario")
+    parser.add_argument("--scenari", help="Scenari da eseguire, separati da virgola (default: tutti)")
+    parser.add_argument("--cache-report", action="store_true", help="Non svuota la cache dei PDF prima di ogni richiesta")
+    parser.add_argument("--output", help="File JSON dei risultati (default: benchmarks/risultati/carico_<data>.json)")
+    parser.add_argument("--confronta", help="Risultati precedenti da confrontare")
+    parser.add_argument("--soglia", type=float, default=0.2, help="Peggioramento tollerato (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    percorso = args.database or os.path.join(tempfile.mkdtemp(prefix="montarreda_carico_"), "database.db")
+    da_popolare = not os.path.exists(percorso)
+    # Il benchmark non deve mai toccare il database reale: il percorso va impostato prima di importare l'app
+    os.environ["MONTARREDA_DATABASE_PATH"] = percorso
+
+    import httpx
+    from database import SessionLocal, init_db
+    from genera_dati import genera
+    from models import User
+    from report_cache import report_cache
+
+    fine = date.today()
+    conteggi = None
+    if da_popolare:
+        init_db()
+        inizio = time.perf_counter()
+        with SessionLocal() as db:
+            conteggi = genera(db, args.utenti, args.anni, args.lavori_al_giorno, seed=args.seed, fine=fine)
+        print(f"Dati generati in {time.perf_counter() - inizio:.1f} s: {conteggi}")
+
+    from main import app
+
+    with SessionLocal() as db:
+        id_utenti = [u.id for u in db.query(User.id).order_by(User.id)]
+    ctx = Contesto(id_utenti, args.anni, fine, args.seed)
+    disponibili = scenari(ctx)
+    nomi = [n.strip() for n in args.scenari.split(",")] if args.scenari else list(disponibili)
+    sconosciuti = [n for n in nomi if n not in disponibili]
+    if sconosciuti:
+        parser.error(f"scenari sconosciuti: {', '.join(sconosciuti)} (disponibili: {', '.join(disponibili)})")
+
+    async def esegui_tutti():
+        risultati = {}
+        trasporto = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=trasporto, base_url="http://carico", timeout=None) as client:
+            for nome in nomi:
+                pulisci = None if args.cache_report or not nome.endswith("_pdf") else report_cache.clear
+                risultati[nome] = r = await esegui_scenario(
+                    client, disponibili[nome], args.richieste, args.concorrenza, args.riscaldamento, pulisci
+                )
+                print(f"{nome:24} {r['richieste_al_secondo']:8.1f} req/s  p50 {r['p50_ms']:8.2f}  "
+                      f"p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms  errori {r['errori'] or '-'}")
+        return risultati
+
+    risultati = {
+        "creato": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "parametri": {k: v for k, v in vars(args).items() if k not in ("output", "confronta")},
+        "righe_generate": conteggi,
+        "scenari": asyncio.run(esegui_tutti()),
+    }
+
+    output = args.output or os.path.join(CARTELLA_RISULTATI, f"carico_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(risultati, f, indent=2, ensure_ascii=False)
+    print(f"Risultati salvati in {output}")
+
+    if args.confronta:
+        with open(args.confronta, encoding="utf-8") as f:
+            regressioni = confronta(risultati, json.load(f), args.soglia)
+        for regressione in regressioni:
+            print(f"⚠️ Regressione {regressione}")
+        if regressioni:
+            sys.exit(1)
+        print("✅ Nessuna regressione rispetto a " + args.confronta)
+
+
+if __name__ == "__main__":
+    main()
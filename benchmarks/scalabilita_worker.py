@@ -0,0 +1,151 @@
+"""
+Throughput del server al variare del numero di worker di uvicorn, su un carico misto
+di letture (/attivita, /dashboard/summary, /esportazione/timbrature) ed esportazioni PDF.
+Il server gira in un processo separato, i client sono thread con connessioni keep-alive.
+Più worker aiutano solo se ci sono core liberi: ogni worker ha anche il proprio pool di
+rendering PDF (PDF_PROCESSI) e le proprie cache, e i client girano sulla stessa macchina.
+
+Uso: python benchmarks/scalabilita_worker.py [--worker 1,2,4] [--client 16] [--secondi 15]
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+CARTELLA_PROGETTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARTELLA_PROGETTO)
+
+# (peso, scenario): le esportazioni PDF sono CPU-bound e bloccano il worker che le genera
+CARICO = (
+    (50, "attivita"),
+    (20, "dashboard"),
+    (20, "timbrature_mese"),
+    (10, "esporta_attivita_pdf"),
+)
+
+
+def richiesta_casuale(rng: random.Random, inizio: date, fine: date, id_utenti):
+    scenario = rng.choices([s for _, s in CARICO], [p for p, _ in CARICO])[0]
+    data_da = inizio + timedelta(days=rng.randint(0, (fine - inizio).days - 31))
+    # Intervalli di lunghezza variabile: la cache dei report non deve servire tutte le esportazioni
+    data_a = data_da + timedelta(days=rng.randint(7, 30))
+    periodo = {"data_da": data_da.isoformat(), "data_a": data_a.isoformat()}
+    if scenario == "attivita":
+        return scenario, "/attivita?" + urlencode(periodo)
+    if scenario == "dashboard":
+        return scenario, "/dashboard/summary?" + urlencode(periodo)
+    if scenario == "timbrature_mese":
+        parametri = {"utente": rng.choice(id_utenti), "mese": data_da.month, "anno": data_da.year}
+        return scenario, "/esportazione/timbrature?" + urlencode(parametri)
+    return scenario, "/esporta/attivita?" + urlencode(periodo)
+
+
+def esegui_carico(porta: int, client: int, secondi: float, inizio: date, fine: date, id_utenti, seed: int):
+    latenze = []
+    errori = [0]
+    lock = threading.Lock()
+    scadenza = time.perf_counter() + secondi
+
+    def client_http(indice: int):
+        rng = random.Random(seed + indice)
+        connessione = http.client.HTTPConnection("127.0.0.1", porta, timeout=120)
+        locali = []
+        errori_locali = 0
+        while time.perf_counter() < scadenza:
+            _, url = richiesta_casuale(rng, inizio, fine, id_utenti)
+            t0 = time.perf_counter()
+            try:
+                connessione.request("GET", url)
+                risposta = connessione.getresponse()
+                risposta.read()
+                if risposta.status >= 400:
+                    errori_locali += 1
+            except (OSError, http.client.HTTPException):
+                errori_locali += 1
+                connessione.close()
+                connessione = http.client.HTTPConnection("127.0.0.1", porta, timeout=120)
+                continue
+            locali.append(time.perf_counter() - t0)
+        connessione.close()
+        with lock:
+            latenze.extend(locali)
+            errori[0] += errori_locali
+
+    thread = [threading.Thread(target=client_http, args=(i,)) for i in range(client)]
+    t0 = time.perf_counter()
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    durata = time.perf_counter() - t0
+
+    latenze.sort()
+    return {
+        "richieste": len(latenze),
+        "errori": errori[0],
+        "rps": len(latenze) / durata,
+        "p50_ms": latenze[len(latenze) // 2] * 1000 if latenze else 0.0,
+        "p95_ms": latenze[int(len(latenze) * 0.95)] * 1000 if latenze else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--worker", default="1,2,4", help="Numeri di worker da provare, separati da virgola")
+    parser.add_argument("--client", type=int, default=16, help="Client concorrenti")
+    parser.add_argument("--secondi", type=float, default=15, help="Durata di ogni misura")
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--utenti", type=int, default=20)
+    parser.add_argument("--anni", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    percorso = os.path.join(tempfile.mkdtemp(prefix="montarreda_worker_"), "database.db")
+    # Il benchmark non deve mai toccare il database reale
+    os.environ["MONTARREDA_DATABASE_PATH"] = percorso
+
+    import config
+    from avvio import attendi_server
+    from database import SessionLocal, engine, init_db
+    from genera_dati import genera
+    from models import User
+
+    fine = date.today()
+    inizio = date(fine.year - args.anni, fine.month, 1)
+    init_db()
+    with SessionLocal() as db:
+        print(f"Dati generati: {genera(db, args.utenti, args.anni, seed=args.seed, fine=fine)}")
+        id_utenti = [u.id for u in db.query(User.id)]
+    engine.dispose()
+
+    print(f"CPU disponibili: {os.cpu_count()}  (processi di rendering PDF per worker: {config.PDF_PROCESSI})")
+    base = None
+    for worker in [int(n) for n in args.worker.split(",")]:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(args.porta), "--workers", str(worker), "--log-level", "warning"],
+            cwd=CARTELLA_PROGETTO, env=dict(os.environ)
+        )
+        try:
+            if not attendi_server(f"http://127.0.0.1:{args.porta}/health", in_esecuzione=lambda: server.poll() is None):
+                raise RuntimeError(f"il server con {worker} worker non si è avviato")
+            r = esegui_carico(args.porta, args.client, args.secondi, inizio, fine, id_utenti, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+
+        base = base or r["rps"]
+        print(f"{worker:2d} worker: {r['rps']:8.1f} req/s  (x{r['rps'] / base:.2f})  "
+              f"p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+              f"richieste {r['richieste']}  errori {r['errori']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark di un anno di timbrature nei due schemi: testuale (Date/Time salvati come stringhe)
+e compatto (giorno giuliano e minuti interi, MONTARREDA_SCHEMA_COMPATTO). Misura la lettura
+delle righe con conversione dei tipi, la serializzazione JSON della lista e la dimensione del file.
+
+Uso: python benchmarks/schema_timbrature.py [--utenti 50] [--ripetizioni 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from datetime import time as orario
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Date, Integer, MetaData, Table, Time, create_engine, select
+from models import GiornoGiuliano, MinutiGiorno
+
+
+def tabella(metadata: MetaData, nome: str, tipo_giorno, tipo_orario) -> Table:
+    return Table(
+        nome, metadata,
+        Column("id", Integer, primary_key=True),
+        Column("id_utente", Integer, nullable=False),
+        Column("data", tipo_giorno, nullable=False),
+        Column("orario_ingresso", tipo_orario, nullable=False),
+        Column("orario_uscita", tipo_orario, nullable=False),
+        Column("tempo_lavorativo", Integer, nullable=False),
+    )
+
+
+def anno_di_timbrature(utenti: int):
+    """ Una timbratura per utente e giorno lavorativo dell'anno scorso """
+    inizio = date(date.today().year - 1, 1, 1)
+    righe = []
+    for giorno in range(365):
+        data = inizio + timedelta(days=giorno)
+        if data.weekday() == 6:
+            continue
+        for id_utente in range(1, utenti + 1):
+            ingresso = random.randint(7 * 60 + 30, 9 * 60)
+            uscita = ingresso + random.randint(6 * 60, 10 * 60)
+            righe.append({
+                "id_utente": id_utente,
+                "data": data,
+                "orario_ingresso": orario(ingresso // 60, ingresso % 60),
+                "orario_uscita": orario(uscita // 60, uscita % 60),
+                "tempo_lavorativo": uscita - ingresso
+            })
+    return righe
+
+
+def serializza_strftime(righe):
+    """ Serializzazione precedente (strftime per ogni valore) """
+    return [
+        {
+            "id": r.id,
+            "data": r.data.strftime("%Y-%m-%d"),
+            "orario_ingresso": r.orario_ingresso.strftime("%H:%M"),
+            "orario_uscita": r.orario_uscita.strftime("%H:%M"),
+            "tempo_lavorativo": r.tempo_lavorativo
+        }
+        for r in righe
+    ]
+
+
+def serializza_isoformat(righe):
+    """ Serializzazione attuale di routes.leggi_timbrature: stesso output, isoformat """
+    return [
+        {
+            "id": r.id,
+            "data": r.data.isoformat(),
+            "orario_ingresso": r.orario_ingresso.isoformat("minutes"),
+            "orario_uscita": r.orario_uscita.isoformat("minutes"),
+            "tempo_lavorativo": r.tempo_lavorativo
+        }
+        for r in righe
+    ]
+
+
+def misura(funzione, ripetizioni: int):
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        risultato = funzione()
+    return (time.perf_counter() - inizio) / ripetizioni * 1000, risultato
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--utenti", type=int, default=50)
+    parser.add_argument("--ripetizioni", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(42)
+    dati = anno_di_timbrature(args.utenti)
+    print(f"Righe: {len(dati)}")
+
+    schemi = {
+        "testuale": (Date, Time),
+        "compatto": (GiornoGiuliano, MinutiGiorno),
+    }
+
+    with tempfile.TemporaryDirectory() as cartella:
+        risultati = {}
+        for nome, (tipo_giorno, tipo_orario) in schemi.items():
+            percorso = os.path.join(cartella, f"{nome}.db")
+            engine = create_engine(f"sqlite:///{percorso}")
+            metadata = MetaData()
+            timbrature = tabella(metadata, "timbrature", tipo_giorno, tipo_orario)
+            metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(timbrature.insert(), dati)
+
+            with engine.connect() as conn:
+                ms_lettura, righe = misura(lambda: conn.execute(select(timbrature)).all(), args.ripetizioni)
+            ms_strftime, corpo = misura(lambda: serializza_strftime(righe), args.ripetizioni)
+            ms_isoformat, corpo_iso = misura(lambda: serializza_isoformat(righe), args.ripetizioni)
+            assert corpo == corpo_iso
+            engine.dispose()
+
+            risultati[nome] = corpo
+            print(f"{nome:9}: lettura {ms_lettura:7.1f} ms  strftime {ms_strftime:7.1f} ms  "
+                  f"isoformat {ms_isoformat:7.1f} ms  file {os.path.getsize(percorso) / 1024:8.1f} KiB")
+
+        # Stessa API nei due schemi
+        assert risultati["testuale"] == risultati["compatto"]
+
+
+if __name__ == "__main__":
+    main()
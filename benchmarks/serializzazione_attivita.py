@@ -0,0 +1,94 @@
+"""
+Benchmark della serializzazione di un anno di /attivita: JSONResponse (json della
+libreria standard) contro RispostaJSON (orjson), e dimensione del payload con e senza gzip.
+
+Uso: python benchmarks/serializzazione_attivita.py [--lavori-al-giorno 20] [--ripetizioni 20]
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from queries import SALDI, calcola_totali
+from risposte import RispostaJSON
+from schemas import AttivitaResponse
+
+COMMESSE = ("MOV", "OLIE")
+
+
+def anno_di_attivita(lavori_al_giorno: int):
+    """ Risposta di /attivita per un anno di lavori sintetici """
+    inizio = date(date.today().year - 1, 1, 1)
+    lavori = []
+    for giorno in range(365):
+        data = (inizio + timedelta(days=giorno)).strftime("%Y-%m-%d")
+        for _ in range(lavori_al_giorno):
+            contratto = round(random.uniform(100, 5000), 2)
+            lavori.append({
+                "id": len(lavori) + 1,
+                "data": data,
+                "cliente": f"Cliente {random.randint(1, 5000)}",
+                "contratto": contratto,
+                "saldato": round(contratto * random.choice((0, 0.5, 1)), 2),
+                "commessa": random.choice(COMMESSE),
+                "saldo": random.choice(list(SALDI)),
+                "extra_consegna": round(random.choice((0, 0, 30, 50)), 2)
+            })
+
+    righe = {}
+    for lav in lavori:
+        voce = righe.setdefault(lav["saldo"], [lav["saldo"], 0, 0.0, 0.0, 0.0])
+        voce[1] += 1
+        voce[2] += lav["contratto"]
+        voce[3] += lav["saldato"]
+        voce[4] += lav["extra_consegna"]
+
+    return {"lavori": lavori, "totali": calcola_totali(righe.values()), "next_cursor": None}
+
+
+def misura(funzione, ripetizioni: int):
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        risultato = funzione()
+    return (time.perf_counter() - inizio) / ripetizioni * 1000, risultato
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lavori-al-giorno", type=int, default=20)
+    parser.add_argument("--ripetizioni", type=int, default=20)
+    args = parser.parse_args()
+
+    contenuto = anno_di_attivita(args.lavori_al_giorno)
+    print(f"Righe: {len(contenuto['lavori'])}")
+
+    # Prima: dict passato a jsonable_encoder e al json della libreria standard
+    ms_prima, corpo_prima = misura(lambda: JSONResponse(jsonable_encoder(contenuto)).body, args.ripetizioni)
+
+    # Dopo: validazione sul modello di risposta e rendering con orjson
+    def dopo():
+        modello = AttivitaResponse(**contenuto)
+        dati = modello.model_dump() if hasattr(modello, "model_dump") else modello.dict()
+        return RispostaJSON(dati).body
+
+    ms_dopo, corpo_dopo = misura(dopo, args.ripetizioni)
+    ms_orjson, _ = misura(lambda: RispostaJSON(contenuto).body, args.ripetizioni)
+
+    print(f"json + jsonable_encoder : {ms_prima:8.1f} ms  {len(corpo_prima) / 1024:8.1f} KiB")
+    print(f"modello + orjson        : {ms_dopo:8.1f} ms  {len(corpo_dopo) / 1024:8.1f} KiB")
+    print(f"solo orjson             : {ms_orjson:8.1f} ms")
+
+    ms_gzip, compresso = misura(lambda: gzip.compress(corpo_dopo, compresslevel=9), args.ripetizioni)
+    print(f"gzip (livello 9)        : {ms_gzip:8.1f} ms  {len(compresso) / 1024:8.1f} KiB "
+          f"({len(compresso) / len(corpo_dopo):.0%} dell'originale)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark letture/scritture concorrenti su SQLite: engine originale
+(journal rollback, impostazioni predefinite) contro engine con i PRAGMA di database.py.
+
+Uso: python benchmarks/sqlite_concorrenza.py [--lettori 8] [--scrittori 2] [--secondi 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Il benchmark non deve mai toccare il database reale
+os.environ.setdefault("MONTARREDA_DATABASE_PATH", os.path.join(tempfile.gettempdir(), "montarreda_bench.db"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import crea_engine
+from models import Base, Timbratura, User
+from queries import intervallo_mese
+
+UTENTI = 20
+GIORNI = 365
+
+
+def prepara(engine):
+    Base.metadata.create_all(bind=engine)
+    Sessione = sessionmaker(bind=engine)
+    with Sessione() as db:
+        db.bulk_insert_mappings(User, [{"full_name": f"Utente {i}"} for i in range(UTENTI)])
+        inizio = date.today() - timedelta(days=GIORNI)
+        db.bulk_insert_mappings(Timbratura, [
+            {
+                "id_utente": u + 1,
+                "data": inizio + timedelta(days=g),
+                "orario_ingresso": dtime(8, 0),
+                "orario_uscita": dtime(17, 0),
+                "tempo_lavorativo": 540
+            }
+            for u in range(UTENTI) for g in range(GIORNI)
+        ])
+        db.commit()
+
+
+def esegui(engine, lettori: int, scrittori: int, secondi: float):
+    Sessione = sessionmaker(bind=engine)
+    stop = threading.Event()
+    conteggi = {"letture": 0, "scritture": 0, "errori": 0}
+    lock = threading.Lock()
+
+    def conta(chiave):
+        with lock:
+            conteggi[chiave] += 1
+
+    def lettore():
+        while not stop.is_set():
+            giorno = date.today() - timedelta(days=random.randrange(GIORNI))
+            inizio, fine = intervallo_mese(giorno.year, giorno.month)
+            try:
+                with Sessione() as db:
+                    db.query(Timbratura).filter(
+                        Timbratura.id_utente == random.randint(1, UTENTI),
+                        Timbratura.data >= inizio,
+                        Timbratura.data < fine
+                    ).all()
+                conta("letture")
+            except Exception:
+                conta("errori")
+
+    def scrittore(indice):
+        giorno = date.today() + timedelta(days=1 + indice * 100000)
+        while not stop.is_set():
+            try:
+                with Sessione() as db:
+                    db.add(Timbratura(
+                        id_utente=random.randint(1, UTENTI),
+                        data=giorno,
+                        orario_ingresso=dtime(8, 0),
+                        orario_uscita=dtime(12, 0),
+                        tempo_lavorativo=240
+                    ))
+                    db.commit()
+                conta("scritture")
+            except Exception:
+                conta("errori")
+            giorno += timedelta(days=1)
+
+    threads = [threading.Thread(target=lettore) for _ in range(lettori)]
+    threads += [threading.Thread(target=scrittore, args=(i,)) for i in range(scrittori)]
+    for t in threads:
+        t.start()
+    time.sleep(secondi)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {chiave: valore / secondi if chiave != "errori" else valore for chiave, valore in conteggi.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lettori", type=int, default=8)
+    parser.add_argument("--scrittori", type=int, default=2)
+    parser.add_argument("--secondi", type=float, default=10)
+    args = parser.parse_args()
+
+    cartella = tempfile.mkdtemp(prefix="montarreda_bench_")
+    configurazioni = {
+        # Engine come era prima del livello di tuning
+        "predefinito": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "ottimizzato": lambda url: crea_engine(url),
+    }
+
+    for nome, factory in configurazioni.items():
+        url = f"sqlite:///{os.path.join(cartella, nome + '.db')}"
+        engine = factory(url)
+        prepara(engine)
+        risultato = esegui(engine, args.lettori, args.scrittori, args.secondi)
+        engine.dispose()
+        print(
+            f"{nome:12s} letture/s: {risultato['letture']:9.1f}  "
+            f"scritture/s: {risultato['scritture']:8.1f}  errori: {risultato['errori']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Misura il tempo di avvio del server: dal lancio di uvicorn alla prima risposta 200 di /health,
+più il tempo di import dell'applicazione e i moduli pesanti caricati all'avvio.
+
+Uso: python benchmarks/tempo_avvio.py [--ripetizioni 5] [--porta 8765]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CARTELLA_PROGETTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARTELLA_PROGETTO)
+
+from avvio import server_pronto
+
+# Moduli che non dovrebbero essere caricati finché non servono
+MODULI_DIFFERITI = ("fpdf", "aiosqlite")
+
+MISURA_IMPORT = """
+import sys, time
+inizio = time.perf_counter()
+import main
+print(time.perf_counter() - inizio)
+print(",".join(m for m in {moduli!r} if m in sys.modules))
+"""
+
+
+def porta_libera(porta: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex(("127.0.0.1", porta)) != 0
+
+
+def misura_avvio(porta: int, ambiente: dict, timeout: float = 60) -> float:
+    """ Secondi fra il lancio del processo e la prima risposta di /health """
+    url = f"http://127.0.0.1:{porta}/health"
+    inizio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta)],
+        cwd=CARTELLA_PROGETTO, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        # Polling fitto: qui interessa la misura, non il carico sul server
+        while time.perf_counter() - inizio < timeout:
+            if server_pronto(url):
+                return time.perf_counter() - inizio
+            if processo.poll() is not None:
+                raise RuntimeError(f"uvicorn terminato con codice {processo.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError(f"/health non risponde dopo {timeout} s")
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    if not porta_libera(args.porta):
+        parser.error(f"la porta {args.porta} è già in uso")
+
+    # Database temporaneo: la misura non deve toccare quello reale
+    ambiente = dict(os.environ)
+    ambiente["MONTARREDA_DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="montarreda_avvio_"), "database.db")
+
+    risultato = subprocess.run(
+        [sys.executable, "-c", MISURA_IMPORT.format(moduli=MODULI_DIFFERITI)],
+        cwd=CARTELLA_PROGETTO, env=ambiente, capture_output=True, text=True, check=True
+    )
+    # Le ultime due righe: eventuali messaggi di init_db le precedono
+    secondi_import, caricati = risultato.stdout.splitlines()[-2:]
+    print(f"Import di main       : {float(secondi_import) * 1000:8.1f} ms")
+    print(f"Moduli differiti già caricati: {caricati or 'nessuno'}")
+
+    tempi = [misura_avvio(args.porta, ambiente) for _ in range(args.ripetizioni)]
+    print(f"Avvio fino a /health : min {min(tempi) * 1000:8.1f} ms  "
+          f"mediana {statistics.median(tempi) * 1000:8.1f} ms  max {max(tempi) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
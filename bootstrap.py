@@ -2,6 +2,23 @@
 import database
 import routes
 import models
+import reports
+import report_cache
+import versioni
+import queries
+import jobs
+import import_lavori
+import esportazione_dati
+import riepiloghi
+import metriche
+import avvio
+import rendering
+import sincronizzazione
+import cache_letture
+import archivio
+import schema_compatto
+import ricerca
+import risposte
 import main
 
 # Se hai altre librerie che danno problemi, importale qui
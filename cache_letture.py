@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+import config
+from metriche import Contatore, Indicatore, registra
+
+# 🔹 Cache in memoria delle letture più frequenti (/users, /lavoro del giorno, /timbrature del mese).
+# Ogni voce è memorizzata con le versioni (versioni.py) dei dati da cui dipende e vale solo se
+# coincidono con quelle correnti: le scritture di un altro worker, che incrementano le versioni
+# nella stessa transazione, rendono la voce obsoleta anche qui. Le scritture di questo processo
+# la scartano subito dopo il commit; il TTL limita comunque la durata di ogni voce.
+
+hit = registra(Contatore("montarreda_read_cache_hits_total", "Letture servite dalla cache", ("area",)))
+miss = registra(Contatore("montarreda_read_cache_misses_total", "Letture non presenti in cache", ("area",)))
+rimosse = registra(Contatore("montarreda_read_cache_evictions_total", "Voci scartate per limite di dimensione", ("area",)))
+
+
+def chiave_utenti():
+    return ("users",)
+
+
+def chiave_lavoro(giorno: date):
+    return ("lavoro", giorno.isoformat())
+
+
+def chiave_timbrature(id_utente: int, giorno: date):
+    return ("timbrature", id_utente, giorno.year, giorno.month)
+
+
+class CacheLetture:
+    """
+    Cache LRU con scadenza (TTL) dei risultati delle letture, con chiavi tuple il cui primo
+    elemento è l'area ("users", "lavoro", "timbrature").
+    Una lettura iniziata prima di un'invalidazione non viene memorizzata: potrebbe
+    contenere i dati precedenti alla scrittura.
+    Il chiamante legge le versioni correnti prima di ottieni(): una voce con versioni diverse
+    è stata scritta prima di una modifica (anche di un altro processo) e viene ricalcolata.
+    """
+
+    def __init__(self, max_voci: int, ttl: float):
+        self.max_voci = max_voci
+        self.ttl = ttl
+        self._dati = OrderedDict()  # chiave -> (scadenza, versioni, valore)
+        self._generazione = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._dati)
+
+    def ottieni(self, chiave: tuple, carica, versioni: dict):
+        """
+        Restituisce il valore in cache se è stato calcolato con le stesse versioni,
+        altrimenti lo calcola con carica() e lo memorizza
+        """
+        if self.max_voci <= 0 or self.ttl <= 0:
+            return carica()
+
+        with self._lock:
+            voce = self._dati.get(chiave)
+            if voce is not None and voce[0] > time.monotonic() and voce[1] == versioni:
+                self._dati.move_to_end(chiave)
+                hit.incrementa(chiave[0])
+                return voce[2]
+            if voce is not None:
+                del self._dati[chiave]
+            generazione = self._generazione
+        miss.incrementa(chiave[0])
+
+        valore = carica()
+
+        with self._lock:
+            if generazione == self._generazione:
+                self._dati[chiave] = (time.monotonic() + self.ttl, versioni, valore)
+                self._dati.move_to_end(chiave)
+                while len(self._dati) > self.max_voci:
+                    vecchia, _ = self._dati.popitem(last=False)
+                    rimosse.incrementa(vecchia[0])
+        return valore
+
+    def invalida(self, *chiavi: tuple):
+        with self._lock:
+            self._generazione += 1
+            for chiave in chiavi:
+                self._dati.pop(chiave, None)
+
+    def invalida_area(self, *aree: str):
+        """ Per le scritture in blocco (import, sincronizzazione): tutte le voci delle aree indicate """
+        with self._lock:
+            self._generazione += 1
+            for chiave in [c for c in self._dati if c[0] in aree]:
+                del self._dati[chiave]
+
+    def clear(self):
+        with self._lock:
+            self._generazione += 1
+            self._dati.clear()
+
+
+cache_letture = CacheLetture(config.CACHE_LETTURE_MAX, config.CACHE_LETTURE_TTL)
+
+registra(Indicatore("montarreda_read_cache_entries", "Voci presenti nella cache delle letture", lambda: len(cache_letture)))
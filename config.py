@@ -0,0 +1,71 @@
+import os
+
+# 🔹 Configurazione dell'applicazione: ogni valore può essere sovrascritto
+# con una variabile d'ambiente MONTARREDA_<NOME> (es. MONTARREDA_SQLITE_CACHE_SIZE=-32000)
+
+
+def _env(nome: str, default, tipo=str):
+    valore = os.environ.get(f"MONTARREDA_{nome}")
+    if valore is None or valore == "":
+        return default
+    if tipo is bool:
+        return valore.strip().lower() in ("1", "true", "yes", "si", "on")
+    return tipo(valore)
+
+
+# Percorso del database (predefinito: database.db accanto all'eseguibile, vedi database.py)
+DATABASE_PATH = _env("DATABASE_PATH", None)
+
+# PRAGMA applicati a ogni nuova connessione SQLite
+SQLITE_JOURNAL_MODE = _env("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = _env("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = _env("SQLITE_CACHE_SIZE", -64000, int)  # negativo = KiB (64 MB)
+SQLITE_MMAP_SIZE = _env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024, int)
+SQLITE_TEMP_STORE = _env("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_BUSY_TIMEOUT = _env("SQLITE_BUSY_TIMEOUT", 5000, int)  # millisecondi
+
+# Letture principali (/timbrature, /attivita, /users, /lavoro) servite da endpoint async
+# con aiosqlite invece che dal threadpool (richiede aiosqlite e greenlet: pip install "sqlalchemy[asyncio]" aiosqlite)
+DB_ASYNC = _env("DB_ASYNC", False, bool)
+
+# Risposte più piccole di questa soglia (byte) non vengono compresse con gzip
+GZIP_MIN_SIZE = _env("GZIP_MIN_SIZE", 1000, int)
+
+# Pool di connessioni condiviso dagli endpoint sincroni (threadpool di FastAPI)
+DB_POOL_SIZE = _env("DB_POOL_SIZE", 10, int)
+DB_MAX_OVERFLOW = _env("DB_MAX_OVERFLOW", 20, int)
+
+# Query SQL più lente di questa soglia (millisecondi) vengono registrate nel log
+# "montarreda.sql" e contate in /metrics; 0 disattiva il controllo
+SLOW_QUERY_MS = _env("SLOW_QUERY_MS", 0, float)
+
+# Indirizzo del server e numero di processi worker di uvicorn (main.py, start.py, app_launcher.py).
+# Con più worker ogni processo ha il proprio engine e la propria cache dei report;
+# le scritture su SQLite vengono serializzate dal lock del database (vedi database.crea_engine).
+HOST = _env("HOST", "127.0.0.1")
+PORT = _env("PORT", 8000, int)
+WORKERS = _env("WORKERS", 1, int)
+
+# Secondi concessi alle richieste in corso allo spegnimento del server
+GRACEFUL_TIMEOUT = _env("GRACEFUL_TIMEOUT", 10, int)
+
+# Rendering dei PDF degli endpoint di esportazione (rendering.py): processi dedicati e
+# numero massimo di report in corso o in attesa oltre il quale si risponde 503
+PDF_PROCESSI = _env("PDF_PROCESSI", 2, int)
+PDF_MAX_IN_CODA = _env("PDF_MAX_IN_CODA", 8, int)
+PDF_RETRY_AFTER = _env("PDF_RETRY_AFTER", 5, int)  # secondi suggeriti nell'header Retry-After
+
+# Cache delle letture frequenti (cache_letture.py): numero massimo di voci e durata in secondi.
+# 0 in uno dei due valori disattiva la cache. Le voci sono validate con versioni_dati: valide anche con più worker
+CACHE_LETTURE_MAX = _env("CACHE_LETTURE_MAX", 2048, int)
+CACHE_LETTURE_TTL = _env("CACHE_LETTURE_TTL", 60, float)
+
+# Cartella dei file di archivio per anno (archivio.py); predefinita: quella del database
+ARCHIVIO_DIR = _env("ARCHIVIO_DIR", None)
+
+# Cartella degli ZIP delle esportazioni batch (jobs.py); predefinita: "esportazioni" accanto al database
+ESPORTAZIONI_DIR = _env("ESPORTAZIONI_DIR", None)
+
+# Schema compatto delle timbrature: giorni come numeri di giorno giuliano e orari come minuti
+# (interi invece di stringhe). Un database esistente va convertito con schema_compatto.py
+SCHEMA_COMPATTO = _env("SCHEMA_COMPATTO", False, bool)
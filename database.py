@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import create_engine, text
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import QueuePool
 import sys
 from sqlalchemy.orm import sessionmaker, declarative_base
+import config
 
 # 🔹 Verifica se il programma è eseguito da un eseguibile PyInstaller
 if getattr(sys, 'frozen', False):
@@ -10,12 +13,78 @@ else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Se script, usa la cartella dello script
 
 # 🔹 Percorso del database nella stessa cartella dell'eseguibile
-DATABASE_PATH = os.path.join(BASE_DIR, "database.db")
+DATABASE_PATH = config.DATABASE_PATH or os.path.join(BASE_DIR, "database.db")
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+
+def sqlite_pragmas():
+    """ PRAGMA da applicare a ogni connessione, letti dalla configurazione """
+    return {
+        # Per primo: il passaggio a WAL di un database nuovo attende invece di fallire subito
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT,
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": config.SQLITE_TEMP_STORE,
+    }
+
+
+def applica_pragmas(dbapi_connection, pragmas: dict):
+    cursor = dbapi_connection.cursor()
+    try:
+        for nome, valore in pragmas.items():
+            if valore is not None:
+                cursor.execute(f"PRAGMA {nome}={valore}")
+    finally:
+        cursor.close()
+
+
+def crea_engine(url: str = DATABASE_URL, pragmas: dict = None):
+    """
+    Engine SQLite condiviso fra i thread degli endpoint sincroni.
+    I PRAGMA (WAL, synchronous, cache...) vengono applicati alla creazione di ogni connessione.
+
+    Le transazioni sono aperte esplicitamente: BEGIN IMMEDIATE per le connessioni con l'opzione
+    "scrittura" (vedi SessionScrittura), così le scritture concorrenti di più worker si mettono in
+    coda sul lock del database (busy_timeout) invece di fallire con "database is locked"
+    quando una transazione di lettura prova a diventare di scrittura.
+    """
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+    nuovo_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(nuovo_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        applica_pragmas(dbapi_connection, pragmas)
+        # Il BEGIN viene emesso da _on_begin, non dal driver sqlite3
+        dbapi_connection.isolation_level = None
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(nuovo_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get("scrittura") else "BEGIN")
+
+    @event.listens_for(nuovo_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # Connessioni ereditate con un fork (worker, process pool) non vanno riusate nel figlio
+        if connection_record.info["pid"] != os.getpid():
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError("Connessione creata in un altro processo")
+
+    return nuovo_engine
+
+
 # 🔹 Configura il database
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = crea_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessioni degli endpoint che scrivono: la transazione prende subito il lock di scrittura
+SessionScrittura = sessionmaker(autocommit=False, autoflush=False, bind=engine.execution_options(scrittura=True))
 Base = declarative_base()
 
 # 🔹 Controllo e creazione del database
@@ -33,7 +102,132 @@ def get_db():
         db.close()
 
 
+def get_db_scrittura():
+    db = SessionScrittura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 🔹 Engine async opzionale (aiosqlite), usato dagli endpoint di routes_async.py
+async_engine = None
+AsyncSessionLocal = None
+
+if config.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}")
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _on_connect_async(dbapi_connection, connection_record):
+        applica_pragmas(dbapi_connection, sqlite_pragmas())
+
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def is_database_empty():
     with engine.connect() as conn:
         result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
         return len(result.fetchall()) == 0
+
+
+@contextmanager
+def lock_inizializzazione():
+    """
+    Lock esclusivo fra processi su un file accanto al database: i worker di uvicorn avviati
+    insieme eseguono init_db uno alla volta (gli altri trovano poi tutto già creato).
+    """
+    with open(DATABASE_PATH + ".init.lock", "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK rinuncia dopo 10 secondi: si riprova
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def init_db():
+    """
+    Crea le tabelle mancanti e aggiunge gli indici dichiarati in models.py
+    anche ai database già esistenti (create_all non tocca le tabelle presenti).
+    Sicura con più processi avviati insieme (vedi lock_inizializzazione).
+    """
+    with lock_inizializzazione():
+        _init_db()
+
+
+def _init_db():
+    from models import Base as ModelsBase
+    from schema_compatto import schema_compatto_presente
+
+    ModelsBase.metadata.create_all(bind=engine)
+
+    # Le colonne di timbrature su disco devono corrispondere ai tipi scelti da config.SCHEMA_COMPATTO
+    with engine.connect() as conn:
+        compatto = schema_compatto_presente(conn.connection)
+    if compatto is not None and compatto != config.SCHEMA_COMPATTO:
+        schema = "compatto" if config.SCHEMA_COMPATTO else "testo"
+        raise RuntimeError(
+            f"Schema delle timbrature diverso da MONTARREDA_SCHEMA_COMPATTO: "
+            f"eseguire prima 'python schema_compatto.py {schema}'."
+        )
+    for table in ModelsBase.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                # Es. indice unique su dati storici con duplicati: l'app resta utilizzabile
+                print(f"⚠️ Impossibile creare l'indice {index.name}: {e}")
+
+    # Indice non univoco sostituito da uq_timbrature_utente_data (se creato)
+    with engine.begin() as conn:
+        esiste = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_timbrature_utente_data'"
+        )).first()
+        if esiste:
+            conn.execute(text("DROP INDEX IF EXISTS ix_timbrature_utente_data"))
+
+    # Indice full-text dei clienti per /lavoro/search (richiede SQLite con FTS5)
+    from sqlalchemy.exc import OperationalError
+    from ricerca import inizializza as inizializza_ricerca
+
+    try:
+        with engine.begin() as conn:
+            inizializza_ricerca(conn)
+    except OperationalError as e:
+        print(f"⚠️ Ricerca clienti non disponibile: {e}")
+
+    # Riepiloghi mensili: costruiti al primo avvio se il database ha già dati
+    from riepiloghi import inizializza
+
+    with SessionLocal() as db:
+        inizializza(db)
+
+    # Registro modifiche per /sync/changes: al primo avvio contiene tutte le righe esistenti
+    from sincronizzazione import inizializza as inizializza_registro
+
+    with SessionLocal() as db:
+        inizializza_registro(db)
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+from typing import Optional
+from archivio import sessione_storica
+from database import SessionLocal
+from models import Lavoro, Timbratura, User
+from queries import filtra_lavori, totali_lavori
+
+# Righe lette dal cursore e scritte nella risposta per ogni blocco
+RIGHE_PER_BLOCCO = 1000
+
+FORMATI = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Stesse colonne (e stesso ordine) dei report PDF: intestazioni del CSV
+INTESTAZIONE_ATTIVITA = ["Commessa", "Data", "Cliente", "Pagamento", "Contratto", "Saldo", "Extra"]
+INTESTAZIONE_TIMBRATURE = ["Utente", "Data", "Ingresso", "Uscita", "Ore Lavorate"]
+
+# Chiavi dei record NDJSON: i nomi dei campi di modelli e API (es. saldo = tipo di pagamento)
+CAMPI_ATTIVITA = ["commessa", "data", "cliente", "saldo", "contratto", "saldato", "extra_consegna"]
+CAMPI_TIMBRATURE = ["utente", "data", "orario_ingresso", "orario_uscita", "ore_lavorate"]
+
+
+def _importo(valore) -> float:
+    return round(valore or 0.0, 2)
+
+
+def _scrivi(formato: str, intestazione, chiavi, righe, trailer):
+    """
+    Serializza le righe (liste di valori) in CSV (con intestazione) o NDJSON (con chiavi) a blocchi,
+    con un record finale di totali.
+    trailer() viene chiamata solo dopo l'ultima riga e restituisce (riga_csv, oggetto_ndjson).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if formato == "csv":
+        writer.writerow(intestazione)
+
+    for numero, riga in enumerate(righe, start=1):
+        if formato == "csv":
+            writer.writerow([f"{v:.2f}" if isinstance(v, float) else v for v in riga])
+        else:
+            buffer.write(json.dumps(dict(zip(chiavi, riga)), ensure_ascii=False) + "\n")
+
+        if numero % RIGHE_PER_BLOCCO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    riga_totale, totali = trailer()
+    if formato == "csv":
+        writer.writerow([f"{v:.2f}" if isinstance(v, float) else v for v in riga_totale])
+    else:
+        buffer.write(json.dumps({"totali": totali}, ensure_ascii=False) + "\n")
+
+    yield buffer.getvalue()
+
+
+def stream_attivita(formato: str, data_da: date, data_a: date, commessa: Optional[str] = None):
+    """ Lavori del periodo in streaming (sessione propria, aperta per tutta la durata della risposta) """
+    with SessionLocal() as sessione, sessione_storica(sessione, data_da, data_a) as db:
+        query = filtra_lavori(
+            db.query(
+                Lavoro.commessa, Lavoro.data, Lavoro.cliente, Lavoro.saldo,
+                Lavoro.contratto, Lavoro.saldato, Lavoro.extra_consegna
+            ),
+            data_da, data_a, commessa
+        ).order_by(Lavoro.data, Lavoro.id).yield_per(RIGHE_PER_BLOCCO)
+
+        righe = (
+            [lav.commessa, str(lav.data), lav.cliente, lav.saldo, _importo(lav.contratto), _importo(lav.saldato), _importo(lav.extra_consegna)]
+            for lav in query
+        )
+
+        def trailer():
+            totali = totali_lavori(db, data_da, data_a, commessa)
+            riga = ["Totale", "", "", "", totali["contratto"], totali["saldato_complessivo"], totali["extra_su_consegne"]]
+            return riga, totali
+
+        yield from _scrivi(formato, INTESTAZIONE_ATTIVITA, CAMPI_ATTIVITA, righe, trailer)
+
+
+def stream_timbrature(formato: str, data_da: date, data_a: date, utente: Optional[int] = None):
+    """ Timbrature del periodo [data_da, data_a) in streaming, di un utente o di tutti """
+    with SessionLocal() as sessione, sessione_storica(sessione, data_da, data_a - timedelta(days=1)) as db:
+        query = db.query(
+            User.full_name, Timbratura.data, Timbratura.orario_ingresso, Timbratura.orario_uscita, Timbratura.tempo_lavorativo
+        ).join(User, Timbratura.id_utente == User.id).filter(
+            Timbratura.data >= data_da,
+            Timbratura.data < data_a
+        )
+        if utente is not None:
+            query = query.filter(Timbratura.id_utente == utente)
+        query = query.order_by(Timbratura.data, Timbratura.id_utente).yield_per(RIGHE_PER_BLOCCO)
+
+        totale = {"minuti": 0}
+
+        def righe():
+            for t in query:
+                totale["minuti"] += t.tempo_lavorativo
+                yield [t.full_name, str(t.data), str(t.orario_ingresso), str(t.orario_uscita), round(t.tempo_lavorativo / 60, 2)]
+
+        def trailer():
+            ore = totale["minuti"] / 60
+            return ["Totale Ore", "", "", "", ore], {"ore_lavorate": round(ore, 2), "tempo_lavorativo": totale["minuti"]}
+
+        yield from _scrivi(formato, INTESTAZIONE_TIMBRATURE, CAMPI_TIMBRATURE, righe(), trailer)
@@ -0,0 +1,153 @@
+import argparse
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy.orm import Session
+from models import Lavoro, Timbratura, User
+from queries import SALDI
+from riepiloghi import ricostruisci
+from sincronizzazione import registra_nuove_righe, ultimo_id
+from versioni import chiavi_intervallo, incrementa_versione
+
+# 🔹 Generatore di dati sintetici per test di carico e benchmark (vedi benchmarks/carico_api.py):
+# N utenti con anni di timbrature e lavori, scritti con executemany a blocchi.
+
+BATCH_SIZE = 5000
+
+NOMI = ("Marco", "Luca", "Giuseppe", "Anna", "Francesca", "Paolo", "Giulia", "Andrea", "Sara", "Antonio")
+COGNOMI = ("Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco",
+           "Bruno", "Gallo", "Conti", "De Luca", "Costa", "Giordano", "Mancini", "Rizzo", "Lombardi", "Moretti")
+COMMESSE = {"MOV": 0.7, "OLIE": 0.3}
+PESI_SALDI = {"Contanti": 20, "Assegno": 10, "Bonifico": 35, "Finanziamento": 15, "Pag. Negozio": 12, "Sospeso": 8}
+
+
+def _minuti(orario: time) -> int:
+    return orario.hour * 60 + orario.minute
+
+
+def _orario(minuti: int) -> time:
+    return time(minuti // 60, minuti % 60)
+
+
+def _inserisci(db: Session, tabella, righe):
+    """ Scrive le righe generate con executemany, BATCH_SIZE alla volta """
+    blocco = []
+    totale = 0
+    for riga in righe:
+        blocco.append(riga)
+        if len(blocco) >= BATCH_SIZE:
+            db.execute(tabella.insert(), blocco)
+            totale += len(blocco)
+            blocco = []
+    if blocco:
+        db.execute(tabella.insert(), blocco)
+        totale += len(blocco)
+    return totale
+
+
+def giorni_lavorativi(inizio: date, fine: date, rng: random.Random):
+    """ Giorni da lunedì a venerdì, più un sabato su quattro """
+    giorno = inizio
+    while giorno <= fine:
+        if giorno.weekday() < 5 or (giorno.weekday() == 5 and rng.random() < 0.25):
+            yield giorno
+        giorno += timedelta(days=1)
+
+
+def genera_timbrature(id_utenti, inizio: date, fine: date, rng: random.Random):
+    for giorno in giorni_lavorativi(inizio, fine, rng):
+        for id_utente in id_utenti:
+            # Ferie, malattia, permessi
+            if rng.random() < 0.08:
+                continue
+            ingresso = _orario(rng.randint(_minuti(time(7, 30)), _minuti(time(9, 0))))
+            uscita = _orario(min(_minuti(ingresso) + rng.randint(6 * 60, 10 * 60), _minuti(time(21, 0))))
+            yield {
+                "id_utente": id_utente,
+                "data": giorno,
+                "orario_ingresso": ingresso,
+                "orario_uscita": uscita,
+                "tempo_lavorativo": (datetime.combine(giorno, uscita) - datetime.combine(giorno, ingresso)).seconds // 60
+            }
+
+
+def genera_lavori(inizio: date, fine: date, lavori_al_giorno: int, clienti: int, rng: random.Random):
+    commesse, pesi_commesse = list(COMMESSE), list(COMMESSE.values())
+    saldi = list(SALDI)
+    pesi_saldi = [PESI_SALDI[saldo] for saldo in saldi]
+    for giorno in giorni_lavorativi(inizio, fine, rng):
+        for _ in range(max(0, round(rng.gauss(lavori_al_giorno, lavori_al_giorno / 3)))):
+            contratto = round(min(rng.lognormvariate(7, 0.8), 50000), 2)
+            saldo = rng.choices(saldi, pesi_saldi)[0]
+            saldato = 0.0 if saldo == "Sospeso" else round(contratto * rng.choice((0.3, 0.5, 1, 1, 1)), 2)
+            yield {
+                "data": giorno,
+                "cliente": f"{rng.choice(COGNOMI)} {rng.choice(NOMI)} {rng.randint(1, clienti)}",
+                "contratto": contratto,
+                "saldato": saldato,
+                "commessa": rng.choices(commesse, pesi_commesse)[0],
+                "saldo": saldo,
+                "extra_consegna": rng.choice((0.0, 0.0, 0.0, 30.0, 50.0, 80.0))
+            }
+
+
+def genera(
+    db: Session,
+    utenti: int = 20,
+    anni: int = 3,
+    lavori_al_giorno: int = 15,
+    clienti: int = 5000,
+    seed: Optional[int] = 42,
+    fine: Optional[date] = None
+):
+    """
+    Aggiunge al database `utenti` utenti con `anni` anni di timbrature e lavori fino a `fine` (default: oggi).
+    Con lo stesso seed i dati generati sono sempre gli stessi. Restituisce il numero di righe per tabella.
+    """
+    rng = random.Random(seed)
+    fine = fine or date.today()
+    inizio = date(fine.year - anni, fine.month, 1)
+
+    dopo_id = {modello: ultimo_id(db, modello) for modello in (User, Timbratura, Lavoro)}
+    primo_id = dopo_id[User] + 1
+    _inserisci(db, User.__table__, (
+        {"full_name": f"{rng.choice(NOMI)} {rng.choice(COGNOMI)} {primo_id + i}"} for i in range(utenti)
+    ))
+    id_utenti = [u.id for u in db.query(User.id).filter(User.id >= primo_id).order_by(User.id)]
+
+    conteggi = {
+        "users": len(id_utenti),
+        "timbrature": _inserisci(db, Timbratura.__table__, genera_timbrature(id_utenti, inizio, fine, rng)),
+        "lavoro": _inserisci(db, Lavoro.__table__, genera_lavori(inizio, fine, lavori_al_giorno, clienti, rng)),
+    }
+
+    for modello, ultimo in dopo_id.items():
+        registra_nuove_righe(db, modello, ultimo)
+    incrementa_versione(
+        db, "users", *chiavi_intervallo("timbrature", inizio, fine), *chiavi_intervallo("lavoro", inizio, fine)
+    )
+    # Riepiloghi mensili ricalcolati in blocco (ricostruisci esegue anche il commit)
+    ricostruisci(db)
+    return conteggi
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera dati sintetici (utenti, timbrature, lavori).")
+    parser.add_argument("--utenti", type=int, default=20)
+    parser.add_argument("--anni", type=int, default=3)
+    parser.add_argument("--lavori-al-giorno", type=int, default=15)
+    parser.add_argument("--clienti", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="File SQLite da popolare (default: MONTARREDA_DATABASE_PATH o database.db)")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["MONTARREDA_DATABASE_PATH"] = args.database
+
+    from database import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        conteggi = genera(db, args.utenti, args.anni, args.lavori_al_giorno, args.clienti, args.seed)
+    print("✅ Dati generati: " + ", ".join(f"{tabella} {n}" for tabella, n in conteggi.items()))
@@ -0,0 +1,164 @@
+import argparse
+import csv
+import codecs
+import json
+from datetime import datetime
+from sqlalchemy.orm import Session
+from archivio import verifica_anno_aperto
+from models import Lavoro
+from riepiloghi import DeltaRiepiloghi
+from sincronizzazione import registra_nuove_righe, ultimo_id
+from versioni import chiave_mese, incrementa_versione
+
+# Righe inserite per ogni executemany
+BATCH_SIZE = 500
+
+# Scarti riportati in dettaglio nella risposta (gli altri vengono solo contati)
+MAX_SCARTI = 1000
+
+
+def _importo(valore, obbligatorio: bool = True):
+    """ Importo da stringa o numero; accetta anche la virgola decimale dei fogli Excel """
+    if valore is None or (isinstance(valore, str) and not valore.strip()):
+        if obbligatorio:
+            raise ValueError("valore mancante")
+        return 0.0
+    if isinstance(valore, str):
+        valore = valore.strip().replace("€", "").replace(",", ".")
+    return float(valore)
+
+
+def valida_lavoro(riga: dict) -> dict:
+    """ Converte una riga importata nei valori della tabella lavoro (ValueError se non valida) """
+    try:
+        giorno = datetime.strptime(str(riga.get("data", "")).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("data: formato non valido, usa YYYY-MM-DD")
+    verifica_anno_aperto(giorno)
+
+    valori = {"data": giorno}
+    for campo in ("cliente", "commessa", "saldo"):
+        testo = str(riga.get(campo) or "").strip()
+        if not testo:
+            raise ValueError(f"{campo}: valore mancante")
+        valori[campo] = testo
+
+    for campo, obbligatorio in (("contratto", True), ("saldato", True), ("extra_consegna", False)):
+        try:
+            valori[campo] = _importo(riga.get(campo), obbligatorio)
+        except ValueError as e:
+            raise ValueError(f"{campo}: {e}")
+
+    return valori
+
+
+# I lettori producono un dict per riga, oppure l'eccezione di parsing della riga
+# (così un errore non interrompe il generatore e la riga viene solo scartata).
+
+def righe_csv(testo):
+    """ Legge un CSV riga per riga (separatore , oppure ; rilevato dall'intestazione) """
+    intestazione = next(testo, "")
+    separatore = ";" if intestazione.count(";") > intestazione.count(",") else ","
+    campi = [c.strip().lower() for c in next(csv.reader([intestazione], delimiter=separatore), [])]
+    lettore = csv.DictReader(testo, fieldnames=campi, delimiter=separatore)
+    while True:
+        try:
+            yield next(lettore)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield e
+
+
+def righe_jsonl(testo):
+    """ Legge un file JSON lines (un oggetto per riga) """
+    for linea in testo:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield json.loads(linea)
+        except ValueError as e:
+            yield e
+
+
+def importa_lavori(db: Session, righe, batch_size: int = BATCH_SIZE):
+    """
+    Importa le righe in un'unica transazione, a blocchi di executemany.
+    Le righe non valide vengono scartate e riportate nel risultato.
+    """
+    blocco = []
+    mesi = set()
+    delta = DeltaRiepiloghi()
+    importati = 0
+    dopo_id = ultimo_id(db, Lavoro)
+    scartati = 0
+    dettaglio_scarti = []
+
+    def scarta(numero, errore):
+        nonlocal scartati
+        scartati += 1
+        if len(dettaglio_scarti) < MAX_SCARTI:
+            dettaglio_scarti.append({"riga": numero, "errore": errore})
+
+    for numero, riga in enumerate(righe, start=1):
+        if isinstance(riga, Exception):
+            scarta(numero, f"riga non leggibile: {riga}")
+            continue
+
+        try:
+            valori = valida_lavoro(riga)
+        except (ValueError, TypeError, AttributeError) as e:
+            scarta(numero, str(e))
+            continue
+
+        blocco.append(valori)
+        mesi.add(chiave_mese("lavoro", valori["data"]))
+        delta.lavoro_registrato(
+            valori["data"], valori["commessa"], valori["saldo"],
+            valori["contratto"], valori["saldato"], valori["extra_consegna"]
+        )
+        if len(blocco) >= batch_size:
+            db.execute(Lavoro.__table__.insert(), blocco)
+            importati += len(blocco)
+            blocco = []
+
+    if blocco:
+        db.execute(Lavoro.__table__.insert(), blocco)
+        importati += len(blocco)
+
+    delta.applica(db)
+    registra_nuove_righe(db, Lavoro, dopo_id)
+    incrementa_versione(db, *mesi)
+    db.commit()
+
+    return {"importati": importati, "scartati": scartati, "dettaglio_scarti": dettaglio_scarti}
+
+
+def leggi_file(file, formato: str):
+    """ Restituisce il generatore di righe per un file binario aperto """
+    testo = codecs.getreader("utf-8-sig")(file)
+    if formato == "csv":
+        return righe_csv(testo)
+    if formato == "jsonl":
+        return righe_jsonl(testo)
+    raise ValueError(f"Formato non supportato: {formato}")
+
+
+if __name__ == "__main__":
+    from database import SessionScrittura, init_db
+
+    parser = argparse.ArgumentParser(description="Importa lavori da un file CSV o JSON lines.")
+    parser.add_argument("file", help="Percorso del file da importare")
+    parser.add_argument("--formato", choices=("csv", "jsonl"), help="Predefinito: dall'estensione del file")
+    args = parser.parse_args()
+
+    formato = args.formato or ("jsonl" if args.file.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv")
+
+    init_db()
+    with open(args.file, "rb") as f, SessionScrittura() as db:
+        esito = importa_lavori(db, leggi_file(f, formato))
+
+    print(f"✅ Importati {esito['importati']} lavori, scartati {esito['scartati']}.")
+    for scarto in esito["dettaglio_scarti"]:
+        print(f"⚠️ Riga {scarto['riga']}: {scarto['errore']}")
@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import threading
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import List, Optional
+import config
+from archivio import sessione_storica
+from database import DATABASE_PATH, SessionLocal, SessionScrittura
+from models import EsportazioneBatch, User
+from queries import commesse_periodo, intervallo_mese, lista_lavori, timbrature_export, totali_lavori
+from reports import RigaLavoro, RigaTimbratura, pdf_attivita, pdf_timbrature
+
+# Processi dedicati al rendering dei PDF in batch
+MAX_PROCESSI = 2
+
+# 🔹 Stato dei job nella tabella esportazioni_batch e ZIP nella cartella CARTELLA: con più worker
+# uvicorn lo stato e il download di un job sono disponibili da qualunque processo.
+# Il rendering resta nel processo che ha ricevuto la richiesta.
+
+# Job conservati (i più vecchi vengono eliminati insieme al loro ZIP)
+MAX_JOBS = 20
+
+# Un job in corso aggiorna "aggiornato" almeno ogni BATTITO secondi; dopo MAX_SILENZIO secondi
+# senza segnali il processo che lo eseguiva è considerato terminato e il job fallito
+BATTITO = 10
+MAX_SILENZIO = 300
+
+CARTELLA = config.ESPORTAZIONI_DIR or os.path.join(os.path.dirname(os.path.abspath(DATABASE_PATH)), "esportazioni")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ Crea il process pool alla prima esportazione batch """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESSI)
+        return _pool
+
+
+def chiudi_pool():
+    """ Allo spegnimento del server: attende i rendering in corso e chiude i processi """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def percorso_zip(job_id: str) -> str:
+    return os.path.join(CARTELLA, f"batch_{job_id}.zip")
+
+
+def nome_file(testo: str) -> str:
+    """ Parte di un nome di file nello ZIP: solo lettere, cifre, _ e - (niente percorsi) """
+    return re.sub(r"[^A-Za-z0-9_-]", "_", testo)
+
+
+def interrotto(job: EsportazioneBatch) -> bool:
+    """ Job mai concluso il cui processo ha smesso di aggiornarlo (worker terminato) """
+    return job.stato in ("in_coda", "in_corso") and datetime.now() - job.aggiornato > timedelta(seconds=MAX_SILENZIO)
+
+
+def as_dict(job: EsportazioneBatch):
+    stato, errori = job.stato, json.loads(job.errori)
+    if interrotto(job):
+        stato = "errore"
+        errori.append({"file": None, "errore": "Esportazione interrotta: il processo che la eseguiva è terminato."})
+    return {
+        "job_id": job.id,
+        "anno": job.anno,
+        "mese": job.mese,
+        "stato": stato,
+        "totale": job.totale,
+        "completati": job.completati,
+        "errori": errori,
+        "creato": job.creato.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def _aggiorna(job_id: str, **valori):
+    """ Aggiorna lo stato del job (e il suo ultimo segnale); False se nel frattempo è stato eliminato """
+    valori["aggiornato"] = datetime.now()
+    with SessionScrittura() as db:
+        aggiornate = db.query(EsportazioneBatch).filter(EsportazioneBatch.id == job_id).update(valori)
+        db.commit()
+    return aggiornate > 0
+
+
+def _prepara_documenti(anno: int, mese: int, utenti: Optional[List[int]], commesse: Optional[List[str]]):
+    """
+    Legge dal database i dati di ogni report e chiude subito la sessione:
+    ai processi vengono passate solo tuple semplici.
+    """
+    inizio, fine = intervallo_mese(anno, mese)
+    data_a = fine - timedelta(days=1)
+    periodo = f"{anno}-{mese:02d}"
+    documenti = []
+
+    with SessionLocal() as sessione, sessione_storica(sessione, inizio, data_a) as db:
+        if utenti is None:
+            utenti = [id_utente for (id_utente,) in db.query(User.id).order_by(User.id)]
+        for id_utente in utenti:
+            nome_utente, righe = timbrature_export(db, id_utente, anno, mese)
+            if not righe:
+                continue
+            documenti.append((
+                f"timbrature_{periodo}_{id_utente}.pdf",
+                pdf_timbrature,
+                (anno, mese, nome_utente, [RigaTimbratura(*r) for r in righe])
+            ))
+
+        if commesse is None:
+            commesse = commesse_periodo(db, inizio, data_a)
+        for commessa in commesse:
+            totali = totali_lavori(db, inizio, data_a, commessa)
+            if not totali["numero_lavori"]:
+                continue
+            lavori = [RigaLavoro(*r) for r in lista_lavori(db, inizio, data_a, commessa)]
+            nome = f"attivita_{periodo}_{nome_file(commessa)}"
+            if any(documento[0] == f"{nome}.pdf" for documento in documenti):
+                # Commesse diverse con lo stesso nome di file dopo la pulizia
+                nome = f"{nome}_{len(documenti)}"
+            documenti.append((
+                f"{nome}.pdf",
+                pdf_attivita,
+                (inizio, data_a, lavori, totali)
+            ))
+
+    return documenti
+
+
+def _esegui(job_id: str, anno: int, mese: int, utenti, commesse):
+    errori = []
+    try:
+        _aggiorna(job_id, stato="in_corso")
+        documenti = _prepara_documenti(anno, mese, utenti, commesse)
+        _aggiorna(job_id, totale=len(documenti))
+
+        pool = get_pool()
+        futures = {pool.submit(funzione, *argomenti): nome for nome, funzione, argomenti in documenti}
+
+        # Lo ZIP prende il nome definitivo solo se completo
+        percorso = percorso_zip(job_id)
+        temporaneo = percorso + ".tmp"
+        os.makedirs(CARTELLA, exist_ok=True)
+        with zipfile.ZipFile(temporaneo, "w", zipfile.ZIP_DEFLATED) as archivio:
+            in_corso, completati = set(futures), 0
+            while in_corso:
+                # Anche senza report completati il job segnala di essere ancora vivo
+                pronti, in_corso = wait(in_corso, timeout=BATTITO, return_when=FIRST_COMPLETED)
+                for future in pronti:
+                    nome = futures[future]
+                    try:
+                        archivio.writestr(nome, future.result())
+                    except Exception as e:
+                        errori.append({"file": nome, "errore": str(e)})
+                    completati += 1
+                _aggiorna(job_id, completati=completati, errori=json.dumps(errori))
+        os.replace(temporaneo, percorso)
+
+        if not _aggiorna(job_id, stato="completato"):
+            os.remove(percorso)
+    except Exception as e:
+        errori.append({"file": None, "errore": str(e)})
+        _aggiorna(job_id, stato="errore", errori=json.dumps(errori))
+
+
+def _elimina_vecchi(db):
+    """ Oltre MAX_JOBS: elimina i job più vecchi e i loro ZIP """
+    vecchi = [
+        job_id for (job_id,) in
+        db.query(EsportazioneBatch.id).order_by(EsportazioneBatch.creato.desc()).offset(MAX_JOBS)
+    ]
+    if not vecchi:
+        return
+    db.query(EsportazioneBatch).filter(EsportazioneBatch.id.in_(vecchi)).delete(synchronize_session=False)
+    for job_id in vecchi:
+        try:
+            os.remove(percorso_zip(job_id))
+        except FileNotFoundError:
+            pass
+
+
+def avvia_batch(anno: int, mese: int, utenti: Optional[List[int]] = None, commesse: Optional[List[str]] = None):
+    """
+    Avvia in background la generazione dei report del mese e restituisce il job.
+    utenti/commesse a None significa "tutti quelli con dati nel periodo".
+    """
+    with SessionScrittura(expire_on_commit=False) as db:
+        job = EsportazioneBatch(
+            id=uuid.uuid4().hex, anno=anno, mese=mese, stato="in_coda",
+            totale=0, completati=0, errori="[]", creato=datetime.now(), aggiornato=datetime.now()
+        )
+        db.add(job)
+        db.flush()
+        _elimina_vecchi(db)
+        db.commit()
+
+    threading.Thread(target=_esegui, args=(job.id, anno, mese, utenti, commesse), daemon=True).start()
+    return job
+
+
+def get_job(job_id: str):
+    with SessionLocal() as db:
+        return db.get(EsportazioneBatch, job_id)
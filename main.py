@@ -1,12 +1,22 @@
 import sys
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 import uvicorn
 from fastapi.openapi.docs import get_swagger_ui_html
-from routes import router  # ✅ Importa correttamente
+from routes import router, router_letture  # ✅ Importa correttamente
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+import config
+import metriche
+from risposte import RispostaJSON
+from archivio import TroppiArchivi
+from database import engine, init_db
+from jobs import chiudi_pool
+from rendering import chiudi_pool_report
 
-app = FastAPI()
+init_db()
+
+app = FastAPI(default_response_class=RispostaJSON)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,8 +26,26 @@ app.add_middleware(
     allow_headers=["*"],   # ✅ Permette tutti gli header
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=config.GZIP_MIN_SIZE)
+
+# Latenze per endpoint e query SQL per richiesta, esposte su /metrics
+metriche.installa(app)
+
 app.include_router(router)
 
+# Letture principali: versione sync (threadpool) o async (aiosqlite) secondo la configurazione
+if config.DB_ASYNC:
+    import routes_async
+    app.include_router(routes_async.router)
+else:
+    app.include_router(router_letture)
+
+
+# Letture storiche su più anni archiviati di quanti SQLite ne colleghi insieme (vedi archivio.py)
+@app.exception_handler(TroppiArchivi)
+def troppi_archivi(request: Request, errore: TroppiArchivi):
+    return RispostaJSON(status_code=400, content={"detail": str(errore)})
+
 
 @app.get("/swagger", include_in_schema=False)
 async def custom_swagger_ui_html():
@@ -35,6 +63,21 @@ def home():
     return {"message": "Benvenuto nell'App di gestione!"}
 
 
+# Spegnimento: uvicorn attende le richieste in corso (GRACEFUL_TIMEOUT), poi si liberano pool e connessioni
+@app.on_event("shutdown")
+def chiudi_risorse():
+    chiudi_pool()
+    chiudi_pool_report()
+    engine.dispose()
+
+
 # Avvia il server FastAPI
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # Con più worker uvicorn importa l'app in ogni processo: serve il riferimento "modulo:app"
+    uvicorn.run(
+        "main:app",
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT
+    )
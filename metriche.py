@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+import config
+
+# 🔹 Metriche in formato Prometheus: latenza per endpoint, query SQL per richiesta,
+# tempi di generazione dei PDF. Esposte da GET /metrics (vedi routes.py).
+
+BUCKET_SECONDI = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_QUERY = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+log_sql_lente = logging.getLogger("montarreda.sql")
+
+# Statistiche SQL della richiesta in corso (condivise con il thread dell'endpoint)
+_richiesta = ContextVar("statistiche_richiesta", default=None)
+
+
+def _etichette(nomi, valori) -> str:
+    coppie = []
+    for nome, valore in zip(nomi, valori):
+        valore = str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        coppie.append(f'{nome}="{valore}"')
+    return "{" + ",".join(coppie) + "}" if coppie else ""
+
+
+class Contatore:
+    def __init__(self, nome: str, descrizione: str, etichette=()):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self._valori = {}
+        self._lock = threading.Lock()
+
+    def incrementa(self, *valori_etichette, valore: float = 1):
+        with self._lock:
+            self._valori[valori_etichette] = self._valori.get(valori_etichette, 0) + valore
+
+    def esporta(self):
+        righe = [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chiave, valore in sorted(self._valori.items()):
+                righe.append(f"{self.nome}{_etichette(self.etichette, chiave)} {valore}")
+        return righe
+
+
+class Indicatore:
+    """ Valore istantaneo (gauge) letto da funzione() al momento dell'esportazione """
+
+    def __init__(self, nome: str, descrizione: str, funzione):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.funzione = funzione
+
+    def esporta(self):
+        return [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} gauge", f"{self.nome} {self.funzione()}"]
+
+
+class Istogramma:
+    def __init__(self, nome: str, descrizione: str, etichette=(), bucket=BUCKET_SECONDI):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self.bucket = tuple(bucket)
+        self._serie = {}  # etichette -> [conteggi per bucket, somma, totale]
+        self._lock = threading.Lock()
+
+    def osserva(self, valore: float, *valori_etichette):
+        with self._lock:
+            serie = self._serie.get(valori_etichette)
+            if serie is None:
+                serie = self._serie[valori_etichette] = [[0] * len(self.bucket), 0.0, 0]
+            for i, limite in enumerate(self.bucket):
+                if valore <= limite:
+                    serie[0][i] += 1
+            serie[1] += valore
+            serie[2] += 1
+
+    def esporta(self):
+        righe = [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            for chiave, (conteggi, somma, totale) in sorted(self._serie.items()):
+                base = _etichette(self.etichette, chiave)
+                for limite, conteggio in zip(self.bucket, conteggi):
+                    bucket = _etichette(self.etichette + ("le",), chiave + (limite,))
+                    righe.append(f"{self.nome}_bucket{bucket} {conteggio}")
+                bucket = _etichette(self.etichette + ("le",), chiave + ("+Inf",))
+                righe.append(f"{self.nome}_bucket{bucket} {totale}")
+                righe.append(f"{self.nome}_sum{base} {somma}")
+                righe.append(f"{self.nome}_count{base} {totale}")
+        return righe
+
+
+richieste = Contatore(
+    "montarreda_http_requests_total", "Richieste HTTP servite", ("method", "route", "status")
+)
+latenza = Istogramma(
+    "montarreda_http_request_duration_seconds", "Durata delle richieste HTTP", ("method", "route")
+)
+query_per_richiesta = Istogramma(
+    "montarreda_request_sql_queries", "Query SQL eseguite per richiesta", ("route",), BUCKET_QUERY
+)
+tempo_sql_per_richiesta = Istogramma(
+    "montarreda_request_sql_seconds", "Tempo speso in query SQL per richiesta", ("route",)
+)
+tempo_pdf = Istogramma(
+    "montarreda_pdf_render_seconds", "Tempo di generazione dei report PDF", ("report",)
+)
+query_lente = Contatore(
+    "montarreda_sql_slow_queries_total", "Query SQL oltre la soglia SLOW_QUERY_MS"
+)
+
+METRICHE = [richieste, latenza, query_per_richiesta, tempo_sql_per_richiesta, tempo_pdf, query_lente]
+
+
+def registra(metrica):
+    """ Aggiunge a /metrics una metrica definita in un altro modulo """
+    METRICHE.append(metrica)
+    return metrica
+
+
+def esporta_prometheus() -> str:
+    righe = []
+    for metrica in METRICHE:
+        righe.extend(metrica.esporta())
+    return "\n".join(righe) + "\n"
+
+
+@contextmanager
+def misura_pdf(report: str):
+    """ Registra il tempo di generazione di un report PDF """
+    inizio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempo_pdf.osserva(time.perf_counter() - inizio, report)
+
+
+def strumenta_engine(engine):
+    """ Conta le query e il loro tempo per la richiesta corrente; registra le query lente """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _prima(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inizio_query", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _dopo(conn, cursor, statement, parameters, context, executemany):
+        durata = time.perf_counter() - conn.info["inizio_query"].pop()
+
+        statistiche = _richiesta.get()
+        if statistiche is not None:
+            statistiche["query"] += 1
+            statistiche["tempo_sql"] += durata
+
+        if config.SLOW_QUERY_MS and durata * 1000 >= config.SLOW_QUERY_MS:
+            query_lente.incrementa()
+            log_sql_lente.warning("Query lenta (%.1f ms): %s", durata * 1000, statement)
+
+
+class MetricheMiddleware:
+    """
+    Middleware ASGI: misura ogni richiesta HTTP e le query SQL che ha eseguito.
+    Le richieste sono raggruppate per percorso della route (es. /timbrature/{timbratura_id}).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        statistiche = {"query": 0, "tempo_sql": 0.0}
+        token = _richiesta.set(statistiche)
+        stato = {"codice": 500}
+
+        async def send_con_stato(messaggio):
+            if messaggio["type"] == "http.response.start":
+                stato["codice"] = messaggio["status"]
+            await send(messaggio)
+
+        inizio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_con_stato)
+        finally:
+            durata = time.perf_counter() - inizio
+            _richiesta.reset(token)
+
+            route = getattr(scope.get("route"), "path", None) or "non_trovata"
+            metodo = scope.get("method", "")
+            richieste.incrementa(metodo, route, stato["codice"])
+            latenza.osserva(durata, metodo, route)
+            query_per_richiesta.osserva(statistiche["query"], route)
+            tempo_sql_per_richiesta.osserva(statistiche["tempo_sql"], route)
+
+
+def installa(app):
+    """ Registra il middleware e strumenta gli engine di database.py """
+    from database import async_engine, engine
+
+    app.add_middleware(MetricheMiddleware)
+    strumenta_engine(engine)
+    if async_engine is not None:
+        strumenta_engine(async_engine.sync_engine)
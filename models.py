@@ -1,11 +1,59 @@
-from sqlalchemy import Column, Integer, String, Date, Time, Float
+from datetime import date, time
+from sqlalchemy import Boolean, Column, Integer, String, Date, Time, Float
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+import config
 
 
 Base = declarative_base()
 
+# Numero di giorno giuliano di date.fromordinal(0): giorno giuliano = ordinale + GIORNO_GIULIANO_ZERO
+GIORNO_GIULIANO_ZERO = 1721425
+
+# Orari già costruiti per ogni minuto del giorno
+_ORARI = [time(minuti // 60, minuti % 60) for minuti in range(24 * 60)]
+
+
+class GiornoGiuliano(TypeDecorator):
+    """
+    Data salvata come numero intero di giorno giuliano: nessun parsing di stringhe in lettura e
+    le funzioni di data di SQLite (strftime, date) continuano a funzionare sulla colonna.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        return value.toordinal() + GIORNO_GIULIANO_ZERO
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else date.fromordinal(value - GIORNO_GIULIANO_ZERO)
+
+
+class MinutiGiorno(TypeDecorator):
+    """ Orario (ore e minuti) salvato come minuti dalla mezzanotte """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = time.fromisoformat(value)
+        return value.hour * 60 + value.minute
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else _ORARI[value]
+
+
+# Schema compatto delle timbrature (config.SCHEMA_COMPATTO, conversione con schema_compatto.py)
+TipoGiorno, TipoOrario = (GiornoGiuliano, MinutiGiorno) if config.SCHEMA_COMPATTO else (Date, Time)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -20,13 +68,19 @@ class Timbratura(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_utente = Column(Integer, ForeignKey("users.id"), nullable=False)
-    data = Column(Date, nullable=False)  # Giorno della timbratura
-    orario_ingresso = Column(Time, nullable=False)  # Solo ore e minuti
-    orario_uscita = Column(Time, nullable=False)  # Solo ore e minuti
+    data = Column(TipoGiorno, nullable=False)  # Giorno della timbratura
+    orario_ingresso = Column(TipoOrario, nullable=False)  # Solo ore e minuti
+    orario_uscita = Column(TipoOrario, nullable=False)  # Solo ore e minuti
     tempo_lavorativo = Column(Integer, nullable=False)  # Calcolato in minuti
 
     utente = relationship("User", back_populates="timbrature")
 
+    __table_args__ = (
+        # Una sola timbratura per utente e giorno; serve anche la vista mensile
+        # (WHERE id_utente = ? AND data >= ? AND data < ?)
+        Index("uq_timbrature_utente_data", "id_utente", "data", unique=True),
+    )
+
 
 class Lavoro(Base):
     __tablename__ = "lavoro"
@@ -41,4 +95,80 @@ class Lavoro(Base):
     saldo = Column(String, nullable=False)  # Pagato / Pagato in negozio / Sospeso
     extra_consegna = Column(Float, nullable=True)  # Extra Consegna (opzionale)
 
+    __table_args__ = (
+        # Filtri per intervallo di date (ed eventualmente commessa) in /attivita e negli export
+        Index("ix_lavoro_data_commessa", "data", "commessa"),
+        # Lavori dei clienti trovati da /lavoro/search (vedi ricerca.py)
+        Index("ix_lavoro_cliente_data", "cliente", "data"),
+    )
+
+
+class ClienteLavori(Base):
+    __tablename__ = "clienti_lavoro"
+
+    # Clienti distinti di lavoro con il numero di lavori, aggiornati dai trigger di ricerca.py
+    # e indicizzati per la ricerca full-text (clienti_fts)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cliente = Column(String, nullable=False, unique=True)
+    lavori = Column(Integer, nullable=False, default=0)
+
+
+class VersioneDati(Base):
+    __tablename__ = "versioni_dati"
+
+    # Contatore di modifiche per porzione di dati, es. "timbrature:2024-05" o "lavoro:2024-05"
+    chiave = Column(String, primary_key=True)
+    versione = Column(Integer, nullable=False, default=0)
+
+
+class RiepilogoOre(Base):
+    __tablename__ = "riepilogo_ore"
+
+    # Ore mensili per utente, aggiornate insieme a ogni scrittura su timbrature (vedi riepiloghi.py)
+    anno = Column(Integer, primary_key=True)
+    mese = Column(Integer, primary_key=True)
+    id_utente = Column(Integer, primary_key=True)
+    giorni = Column(Integer, nullable=False, default=0)  # Numero di timbrature
+    tempo_lavorativo = Column(Integer, nullable=False, default=0)  # In minuti
+
+
+class RiepilogoLavoro(Base):
+    __tablename__ = "riepilogo_lavoro"
+
+    # Totali mensili per commessa e tipo di saldo, aggiornati insieme a ogni scrittura su lavoro
+    anno = Column(Integer, primary_key=True)
+    mese = Column(Integer, primary_key=True)
+    commessa = Column(String, primary_key=True)
+    saldo = Column(String, primary_key=True)
+    numero = Column(Integer, nullable=False, default=0)
+    contratto = Column(Float, nullable=False, default=0.0)
+    saldato = Column(Float, nullable=False, default=0.0)
+    extra_consegna = Column(Float, nullable=False, default=0.0)
+
+
+class EsportazioneBatch(Base):
+    __tablename__ = "esportazioni_batch"
+
+    # Stato delle esportazioni batch (vedi jobs.py), condiviso fra i worker; lo ZIP è un file su disco
+    id = Column(String, primary_key=True)
+    anno = Column(Integer, nullable=False)
+    mese = Column(Integer, nullable=False)
+    stato = Column(String, nullable=False)  # in_coda / in_corso / completato / errore
+    totale = Column(Integer, nullable=False, default=0)
+    completati = Column(Integer, nullable=False, default=0)
+    errori = Column(String, nullable=False, default="[]")  # Lista JSON di {file, errore}
+    creato = Column(DateTime, nullable=False)
+    aggiornato = Column(DateTime, nullable=False)  # Ultimo segnale del processo che esegue il job
+
+
+class Modifica(Base):
+    __tablename__ = "modifiche"
+
+    # Registro delle modifiche per la sincronizzazione incrementale (vedi sincronizzazione.py):
+    # l'id è la versione, crescente e mai riutilizzato
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tabella = Column(String, nullable=False)  # users / timbrature / lavoro
+    id_riga = Column(Integer, nullable=False)
+    eliminata = Column(Boolean, nullable=False, default=False)  # Tombstone della cancellazione
 
+    __table_args__ = {"sqlite_autoincrement": True}
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from database import engine, SessionLocal
 from models import Base, User
+from versioni import incrementa_versione
+from sincronizzazione import registra_nuove_righe, ultimo_id
 
 # Utenti iniziali
 users_data = [
@@ -18,6 +20,7 @@ def populate_users():
 
     with SessionLocal() as db:
         nuovi_utenti = 0  # Contatore utenti aggiunti
+        dopo_id = ultimo_id(db, User)
 
         for user in users_data:
             existing_user = db.query(User).filter_by(full_name=user["full_name"]).first()
@@ -26,6 +29,10 @@ def populate_users():
                 db.add(new_user)
                 nuovi_utenti += 1  # Aggiunge al contatore
 
+        if nuovi_utenti:
+            db.flush()
+            registra_nuove_righe(db, User, dopo_id)
+            incrementa_versione(db, "users")
         db.commit()
 
 
@@ -0,0 +1,261 @@
+import base64
+import json
+from datetime import date
+from typing import Optional
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from models import Timbratura, Lavoro, User
+
+
+def intervallo_mese(anno: int, mese: int):
+    """
+    Restituisce l'intervallo semiaperto [inizio, fine) del mese indicato.
+    Usato al posto di extract() così che SQLite possa sfruttare l'indice su data.
+    """
+    inizio = date(anno, mese, 1)
+    fine = date(anno + 1, 1, 1) if mese == 12 else date(anno, mese + 1, 1)
+    return inizio, fine
+
+
+# Tipi di saldo (valore di Lavoro.saldo) -> chiave nei totali
+SALDI = {
+    "Contanti": "contanti",
+    "Assegno": "assegni",
+    "Bonifico": "bonifico",
+    "Finanziamento": "finanziamento",
+    "Pag. Negozio": "negozio",
+    "Sospeso": "sospeso",
+}
+
+# Saldi che concorrono al totale "saldato" di /attivita
+SALDI_INCASSATI = ("contanti", "assegni", "bonifico", "finanziamento")
+
+# Percentuale di trasporto riconosciuta sul totale dei contratti
+PERCENTUALE_TRASPORTO = 0.06
+
+# Colonne restituite per ogni lavoro (niente oggetti ORM per le liste)
+COLONNE_LAVORO = (
+    Lavoro.id, Lavoro.data, Lavoro.cliente, Lavoro.contratto, Lavoro.saldato,
+    Lavoro.commessa, Lavoro.saldo, Lavoro.extra_consegna
+)
+
+# Colonne delle liste di timbrature
+COLONNE_TIMBRATURA = (
+    Timbratura.id, Timbratura.data, Timbratura.orario_ingresso, Timbratura.orario_uscita, Timbratura.tempo_lavorativo
+)
+
+
+def codifica_cursore(giorno: date, id_riga: int) -> str:
+    """ Cursore opaco per la paginazione keyset su (data, id) """
+    testo = json.dumps([giorno.isoformat(), id_riga])
+    return base64.urlsafe_b64encode(testo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodifica_cursore(cursore: str):
+    """ Inverso di codifica_cursore; ValueError se il cursore non è valido """
+    try:
+        testo = base64.urlsafe_b64decode(cursore + "=" * (-len(cursore) % 4)).decode("utf-8")
+        giorno, id_riga = json.loads(testo)
+        return date.fromisoformat(giorno), int(id_riga)
+    except Exception:
+        raise ValueError("Cursore non valido.")
+
+
+def pagina(query, colonna_data, colonna_id, dopo=None, limit: Optional[int] = None):
+    """
+    Ordina per (data, id) e applica la paginazione keyset: dopo è la coppia
+    (data, id) dell'ultima riga già letta, limit il numero massimo di righe.
+    """
+    if dopo is not None:
+        giorno, id_riga = dopo
+        query = query.filter(or_(colonna_data > giorno, and_(colonna_data == giorno, colonna_id > id_riga)))
+    query = query.order_by(colonna_data, colonna_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def filtra_lavori(query, data_da: date, data_a: date, commessa: Optional[str] = None):
+    """ Applica i filtri comuni di /attivita e degli export a una query su Lavoro """
+    query = query.filter(Lavoro.data.between(data_da, data_a))
+    if commessa:
+        query = query.filter(Lavoro.commessa == commessa)
+    return query
+
+
+def lista_lavori(
+    db: Session, data_da: date, data_a: date, commessa: Optional[str] = None,
+    colonne=COLONNE_LAVORO, dopo=None, limit: Optional[int] = None
+):
+    """ Righe (tuple con accesso per attributo) dei lavori nel periodo, ordinate per data e id """
+    query = filtra_lavori(db.query(*colonne), data_da, data_a, commessa)
+    return pagina(query, Lavoro.data, Lavoro.id, dopo, limit).all()
+
+
+def totali_lavori(db: Session, data_da: date, data_a: date, commessa: Optional[str] = None):
+    """
+    Calcola i totali dei lavori nel periodo con un'unica query GROUP BY saldo.
+    """
+    righe = filtra_lavori(
+        db.query(
+            Lavoro.saldo,
+            func.count(Lavoro.id),
+            func.coalesce(func.sum(Lavoro.contratto), 0.0),
+            func.coalesce(func.sum(Lavoro.saldato), 0.0),
+            func.coalesce(func.sum(Lavoro.extra_consegna), 0.0)
+        ),
+        data_da, data_a, commessa
+    ).group_by(Lavoro.saldo).all()
+
+    return calcola_totali(righe)
+
+
+def calcola_totali(righe):
+    """
+    Totali di /attivita a partire da righe aggregate (saldo, numero, contratto, saldato, extra).
+    """
+    totali = {chiave: 0.0 for chiave in SALDI.values()}
+    numero_lavori = 0
+    totale_contratto = 0.0
+    saldato_complessivo = 0.0
+    extra_su_consegne = 0.0
+
+    for saldo, numero, contratto, saldato, extra in righe:
+        numero_lavori += numero
+        totale_contratto += contratto
+        saldato_complessivo += saldato
+        extra_su_consegne += extra
+        if saldo in SALDI:
+            totali[SALDI[saldo]] += saldato
+
+    percentuale_trasporto = totale_contratto * PERCENTUALE_TRASPORTO
+
+    return {
+        "numero_lavori": numero_lavori,
+        "contratto": totale_contratto,
+        "saldato": sum(totali[chiave] for chiave in SALDI_INCASSATI),
+        "saldato_complessivo": saldato_complessivo,
+        "percentuale_trasporto": percentuale_trasporto,
+        "extra_su_consegne": extra_su_consegne,
+        "totale_lordo": percentuale_trasporto + extra_su_consegne,
+        **totali
+    }
+
+
+def timbrature_export(db: Session, utente: int, anno: int, mese: int):
+    """
+    Nome dell'utente e righe (data, ingresso, uscita, minuti) per il report mensile.
+    Il nome è None se nel mese non ci sono timbrature.
+    """
+    inizio, fine = intervallo_mese(anno, mese)
+
+    righe = db.query(
+        Timbratura.data, Timbratura.orario_ingresso, Timbratura.orario_uscita, Timbratura.tempo_lavorativo
+    ).filter(
+        Timbratura.id_utente == utente,
+        Timbratura.data >= inizio,
+        Timbratura.data < fine
+    ).order_by(Timbratura.data).all()
+
+    nome_utente = db.query(User.full_name).filter(User.id == utente).scalar() if righe else None
+    return nome_utente, righe
+
+
+def commesse_periodo(db: Session, data_da: date, data_a: date):
+    """ Commesse distinte con almeno un lavoro nel periodo """
+    righe = db.query(Lavoro.commessa).filter(Lavoro.data.between(data_da, data_a)).distinct().order_by(Lavoro.commessa)
+    return [commessa for (commessa,) in righe]
+
+
+def lista_timbrature_mese(
+    db: Session, utente: int, anno: int, mese: int,
+    colonne=COLONNE_TIMBRATURA, dopo=None, limit: Optional[int] = None
+):
+    """ Righe delle timbrature di un utente nel mese, ordinate per data e id """
+    inizio, fine = intervallo_mese(anno, mese)
+    query = db.query(*colonne).filter(
+        Timbratura.id_utente == utente,
+        Timbratura.data >= inizio,
+        Timbratura.data < fine
+    )
+    return pagina(query, Timbratura.data, Timbratura.id, dopo, limit).all()
+
+
+def totali_timbrature_mese(db: Session, utente: int, anno: int, mese: int):
+    """ Giorni timbrati e minuti lavorati da un utente nel mese """
+    inizio, fine = intervallo_mese(anno, mese)
+    giorni, minuti = db.query(
+        func.count(Timbratura.id),
+        func.coalesce(func.sum(Timbratura.tempo_lavorativo), 0)
+    ).filter(
+        Timbratura.id_utente == utente,
+        Timbratura.data >= inizio,
+        Timbratura.data < fine
+    ).one()
+    return {"giorni": giorni, "tempo_lavorativo": minuti}
+
+
+def riepilogo_dashboard(db: Session, data_da: date, data_a: date):
+    """
+    Tutti gli indicatori della dashboard per il periodo [data_da, data_a],
+    calcolati con quattro query aggregate.
+    """
+    ore = db.query(
+        User.id, User.full_name,
+        func.count(Timbratura.id),
+        func.coalesce(func.sum(Timbratura.tempo_lavorativo), 0)
+    ).join(Timbratura, Timbratura.id_utente == User.id).filter(
+        Timbratura.data.between(data_da, data_a)
+    ).group_by(User.id, User.full_name).order_by(User.full_name).all()
+
+    per_commessa_saldo = filtra_lavori(
+        db.query(
+            Lavoro.commessa, Lavoro.saldo,
+            func.count(Lavoro.id),
+            func.coalesce(func.sum(Lavoro.contratto), 0.0),
+            func.coalesce(func.sum(Lavoro.saldato), 0.0),
+            func.coalesce(func.sum(Lavoro.extra_consegna), 0.0)
+        ),
+        data_da, data_a
+    ).group_by(Lavoro.commessa, Lavoro.saldo).all()
+
+    lavori_giorno = filtra_lavori(
+        db.query(
+            Lavoro.data,
+            func.count(Lavoro.id),
+            func.coalesce(func.sum(Lavoro.contratto), 0.0),
+            func.coalesce(func.sum(Lavoro.saldato), 0.0)
+        ),
+        data_da, data_a
+    ).group_by(Lavoro.data).all()
+
+    ore_giorno = db.query(
+        Timbratura.data,
+        func.coalesce(func.sum(Timbratura.tempo_lavorativo), 0)
+    ).filter(Timbratura.data.between(data_da, data_a)).group_by(Timbratura.data).all()
+
+    # Totali per commessa e complessivi, con la stessa logica di /attivita
+    righe_commessa = {}
+    for commessa, *riga in per_commessa_saldo:
+        righe_commessa.setdefault(commessa, []).append(riga)
+
+    # Serie giornaliera unica per ore e lavori
+    serie = {}
+    for giorno, numero, contratto, saldato in lavori_giorno:
+        serie[giorno] = {"lavori": numero, "contratto": contratto, "saldato": saldato, "tempo_lavorativo": 0}
+    for giorno, minuti in ore_giorno:
+        serie.setdefault(giorno, {"lavori": 0, "contratto": 0.0, "saldato": 0.0, "tempo_lavorativo": 0})
+        serie[giorno]["tempo_lavorativo"] = minuti
+
+    return {
+        "ore_utenti": [
+            {"id_utente": id_utente, "full_name": nome, "giorni": giorni, "tempo_lavorativo": minuti, "ore": round(minuti / 60, 2)}
+            for id_utente, nome, giorni, minuti in ore
+        ],
+        "totali": calcola_totali([riga[1:] for riga in per_commessa_saldo]),
+        "commesse": {commessa: calcola_totali(righe) for commessa, righe in sorted(righe_commessa.items())},
+        "per_giorno": [
+            {"data": giorno.strftime("%Y-%m-%d"), **valori, "ore": round(valori["tempo_lavorativo"] / 60, 2)}
+            for giorno, valori in sorted(serie.items())
+        ]
+    }
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import config
+
+# 🔹 Rendering dei PDF richiesti dagli endpoint di esportazione in un process pool dedicato:
+# il layout FPDF (CPU-bound) non blocca il GIL del server. Ai processi passano solo tuple
+# semplici (vedi reports.RigaTimbratura / RigaLavoro); le sessioni sono già chiuse.
+# Le esportazioni batch usano il pool di jobs.py.
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_coda = 0
+_coda_lock = threading.Lock()
+
+
+class PoolSaturo(Exception):
+    """ Troppi report già in generazione o in attesa (config.PDF_MAX_IN_CODA) """
+
+
+def get_pool():
+    """ Crea il process pool alla prima esportazione """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=config.PDF_PROCESSI)
+        return _pool
+
+
+def renderizza(funzione, *argomenti) -> bytes:
+    """
+    Esegue funzione(*argomenti) nel process pool e ne attende il risultato.
+    Solleva PoolSaturo senza accodare se i report in corso o in attesa sono già PDF_MAX_IN_CODA.
+    """
+    global _in_coda
+    with _coda_lock:
+        if _in_coda >= config.PDF_MAX_IN_CODA:
+            raise PoolSaturo()
+        _in_coda += 1
+    try:
+        return get_pool().submit(funzione, *argomenti).result()
+    finally:
+        with _coda_lock:
+            _in_coda -= 1
+
+
+def chiudi_pool_report():
+    """ Allo spegnimento del server: attende i rendering in corso e chiude i processi """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
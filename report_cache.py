@@ -0,0 +1,65 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Dimensione massima complessiva dei PDF tenuti in memoria
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class ReportCache:
+    """
+    Cache LRU dei report generati, limitata per dimensione totale.
+    La chiave include le versioni dei dati (vedi versioni.py), quindi
+    una scrittura rende irraggiungibili i report non più aggiornati.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._dati = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chiave(endpoint: str, parametri: dict, versioni: dict) -> str:
+        contenuto = json.dumps([endpoint, parametri, versioni], sort_keys=True, default=str)
+        return hashlib.sha256(contenuto.encode("utf-8")).hexdigest()
+
+    def get(self, chiave: str):
+        with self._lock:
+            contenuto = self._dati.get(chiave)
+            if contenuto is not None:
+                self._dati.move_to_end(chiave)
+            return contenuto
+
+    def put(self, chiave: str, contenuto: bytes):
+        if len(contenuto) > self.max_bytes:
+            return
+        with self._lock:
+            if chiave in self._dati:
+                self._bytes -= len(self._dati.pop(chiave))
+            self._dati[chiave] = contenuto
+            self._bytes += len(contenuto)
+            while self._bytes > self.max_bytes:
+                _, vecchio = self._dati.popitem(last=False)
+                self._bytes -= len(vecchio)
+
+    def clear(self):
+        with self._lock:
+            self._dati.clear()
+            self._bytes = 0
+
+
+report_cache = ReportCache()
+
+
+def report_da_cache(endpoint: str, parametri: dict, versioni: dict, genera):
+    """
+    Restituisce il report dalla cache, oppure lo genera con genera() e lo memorizza.
+    """
+    chiave = ReportCache.chiave(endpoint, parametri, versioni)
+    contenuto = report_cache.get(chiave)
+    if contenuto is None:
+        contenuto = genera()
+        report_cache.put(chiave, contenuto)
+    return contenuto
@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+
+# Righe "piatte" accettate dai report, serializzabili verso altri processi
+RigaTimbratura = namedtuple("RigaTimbratura", "data orario_ingresso orario_uscita tempo_lavorativo")
+RigaLavoro = namedtuple("RigaLavoro", "id data cliente contratto saldato commessa saldo extra_consegna")
+
+
+def safe_text(text):
+    """ Converte il testo per evitare errori di encoding in FPDF """
+    if isinstance(text, str):
+        return text.encode("latin-1", "ignore").decode("latin-1")
+    return str(text)
+
+
+def euro(importo):
+    """ Importo formattato come nei report (es. "12.50 €") """
+    return safe_text(f"{importo:.2f} {chr(128)}")
+
+
+class Report:
+    """
+    Layout comune dei report PDF: titolo, tabelle a celle bordate e riepiloghi.
+    Il documento viene generato interamente in memoria.
+    """
+
+    def __init__(self, titolo: str):
+        # fpdf viene importato alla prima esportazione e non all'avvio del server
+        from fpdf import FPDF
+
+        self.pdf = FPDF()
+        self.pdf.set_auto_page_break(auto=True, margin=15)
+        self.pdf.add_page()
+        self.pdf.set_font("Arial", style="B", size=16)
+        self.pdf.cell(200, 10, safe_text(titolo), ln=True, align="C")
+
+    def ln(self, *spazio):
+        self.pdf.ln(*spazio)
+
+    def testo(self, testo: str, size: int = 12):
+        self.pdf.set_font("Arial", size=size)
+        self.pdf.cell(200, 10, safe_text(testo), ln=True)
+
+    def sezione(self, titolo: str, spazio: int = 10):
+        self.pdf.ln(spazio)
+        self.pdf.set_font("Arial", style="B", size=12)
+        self.pdf.cell(0, 10, safe_text(titolo), ln=True)
+
+    def riga(self, celle, bold: bool = False, align: str = ""):
+        """ Scrive una riga di tabella; celle è una lista di (larghezza, valore) """
+        self.pdf.set_font("Arial", style="B" if bold else "", size=10)
+        for i, (larghezza, valore) in enumerate(celle):
+            self.pdf.cell(larghezza, 10, safe_text(valore), 1, align=align if i == 0 else "")
+        self.pdf.ln()
+
+    def voce(self, etichetta: str, valore: str, bold: bool = False):
+        """ Riga di riepilogo etichetta / valore """
+        self.riga([(80, etichetta), (40, valore)], bold=bold)
+
+    def to_bytes(self) -> bytes:
+        contenuto = self.pdf.output(dest="S")
+        if isinstance(contenuto, str):
+            return contenuto.encode("latin1")
+        return bytes(contenuto)
+
+
+def pdf_timbrature(anno: int, mese: int, nome_utente, timbrature) -> bytes:
+    """ Report mensile delle timbrature di un utente """
+    pdf = Report(f"Timbrature - {anno}-{mese:02d}")
+    pdf.testo(f"Utente: {nome_utente or 'Nessun dato'}")
+
+    pdf.ln(10)
+    pdf.riga([(40, "Data"), (40, "Ingresso"), (40, "Uscita"), (40, "Ore Lavorate")], bold=True)
+
+    totale_ore = 0
+    for t in timbrature:
+        ore_lavorate = t.tempo_lavorativo / 60
+        totale_ore += ore_lavorate
+        pdf.riga([
+            (40, str(t.data)),
+            (40, str(t.orario_ingresso)),
+            (40, str(t.orario_uscita)),
+            (40, f"{ore_lavorate:.2f}")
+        ])
+
+    pdf.riga([(120, "Totale Ore"), (40, f"{totale_ore:.2f}")])
+
+    return pdf.to_bytes()
+
+
+def pdf_attivita(data_da, data_a, lavori, totali) -> bytes:
+    """ Report delle attività nel periodo, con riepilogo dei totali (vedi routes.totali_lavori) """
+    pdf = Report(f"Attività | {data_da} - {data_a}")
+
+    # Intestazione Tabella
+    pdf.ln(10)
+    pdf.riga([
+        (20, "Commessa"), (25, "Data"), (40, "Cliente"), (25, "Pagamento"),
+        (25, "Contratto"), (25, "Saldo"), (20, "Extra")
+    ], bold=True)
+
+    for lav in lavori:
+        pdf.riga([
+            (20, lav.commessa),
+            (25, str(lav.data)),
+            (40, lav.cliente),
+            (25, lav.saldo),
+            (25, euro(lav.contratto)),
+            (25, euro(lav.saldato)),
+            (20, euro(lav.extra_consegna))
+        ])
+
+    # Totali nella tabella
+    pdf.riga([
+        (110, "Totale"),
+        (25, euro(totali["contratto"])),
+        (25, euro(totali["saldato_complessivo"])),
+        (20, euro(totali["extra_su_consegne"]))
+    ], bold=True, align="R")
+
+    # Riepilogo Totali
+    pdf.sezione("Riepilogo Totali")
+    pdf.voce("Totale Contratto:", euro(totali["contratto"]))
+    pdf.voce("Percentuale trasporto (6%):", euro(totali["percentuale_trasporto"]))
+    pdf.voce("Extra su consegne:", euro(totali["extra_su_consegne"]))
+    pdf.voce("Totale Lordo:", euro(totali["totale_lordo"]), bold=True)
+
+    # Dettaglio Pagamenti
+    pdf.sezione("Dettaglio Saldi", spazio=5)
+    pdf.voce("Totale Contanti:", euro(totali["contanti"]))
+    pdf.voce("Totale Assegni:", euro(totali["assegni"]))
+    pdf.voce("Totale Bonifico:", euro(totali["bonifico"]))
+    pdf.voce("Totale Negozio:", euro(totali["negozio"]))
+    pdf.voce("Totale:", euro(totali["contanti"] + totali["assegni"] + totali["bonifico"] + totali["negozio"]), bold=True)
+    pdf.voce("Totale Sospeso:", euro(totali["sospeso"]))
+
+    return pdf.to_bytes()
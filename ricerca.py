@@ -0,0 +1,121 @@
+import re
+from typing import Optional
+from sqlalchemy import literal_column, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import column, table
+from models import ClienteLavori, Lavoro
+from queries import COLONNE_LAVORO
+
+# 🔹 Ricerca dei lavori per cliente con un indice FTS5 sui nomi dei clienti.
+# clienti_lavoro contiene i clienti distinti della tabella lavoro con il numero di lavori;
+# clienti_fts è l'indice full-text (a contenuto esterno) su clienti_lavoro. Entrambi sono
+# aggiornati da trigger nella stessa transazione di ogni inserimento, cancellazione o cambio
+# di cliente, qualunque sia il percorso di scrittura (endpoint, import, sincronizzazione, archivio).
+# Indicizzare i clienti distinti invece delle singole righe tiene l'indice piccolo: la ricerca
+# trova i clienti migliori e poi legge i loro lavori con l'indice ix_lavoro_cliente_data.
+# Gli anni archiviati non sono compresi.
+
+CREA_INDICE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clienti_fts USING fts5(
+    cliente, content='clienti_lavoro', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)
+"""
+
+TRIGGER = (
+    """
+    CREATE TRIGGER IF NOT EXISTS clienti_fts_ai AFTER INSERT ON clienti_lavoro BEGIN
+        INSERT INTO clienti_fts(rowid, cliente) VALUES (new.id, new.cliente);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clienti_fts_ad AFTER DELETE ON clienti_lavoro BEGIN
+        INSERT INTO clienti_fts(clienti_fts, rowid, cliente) VALUES ('delete', old.id, old.cliente);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lavoro_clienti_ai AFTER INSERT ON lavoro BEGIN
+        INSERT INTO clienti_lavoro(cliente, lavori) VALUES (new.cliente, 1)
+            ON CONFLICT(cliente) DO UPDATE SET lavori = lavori + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lavoro_clienti_ad AFTER DELETE ON lavoro BEGIN
+        UPDATE clienti_lavoro SET lavori = lavori - 1 WHERE cliente = old.cliente;
+        DELETE FROM clienti_lavoro WHERE cliente = old.cliente AND lavori <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lavoro_clienti_au AFTER UPDATE OF cliente ON lavoro
+    WHEN new.cliente IS NOT old.cliente BEGIN
+        UPDATE clienti_lavoro SET lavori = lavori - 1 WHERE cliente = old.cliente;
+        DELETE FROM clienti_lavoro WHERE cliente = old.cliente AND lavori <= 0;
+        INSERT INTO clienti_lavoro(cliente, lavori) VALUES (new.cliente, 1)
+            ON CONFLICT(cliente) DO UPDATE SET lavori = lavori + 1;
+    END
+    """,
+)
+
+# Testi più corti di così non vengono completati (troppi clienti per prefisso)
+MIN_CARATTERI_SUGGERIMENTI = 2
+
+clienti_fts = table("clienti_fts", column("rowid"))
+
+
+def inizializza(conn):
+    """ Crea indice e trigger se mancano; alla creazione vi inserisce i clienti già presenti """
+    esiste = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'clienti_fts'")).first()
+    if not esiste:
+        conn.execute(text("DELETE FROM clienti_lavoro"))
+    conn.execute(text(CREA_INDICE))
+    for trigger in TRIGGER:
+        conn.execute(text(trigger))
+    if not esiste:
+        # I trigger su clienti_lavoro riempiono anche clienti_fts
+        conn.execute(text(
+            "INSERT INTO clienti_lavoro (cliente, lavori) SELECT cliente, COUNT(*) FROM lavoro GROUP BY cliente"
+        ))
+
+
+def espressione_fts(testo: str) -> Optional[str]:
+    """
+    Testo libero -> query FTS5: ogni parola è un prefisso e tutte devono comparire
+    ("mar ros" -> '"mar"* "ros"*'). None se non contiene parole.
+    """
+    parole = re.findall(r"\w+", testo)
+    return " ".join(f'"{parola}"*' for parola in parole) or None
+
+
+def _clienti_corrispondenti(db: Session, espressione: str, limit: int):
+    """ I limit clienti più pertinenti (bm25), a parità quelli con più lavori """
+    rilevanza = literal_column("bm25(clienti_fts)").label("rilevanza")
+    return db.query(ClienteLavori.cliente, ClienteLavori.lavori, rilevanza).join(
+        clienti_fts, clienti_fts.c.rowid == ClienteLavori.id
+    ).filter(
+        text("clienti_fts MATCH :espressione").bindparams(espressione=espressione)
+    ).order_by(rilevanza, ClienteLavori.lavori.desc()).limit(limit)
+
+
+def cerca_lavori(db: Session, testo: str, limit: int, commessa: Optional[str] = None):
+    """ Lavori dei clienti che corrispondono al testo: prima i clienti più pertinenti, poi i lavori più recenti """
+    espressione = espressione_fts(testo)
+    if espressione is None:
+        return []
+
+    migliori = _clienti_corrispondenti(db, espressione, limit).subquery()
+    query = db.query(*COLONNE_LAVORO).join(migliori, migliori.c.cliente == Lavoro.cliente)
+    if commessa:
+        query = query.filter(Lavoro.commessa == commessa)
+    return query.order_by(migliori.c.rilevanza, Lavoro.data.desc(), Lavoro.id.desc()).limit(limit).all()
+
+
+def suggerisci_clienti(db: Session, testo: str, limit: int):
+    """ Nomi di cliente che iniziano con le parole digitate, dai più frequenti """
+    espressione = espressione_fts(testo)
+    if espressione is None or len(testo.strip()) < MIN_CARATTERI_SUGGERIMENTI:
+        return []
+
+    migliori = _clienti_corrispondenti(db, espressione, limit).subquery()
+    return db.query(migliori.c.cliente, migliori.c.lavori).order_by(
+        migliori.c.lavori.desc(), migliori.c.cliente
+    ).all()
@@ -0,0 +1,230 @@
+import argparse
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+from sqlalchemy import Integer, cast, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import Lavoro, RiepilogoLavoro, RiepilogoOre, Timbratura
+
+# Differenza massima tollerata fra importi del riepilogo e delle tabelle (somme float)
+TOLLERANZA = 0.005
+
+
+class DeltaRiepiloghi:
+    """
+    Variazioni dei riepiloghi mensili prodotte da una transazione.
+    applica() le scrive con un upsert per chiave, prima del commit della scrittura.
+    """
+
+    def __init__(self):
+        self.ore = defaultdict(lambda: [0, 0])
+        self.lavoro = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+
+    def timbratura(self, id_utente: int, giorno: date, minuti: int, segno: int = 1):
+        voce = self.ore[(giorno.year, giorno.month, id_utente)]
+        voce[0] += segno
+        voce[1] += segno * minuti
+
+    def modifica_timbratura(self, id_utente: int, giorno: date, minuti_prima: int, minuti_dopo: int):
+        self.ore[(giorno.year, giorno.month, id_utente)][1] += minuti_dopo - minuti_prima
+
+    def lavoro_registrato(self, giorno: date, commessa: str, saldo: str, contratto, saldato, extra, segno: int = 1):
+        voce = self.lavoro[(giorno.year, giorno.month, commessa, saldo)]
+        voce[0] += segno
+        voce[1] += segno * (contratto or 0.0)
+        voce[2] += segno * (saldato or 0.0)
+        voce[3] += segno * (extra or 0.0)
+
+    def applica(self, db: Session):
+        for (anno, mese, id_utente), (giorni, minuti) in self.ore.items():
+            stmt = sqlite_insert(RiepilogoOre).values(
+                anno=anno, mese=mese, id_utente=id_utente, giorni=giorni, tempo_lavorativo=minuti
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["anno", "mese", "id_utente"],
+                set_={
+                    "giorni": RiepilogoOre.giorni + stmt.excluded.giorni,
+                    "tempo_lavorativo": RiepilogoOre.tempo_lavorativo + stmt.excluded.tempo_lavorativo
+                }
+            ))
+            db.query(RiepilogoOre).filter_by(anno=anno, mese=mese, id_utente=id_utente, giorni=0).delete()
+
+        for (anno, mese, commessa, saldo), (numero, contratto, saldato, extra) in self.lavoro.items():
+            stmt = sqlite_insert(RiepilogoLavoro).values(
+                anno=anno, mese=mese, commessa=commessa, saldo=saldo,
+                numero=numero, contratto=contratto, saldato=saldato, extra_consegna=extra
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["anno", "mese", "commessa", "saldo"],
+                set_={
+                    "numero": RiepilogoLavoro.numero + stmt.excluded.numero,
+                    "contratto": RiepilogoLavoro.contratto + stmt.excluded.contratto,
+                    "saldato": RiepilogoLavoro.saldato + stmt.excluded.saldato,
+                    "extra_consegna": RiepilogoLavoro.extra_consegna + stmt.excluded.extra_consegna
+                }
+            ))
+            db.query(RiepilogoLavoro).filter_by(anno=anno, mese=mese, commessa=commessa, saldo=saldo, numero=0).delete()
+
+        self.ore.clear()
+        self.lavoro.clear()
+
+
+def registra_timbratura(db: Session, timbratura, segno: int = 1):
+    """ Aggiorna il riepilogo ore per l'inserimento (segno=1) o la cancellazione (segno=-1) di una timbratura """
+    delta = DeltaRiepiloghi()
+    delta.timbratura(timbratura.id_utente, timbratura.data, timbratura.tempo_lavorativo, segno)
+    delta.applica(db)
+
+
+def registra_lavoro(db: Session, lavoro, segno: int = 1):
+    """ Aggiorna il riepilogo lavoro per l'inserimento (segno=1) o la cancellazione (segno=-1) di un lavoro """
+    delta = DeltaRiepiloghi()
+    delta.lavoro_registrato(lavoro.data, lavoro.commessa, lavoro.saldo, lavoro.contratto, lavoro.saldato, lavoro.extra_consegna, segno)
+    delta.applica(db)
+
+
+COLONNE_ORE = ["anno", "mese", "id_utente", "giorni", "tempo_lavorativo"]
+COLONNE_LAVORO = ["anno", "mese", "commessa", "saldo", "numero", "contratto", "saldato", "extra_consegna"]
+
+
+def _select_ore(data_da: Optional[date] = None, data_a: Optional[date] = None):
+    anno = cast(func.strftime("%Y", Timbratura.data), Integer)
+    mese = cast(func.strftime("%m", Timbratura.data), Integer)
+    query = select(
+        anno, mese, Timbratura.id_utente,
+        func.count(Timbratura.id), func.coalesce(func.sum(Timbratura.tempo_lavorativo), 0)
+    ).group_by(anno, mese, Timbratura.id_utente)
+    if data_da is not None:
+        query = query.where(Timbratura.data.between(data_da, data_a))
+    return query
+
+
+def _select_lavoro(data_da: Optional[date] = None, data_a: Optional[date] = None):
+    anno = cast(func.strftime("%Y", Lavoro.data), Integer)
+    mese = cast(func.strftime("%m", Lavoro.data), Integer)
+    query = select(
+        anno, mese, Lavoro.commessa, Lavoro.saldo,
+        func.count(Lavoro.id),
+        func.coalesce(func.sum(Lavoro.contratto), 0.0),
+        func.coalesce(func.sum(Lavoro.saldato), 0.0),
+        func.coalesce(func.sum(Lavoro.extra_consegna), 0.0)
+    ).group_by(anno, mese, Lavoro.commessa, Lavoro.saldo)
+    if data_da is not None:
+        query = query.where(Lavoro.data.between(data_da, data_a))
+    return query
+
+
+def calcola(db: Session, data_da: Optional[date] = None, data_a: Optional[date] = None):
+    """
+    Riepiloghi attesi per le righe di [data_da, data_a] (tutte se None): (righe ore, righe lavoro).
+    Periodi disgiunti producono righe disgiunte, da unire con una semplice concatenazione.
+    """
+    return db.execute(_select_ore(data_da, data_a)).all(), db.execute(_select_lavoro(data_da, data_a)).all()
+
+
+def ricostruisci(db: Session, attesi=None):
+    """ Ricalcola da zero i riepiloghi dalle tabelle timbrature e lavoro (o dalle righe attesi di calcola()) """
+    db.query(RiepilogoOre).delete()
+    db.query(RiepilogoLavoro).delete()
+    if attesi is None:
+        db.execute(insert(RiepilogoOre).from_select(COLONNE_ORE, _select_ore()))
+        db.execute(insert(RiepilogoLavoro).from_select(COLONNE_LAVORO, _select_lavoro()))
+    else:
+        ore, lavoro = attesi
+        if ore:
+            db.execute(insert(RiepilogoOre), [dict(zip(COLONNE_ORE, riga)) for riga in ore])
+        if lavoro:
+            db.execute(insert(RiepilogoLavoro), [dict(zip(COLONNE_LAVORO, riga)) for riga in lavoro])
+    db.commit()
+
+
+def verifica(db: Session, attesi=None):
+    """
+    Confronta i riepiloghi con le tabelle (o con le righe attesi di calcola()):
+    restituisce la lista delle differenze (vuota se coerenti).
+    """
+    differenze = []
+    ore, lavoro = calcola(db) if attesi is None else attesi
+
+    attese = {tuple(r[:3]): tuple(r[3:]) for r in ore}
+    presenti = {
+        (r.anno, r.mese, r.id_utente): (r.giorni, r.tempo_lavorativo)
+        for r in db.query(RiepilogoOre).filter(RiepilogoOre.giorni != 0)
+    }
+    for chiave in sorted(set(attese) | set(presenti)):
+        if attese.get(chiave) != presenti.get(chiave):
+            differenze.append({"tabella": "riepilogo_ore", "chiave": chiave, "atteso": attese.get(chiave), "presente": presenti.get(chiave)})
+
+    attese = {tuple(r[:4]): tuple(r[4:]) for r in lavoro}
+    presenti = {
+        (r.anno, r.mese, r.commessa, r.saldo): (r.numero, r.contratto, r.saldato, r.extra_consegna)
+        for r in db.query(RiepilogoLavoro).filter(RiepilogoLavoro.numero != 0)
+    }
+    for chiave in sorted(set(attese) | set(presenti)):
+        atteso, presente = attese.get(chiave), presenti.get(chiave)
+        coerente = (
+            atteso is not None and presente is not None
+            and atteso[0] == presente[0]
+            and all(abs(a - p) <= TOLLERANZA for a, p in zip(atteso[1:], presente[1:]))
+        )
+        if not coerente:
+            differenze.append({"tabella": "riepilogo_lavoro", "chiave": chiave, "atteso": atteso, "presente": presente})
+
+    return differenze
+
+
+def inizializza(db: Session):
+    """ Costruisce i riepiloghi al primo avvio su un database che ha già dei dati """
+    riepiloghi_vuoti = not db.query(RiepilogoOre.anno).first() and not db.query(RiepilogoLavoro.anno).first()
+    dati_presenti = db.query(Timbratura.id).first() or db.query(Lavoro.id).first()
+    if riepiloghi_vuoti and dati_presenti:
+        ricostruisci(db)
+
+
+def ore_mensili(db: Session, anno: int, mese: Optional[int] = None, id_utente: Optional[int] = None):
+    query = db.query(RiepilogoOre).filter(RiepilogoOre.anno == anno, RiepilogoOre.giorni != 0)
+    if mese is not None:
+        query = query.filter(RiepilogoOre.mese == mese)
+    if id_utente is not None:
+        query = query.filter(RiepilogoOre.id_utente == id_utente)
+    return query.order_by(RiepilogoOre.mese, RiepilogoOre.id_utente).all()
+
+
+def lavoro_mensile(db: Session, anno: int, mese: Optional[int] = None, commessa: Optional[str] = None):
+    query = db.query(RiepilogoLavoro).filter(RiepilogoLavoro.anno == anno, RiepilogoLavoro.numero != 0)
+    if mese is not None:
+        query = query.filter(RiepilogoLavoro.mese == mese)
+    if commessa:
+        query = query.filter(RiepilogoLavoro.commessa == commessa)
+    return query.order_by(RiepilogoLavoro.mese, RiepilogoLavoro.commessa, RiepilogoLavoro.saldo).all()
+
+
+if __name__ == "__main__":
+    from archivio import periodi_storici, sessione_storica
+    from database import SessionLocal, SessionScrittura, init_db
+
+    parser = argparse.ArgumentParser(description="Manutenzione dei riepiloghi mensili.")
+    parser.add_argument("comando", choices=("ricostruisci", "verifica"))
+    args = parser.parse_args()
+
+    init_db()
+    # Gli anni archiviati fanno parte dei riepiloghi: le righe attese vengono calcolate per
+    # periodi, ognuno con al più MAX_ARCHIVI archivi collegati, e scritte in un'unica transazione
+    attesi = ([], [])
+    for data_da, data_a in periodi_storici(date.min, date.max):
+        with SessionLocal() as sessione, sessione_storica(sessione, data_da, data_a) as storico:
+            ore, lavoro = calcola(storico, data_da, data_a)
+        attesi[0].extend(ore)
+        attesi[1].extend(lavoro)
+
+    with SessionScrittura() as db:
+        if args.comando == "ricostruisci":
+            ricostruisci(db, attesi)
+            print("✅ Riepiloghi ricostruiti.")
+        else:
+            differenze = verifica(db, attesi)
+            if not differenze:
+                print("✅ Riepiloghi coerenti con le tabelle.")
+            for d in differenze:
+                print(f"⚠️ {d['tabella']} {d['chiave']}: atteso {d['atteso']}, presente {d['presente']}")
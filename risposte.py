@@ -0,0 +1,13 @@
+from typing import Any
+import orjson
+from fastapi.responses import Response
+
+# 🔹 Risposte JSON serializzate con orjson: classe di risposta predefinita dell'app (main.py).
+# Sostituisce ORJSONResponse, deprecata nelle versioni recenti di FastAPI.
+
+
+class RispostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
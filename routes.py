@@ -1,20 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import hashlib
+import io
+import json
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from typing import Optional
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta
 from models import Timbratura, User  # ✅ Import corretto
 from pydantic import BaseModel
-from typing import List
-from sqlalchemy import func, extract
+from typing import Any, Dict, List
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from models import Lavoro
 from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
-from database import get_db
+from database import SessionLocal, get_db, get_db_scrittura
 from models import Timbratura, Lavoro, User
-from fpdf import FPDF
+from reports import RigaLavoro, RigaTimbratura, pdf_attivita, pdf_timbrature
+from rendering import PoolSaturo, renderizza
+from archivio import AnnoArchiviato, sessione_storica, verifica_anno_aperto, verifica_non_archiviata
+from ricerca import cerca_lavori, suggerisci_clienti
+import config
+from report_cache import report_da_cache
+from cache_letture import cache_letture, chiave_lavoro, chiave_timbrature, chiave_utenti
+from metriche import esporta_prometheus, misura_pdf
+from versioni import chiave_mese, chiavi_intervallo, incrementa_versione, leggi_versioni
+import schemas
+from esportazione_dati import FORMATI, stream_attivita, stream_timbrature
+from import_lavori import importa_lavori, leggi_file, valida_lavoro
+from jobs import as_dict, avvia_batch, get_job, percorso_zip
+from sincronizzazione import (
+    MAX_MODIFICHE, modifiche_da, registra_modifica, registra_modifiche, registra_nuove_righe, ultimo_id, versione_corrente
+)
+from riepiloghi import DeltaRiepiloghi, lavoro_mensile, ore_mensili, registra_lavoro, registra_timbratura
+from queries import (
+    COLONNE_LAVORO, COLONNE_TIMBRATURA, codifica_cursore, decodifica_cursore, intervallo_mese,
+    lista_lavori, lista_timbrature_mese, riepilogo_dashboard, timbrature_export, totali_lavori, totali_timbrature_mese
+)
 
 
 router = APIRouter()
 
+# Letture più frequenti: con DB_ASYNC attivo vengono servite dalle versioni in routes_async.py
+router_letture = APIRouter()
+
 
 class LoginRequest(BaseModel):
     code: str
@@ -45,15 +73,135 @@ class GiornoRequest(BaseModel):
     data: str  # Formato YYYY-MM-DD
 
 
-def safe_text(text):
-    """ Converte il testo per evitare errori di encoding in FPDF """
-    if isinstance(text, str):
-        return text.encode("latin-1", "ignore").decode("latin-1")
-    return str(text)
+class BatchRequest(BaseModel):
+    anno: int
+    mese: int
+    utenti: Optional[List[int]] = None  # None = tutti gli utenti con timbrature nel mese
+    commesse: Optional[List[str]] = None  # None = tutte le commesse con lavori nel mese
+
+
+class OperazioneSync(BaseModel):
+    tabella: str  # users / timbrature / lavoro
+    operazione: str  # upsert / delete
+    id: Optional[int] = None  # None = nuova riga creata offline
+    rif: Optional[str] = None  # Riferimento locale del client, restituito nell'esito
+    dati: Dict[str, Any] = {}  # Campi come in POST /timbrature e /lavoro/nuovo (users: full_name)
+
+
+class SyncPushRequest(BaseModel):
+    operazioni: List[OperazioneSync]
+
+
+def parse_intervallo(data_da: str, data_a: str):
+    """ Converte le date YYYY-MM-DD di un intervallo, con errore 400 se non valide """
+    try:
+        return (
+            datetime.strptime(data_da, "%Y-%m-%d").date(),
+            datetime.strptime(data_a, "%Y-%m-%d").date()
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato data non valido. Usa YYYY-MM-DD.")
+
+
+# Da incrementare quando cambia il formato JSON delle letture, per invalidare gli ETag già emessi
+VERSIONE_FORMATO = 1
+
+# Oltre questo numero di mesi l'ETag usa la versione dell'intera tabella
+MAX_MESI_ETAG = 240
+
+
+def calcola_etag(versioni: dict) -> str:
+    contenuto = json.dumps([VERSIONE_FORMATO, versioni], sort_keys=True)
+    return f'W/"{hashlib.sha1(contenuto.encode("utf-8")).hexdigest()[:20]}"'
 
 
-@router.post("/login")
-@router.post("/login", include_in_schema=False)
+def etag_corrisponde(request: Request, etag: str) -> bool:
+    """ Confronto debole fra l'ETag corrente e l'header If-None-Match """
+    valore = request.headers.get("if-none-match")
+    if not valore:
+        return False
+    richiesti = [tag.strip().removeprefix("W/") for tag in valore.split(",")]
+    return "*" in richiesti or etag.removeprefix("W/") in richiesti
+
+
+def lettura_condizionale(db: Session, request: Request, response: Response, chiavi, lettura, *args, cache=None):
+    """
+    Esegue lettura(db, *args) solo se i dati sono cambiati rispetto all'ETag del client:
+    l'ETag è calcolato dalle versioni delle chiavi (vedi versioni.py), senza leggere le righe.
+    Con cache (chiave di cache_letture.py) il risultato viene servito dalla memoria se le versioni coincidono.
+    """
+    versioni = leggi_versioni(db, chiavi)
+    etag = calcola_etag(versioni)
+    intestazioni = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_corrisponde(request, etag):
+        return Response(status_code=304, headers=intestazioni)
+
+    response.headers.update(intestazioni)
+    if cache is not None:
+        return cache_letture.ottieni(cache, lambda: lettura(db, *args), versioni)
+    return lettura(db, *args)
+
+
+def chiavi_attivita(data_da: str, data_a: str):
+    """ Chiavi di versione da cui dipende /attivita per l'intervallo richiesto """
+    inizio, fine = parse_intervallo(data_da, data_a)
+    chiavi = chiavi_intervallo("lavoro", inizio, fine)
+    return chiavi if len(chiavi) <= MAX_MESI_ETAG else ["lavoro"]
+
+
+def formatta_valore(valore):
+    """ Formato JSON usato dalle liste: date YYYY-MM-DD, orari HH:MM """
+    if isinstance(valore, date):
+        return valore.isoformat()
+    if isinstance(valore, time):
+        return valore.isoformat("minutes")
+    return valore
+
+
+def colonne_richieste(fields: Optional[str], colonne):
+    """
+    Proiezione richiesta con fields=campo1,campo2 (None = tutte le colonne).
+    Restituisce i nomi dei campi e le colonne da leggere (data e id servono sempre per il cursore).
+    """
+    disponibili = {colonna.key: colonna for colonna in colonne}
+    if not fields:
+        campi = list(disponibili)
+    else:
+        campi = [campo.strip() for campo in fields.split(",") if campo.strip()]
+        sconosciuti = [campo for campo in campi if campo not in disponibili]
+        if sconosciuti:
+            raise HTTPException(status_code=400, detail=f"Campi non validi: {', '.join(sconosciuti)}")
+
+    lette = list(dict.fromkeys(["id", "data", *campi]))
+    return campi, [disponibili[campo] for campo in lette]
+
+
+def leggi_pagina(lettura, fields: Optional[str], colonne, limit: Optional[int], cursor: Optional[str]):
+    """
+    Esegue lettura(colonne, dopo, limit) con proiezione e paginazione keyset.
+    Restituisce le righe serializzate e il cursore della pagina successiva (None se finita).
+    """
+    campi, colonne_lette = colonne_richieste(fields, colonne)
+
+    try:
+        dopo = decodifica_cursore(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Una riga in più per sapere se esiste una pagina successiva
+    righe = lettura(colonne_lette, dopo, limit + 1 if limit else None)
+
+    next_cursor = None
+    if limit and len(righe) > limit:
+        righe = righe[:limit]
+        next_cursor = codifica_cursore(righe[-1].data, righe[-1].id)
+
+    return [{campo: formatta_valore(getattr(r, campo)) for campo in campi} for r in righe], next_cursor
+
+
+@router.post("/login", response_model=schemas.LoginResponse)
+@router.post("/login", include_in_schema=False, response_model=schemas.LoginResponse)
 def login(payload: LoginRequest):
     if payload.code == "0000":
         return {"message": "Login riuscito", "token": "fake-token"}
@@ -61,8 +209,24 @@ def login(payload: LoginRequest):
         raise HTTPException(status_code=401, detail="Codice errato")
 
 
-@router.post("/timbrature")
-def inserisci_timbratura(payload: TimbraturaRequest, db: Session = Depends(get_db)):
+def anno_aperto(giorno: date):
+    """ 409 per le scritture con una data di un anno archiviato (vedi archivio.py) """
+    try:
+        verifica_anno_aperto(giorno)
+    except AnnoArchiviato as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def riga_non_archiviata(db: Session, modello, id_riga: int):
+    """ 409 invece di 404 se la riga cercata è stata spostata in un archivio """
+    try:
+        verifica_non_archiviata(db, modello, id_riga)
+    except AnnoArchiviato as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/timbrature", response_model=schemas.TimbraturaInserita, response_model_exclude_none=True)
+def inserisci_timbratura(payload: TimbraturaRequest, db: Session = Depends(get_db_scrittura)):
     # Converti la data e gli orari
     giorno = datetime.strptime(payload.data, "%Y-%m-%d").date()  # Data separata
     ingresso = datetime.strptime(payload.orario_ingresso, "%H:%M").time()  # Solo ore/minuti
@@ -71,6 +235,8 @@ def inserisci_timbratura(payload: TimbraturaRequest, db: Session = Depends(get_d
     if ingresso >= uscita:
         raise HTTPException(status_code=400, detail="L'orario di ingresso deve essere minore di quello di uscita.")
 
+    anno_aperto(giorno)
+
     # Controlla se esiste già una timbratura per lo stesso utente e giorno
     timbratura_esistente = db.query(Timbratura).filter(
         Timbratura.id_utente == payload.id_utente,
@@ -102,66 +268,216 @@ def inserisci_timbratura(payload: TimbraturaRequest, db: Session = Depends(get_d
     )
 
     db.add(nuova_timbratura)
+    db.flush()
+    registra_timbratura(db, nuova_timbratura)
+    registra_modifica(db, "timbrature", nuova_timbratura.id)
+    incrementa_versione(db, chiave_mese("timbrature", giorno))
     db.commit()
+    cache_letture.invalida(chiave_timbrature(payload.id_utente, giorno))
     db.refresh(nuova_timbratura)
 
-    return {"message": "Timbratura registrata con successo!", "timbratura": nuova_timbratura}
+    return {
+        "message": "Timbratura registrata con successo!",
+        "timbratura": {
+            "id": nuova_timbratura.id,
+            "id_utente": nuova_timbratura.id_utente,
+            "data": nuova_timbratura.data.isoformat(),
+            "orario_ingresso": nuova_timbratura.orario_ingresso.isoformat(),
+            "orario_uscita": nuova_timbratura.orario_uscita.isoformat(),
+            "tempo_lavorativo": nuova_timbratura.tempo_lavorativo
+        }
+    }
 
 
-@router.get("/timbrature")
-def get_timbrature(utente: int, data: date, db: Session = Depends(get_db)):
+def valida_timbratura(payload: TimbraturaRequest):
+    """
+    Converte e valida una timbratura; restituisce i valori per la tabella
+    oppure solleva ValueError con il messaggio da mostrare.
+    """
+    try:
+        giorno = datetime.strptime(payload.data, "%Y-%m-%d").date()
+        ingresso = datetime.strptime(payload.orario_ingresso, "%H:%M").time()
+        uscita = datetime.strptime(payload.orario_uscita, "%H:%M").time()
+    except ValueError:
+        raise ValueError("Formato non valido. Usa YYYY-MM-DD per la data e HH:MM per gli orari.")
+
+    if ingresso >= uscita:
+        raise ValueError("L'orario di ingresso deve essere minore di quello di uscita.")
+
+    verifica_anno_aperto(giorno)
+
+    tempo_lavorativo = (datetime.combine(giorno, uscita) - datetime.combine(giorno, ingresso)).total_seconds() // 60
+
+    return {
+        "id_utente": payload.id_utente,
+        "data": giorno,
+        "orario_ingresso": ingresso,
+        "orario_uscita": uscita,
+        "tempo_lavorativo": int(tempo_lavorativo)
+    }
+
+
+@router.post("/timbrature/bulk", response_model=schemas.TimbratureBulkResponse, response_model_exclude_none=True)
+def inserisci_timbrature_bulk(
+    payload: List[TimbraturaRequest],
+    upsert: bool = Query(False, description="Aggiorna le timbrature già presenti invece di scartarle"),
+    db: Session = Depends(get_db_scrittura)
+):
+    """
+    Inserisce più timbrature in un'unica transazione, con un esito per ogni elemento.
+    """
+    risultati = [None] * len(payload)
+    valide = {}  # (id_utente, data) -> (indice, valori)
+
+    # Validazione di tutto il lotto prima di toccare il database
+    for indice, elemento in enumerate(payload):
+        try:
+            valori = valida_timbratura(elemento)
+        except ValueError as e:
+            risultati[indice] = {"indice": indice, "esito": "errore", "errore": str(e)}
+            continue
+
+        chiave = (valori["id_utente"], valori["data"])
+        if chiave in valide:
+            risultati[indice] = {"indice": indice, "esito": "errore", "errore": "Timbratura duplicata nel lotto."}
+            continue
+        valide[chiave] = (indice, valori)
+
+    # Conflitti con le timbrature già registrate, in una sola query
+    esistenti = {}  # (id_utente, data) -> (id, tempo_lavorativo)
+    if valide:
+        utenti = {id_utente for id_utente, _ in valide}
+        giorni = [giorno for _, giorno in valide]
+        righe = db.query(Timbratura.id, Timbratura.id_utente, Timbratura.data, Timbratura.tempo_lavorativo).filter(
+            Timbratura.id_utente.in_(utenti),
+            Timbratura.data >= min(giorni),
+            Timbratura.data <= max(giorni)
+        )
+        esistenti = {
+            (id_utente, giorno): (id_t, minuti)
+            for id_t, id_utente, giorno, minuti in righe if (id_utente, giorno) in valide
+        }
+
+    nuove, aggiornate = [], []
+    delta = DeltaRiepiloghi()
+    for chiave, (indice, valori) in valide.items():
+        if chiave not in esistenti:
+            nuove.append(valori)
+            delta.timbratura(valori["id_utente"], valori["data"], valori["tempo_lavorativo"])
+            risultati[indice] = {"indice": indice, "esito": "inserita"}
+        elif upsert:
+            id_t, minuti_prima = esistenti[chiave]
+            aggiornate.append({"id": id_t, **valori})
+            delta.modifica_timbratura(valori["id_utente"], valori["data"], minuti_prima, valori["tempo_lavorativo"])
+            risultati[indice] = {"indice": indice, "esito": "aggiornata", "id": id_t}
+        else:
+            risultati[indice] = {
+                "indice": indice,
+                "esito": "esistente",
+                "id": esistenti[chiave][0],
+                "errore": "Esiste già una timbratura per questo utente in questa data."
+            }
+
+    delta.applica(db)
+    if nuove:
+        dopo_id = ultimo_id(db, Timbratura)
+        db.bulk_insert_mappings(Timbratura, nuove)
+        registra_nuove_righe(db, Timbratura, dopo_id)
+    if aggiornate:
+        db.bulk_update_mappings(Timbratura, aggiornate)
+        registra_modifiche(db, "timbrature", [t["id"] for t in aggiornate])
+
+    incrementa_versione(db, *(chiave_mese("timbrature", v["data"]) for v in nuove + aggiornate))
+    db.commit()
+    cache_letture.invalida(*(chiave_timbrature(v["id_utente"], v["data"]) for v in nuove + aggiornate))
+
+    return {
+        "message": f"{len(nuove)} timbrature inserite, {len(aggiornate)} aggiornate.",
+        "inserite": len(nuove),
+        "aggiornate": len(aggiornate),
+        "scartate": len(payload) - len(nuove) - len(aggiornate),
+        "risultati": risultati
+    }
+
+
+def leggi_timbrature(db: Session, utente: int, data: date):
     """
     Recupera le timbrature filtrate per utente, mese e anno della data fornita.
     """
-    mese = data.month
-    anno = data.year
+    inizio, fine = intervallo_mese(data.year, data.month)
 
-    timbrature = db.query(Timbratura).filter(
-        Timbratura.id_utente == utente,
-        extract("month", Timbratura.data) == mese,
-        extract("year", Timbratura.data) == anno
-    ).order_by(Timbratura.data.asc(), Timbratura.orario_ingresso.asc()).all()
+    with sessione_storica(db, inizio, fine - timedelta(days=1)) as db:
+        timbrature = db.query(Timbratura).filter(
+            Timbratura.id_utente == utente,
+            Timbratura.data >= inizio,
+            Timbratura.data < fine
+        ).order_by(Timbratura.data.asc(), Timbratura.orario_ingresso.asc()).all()
 
     return [
         {
             "id": t.id,
-            "data": t.data.strftime("%Y-%m-%d"),
-            "orario_ingresso": t.orario_ingresso.strftime("%H:%M"),
-            "orario_uscita": t.orario_uscita.strftime("%H:%M"),
+            "data": t.data.isoformat(),
+            "orario_ingresso": t.orario_ingresso.isoformat("minutes"),
+            "orario_uscita": t.orario_uscita.isoformat("minutes"),
             "tempo_lavorativo": t.tempo_lavorativo
         }
         for t in timbrature
     ]
 
 
-@router.delete("/timbrature/{timbratura_id}")
-def elimina_timbratura(timbratura_id: int, db: Session = Depends(get_db)):
+@router_letture.get("/timbrature", response_model=List[schemas.TimbraturaRiga], response_model_exclude_none=True)
+def get_timbrature(utente: int, data: date, request: Request, response: Response, db: Session = Depends(get_db)):
+    chiavi = [chiave_mese("timbrature", data)]
+    return lettura_condizionale(
+        db, request, response, chiavi, leggi_timbrature, utente, data, cache=chiave_timbrature(utente, data)
+    )
+
+
+@router.delete("/timbrature/{timbratura_id}", response_model=schemas.Messaggio)
+def elimina_timbratura(timbratura_id: int, db: Session = Depends(get_db_scrittura)):
     """
     Elimina una timbratura esistente.
     """
     timbratura = db.query(Timbratura).filter(Timbratura.id == timbratura_id).first()
 
     if not timbratura:
+        riga_non_archiviata(db, Timbratura, timbratura_id)
         raise HTTPException(status_code=404, detail="Timbratura non trovata.")
 
     db.delete(timbratura)
+    registra_timbratura(db, timbratura, -1)
+    registra_modifica(db, "timbrature", timbratura.id, eliminata=True)
+    incrementa_versione(db, chiave_mese("timbrature", timbratura.data))
     db.commit()
+    cache_letture.invalida(chiave_timbrature(timbratura.id_utente, timbratura.data))
     return {"message": "Timbratura eliminata con successo."}
 
 
-@router.get("/users")
-@router.post("/users/", include_in_schema=False)
-def get_users(db: Session = Depends(get_db)):
+def leggi_utenti(db: Session):
     utenti = db.query(User).all()
 
     return [{"id": user.id, "full_name": user.full_name} for user in utenti]
 
 
-@router.post("/lavoro")
-def get_lavoro(payload: GiornoRequest, db: Session = Depends(get_db)):
-    giorno = datetime.strptime(payload.data, "%Y-%m-%d").date()
+@router_letture.get("/users", response_model=List[schemas.Utente])
+@router_letture.post("/users/", include_in_schema=False, response_model=List[schemas.Utente])
+def get_users(request: Request, response: Response, db: Session = Depends(get_db)):
+    return lettura_condizionale(db, request, response, ["users"], leggi_utenti, cache=chiave_utenti())
+
+
+def chiave_giorno_lavoro(data: str):
+    """ Chiave di cache di /lavoro: la data normalizzata (400 se non valida) """
+    try:
+        return chiave_lavoro(datetime.strptime(data, "%Y-%m-%d").date())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato data non valido. Usa YYYY-MM-DD.")
+
+
+def leggi_lavori_giorno(db: Session, data: str):
+    giorno = datetime.strptime(data, "%Y-%m-%d").date()
 
-    lavori = db.query(Lavoro).filter(Lavoro.data == giorno).all()
+    with sessione_storica(db, giorno, giorno) as db:
+        lavori = db.query(Lavoro).filter(Lavoro.data == giorno).all()
 
     return [
         {
@@ -179,9 +495,22 @@ def get_lavoro(payload: GiornoRequest, db: Session = Depends(get_db)):
     ]
 
 
-@router.post("/lavoro/nuovo")
-def inserisci_lavoro(payload: LavoroRequest, db: Session = Depends(get_db)):
+def lavori_giorno_in_cache(db: Session, data: str):
+    """ Lavori del giorno da cache_letture, validati con la versione del mese """
+    chiave = chiave_giorno_lavoro(data)
+    versioni = leggi_versioni(db, [chiave_mese("lavoro", date.fromisoformat(chiave[1]))])
+    return cache_letture.ottieni(chiave, lambda: leggi_lavori_giorno(db, data), versioni)
+
+
+@router_letture.post("/lavoro", response_model=List[schemas.LavoroGiorno])
+def get_lavoro(payload: GiornoRequest, db: Session = Depends(get_db)):
+    return lavori_giorno_in_cache(db, payload.data)
+
+
+@router.post("/lavoro/nuovo", response_model=schemas.LavoroInserito)
+def inserisci_lavoro(payload: LavoroRequest, db: Session = Depends(get_db_scrittura)):
     giorno = datetime.strptime(payload.data, "%Y-%m-%d").date()
+    anno_aperto(giorno)
 
     nuovo_lavoro = Lavoro(
         data=giorno,
@@ -194,310 +523,587 @@ def inserisci_lavoro(payload: LavoroRequest, db: Session = Depends(get_db)):
     )
 
     db.add(nuovo_lavoro)
+    db.flush()
+    registra_lavoro(db, nuovo_lavoro)
+    registra_modifica(db, "lavoro", nuovo_lavoro.id)
+    incrementa_versione(db, chiave_mese("lavoro", giorno))
     db.commit()
+    cache_letture.invalida(chiave_lavoro(giorno))
     db.refresh(nuovo_lavoro)
 
-    return {"message": "Lavoro registrato con successo!", "lavoro": nuovo_lavoro}
+    return {
+        "message": "Lavoro registrato con successo!",
+        "lavoro": {
+            "id": nuovo_lavoro.id,
+            "data": nuovo_lavoro.data.isoformat(),
+            "cliente": nuovo_lavoro.cliente,
+            "contratto": nuovo_lavoro.contratto,
+            "saldato": nuovo_lavoro.saldato,
+            "commessa": nuovo_lavoro.commessa,
+            "saldo": nuovo_lavoro.saldo,
+            "extra_consegna": nuovo_lavoro.extra_consegna
+        }
+    }
+
+
+@router.post("/lavoro/import", response_model=schemas.ImportLavoriResponse)
+def importa_lavori_file(
+    file: UploadFile = File(...),
+    formato: str = Query("csv", description="csv oppure jsonl"),
+    db: Session = Depends(get_db_scrittura)
+):
+    """
+    Importa lavori da un file CSV o JSON lines, letto riga per riga.
+    Restituisce il numero di righe importate e le righe scartate.
+    """
+    if formato not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Formato non supportato. Usa csv oppure jsonl.")
+
+    esito = importa_lavori(db, leggi_file(file.file, formato))
+    cache_letture.invalida_area("lavoro")
+    return {"message": f"Importati {esito['importati']} lavori.", **esito}
+
+
+def leggi_ricerca(ricerca, db: Session, *args):
+    """ Esegue una ricerca di ricerca.py; 503 se il database non ha l'indice FTS5 """
+    try:
+        return ricerca(db, *args)
+    except OperationalError:
+        raise HTTPException(status_code=503, detail="Ricerca non disponibile: SQLite senza FTS5.")
+
+
+def leggi_lavori_trovati(db: Session, testo: str, limit: int, commessa: Optional[str]):
+    righe = leggi_ricerca(cerca_lavori, db, testo, limit, commessa)
+    return [{colonna.key: formatta_valore(getattr(r, colonna.key)) for colonna in COLONNE_LAVORO} for r in righe]
+
+
+def leggi_suggerimenti(db: Session, testo: str, limit: int):
+    return [{"cliente": r.cliente, "lavori": r.lavori} for r in leggi_ricerca(suggerisci_clienti, db, testo, limit)]
+
+
+# 📌 Ricerca lavori per cliente (prefissi, ordinati per pertinenza) e completamento del nome
+@router.get("/lavoro/search", response_model=List[schemas.LavoroRiga], response_model_exclude_none=True)
+def cerca_lavoro(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description="Parole (o inizi di parola) del nome del cliente"),
+    limit: int = Query(50, ge=1, le=500),
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
+    db: Session = Depends(get_db)
+):
+    return lettura_condizionale(db, request, response, ["lavoro"], leggi_lavori_trovati, q, limit, commessa)
+
+
+@router.get("/lavoro/autocomplete", response_model=List[schemas.SuggerimentoCliente])
+def completa_cliente(
+    request: Request,
+    response: Response,
+    q: str = Query(..., description="Testo digitato nel campo cliente"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    return lettura_condizionale(db, request, response, ["lavoro"], leggi_suggerimenti, q, limit)
 
 
-@router.delete("/lavoro/{lavoro_id}")
-def elimina_lavoro(lavoro_id: int, db: Session = Depends(get_db)):
+@router.delete("/lavoro/{lavoro_id}", response_model=schemas.Messaggio)
+def elimina_lavoro(lavoro_id: int, db: Session = Depends(get_db_scrittura)):
     lavoro = db.query(Lavoro).filter(Lavoro.id == lavoro_id).first()
 
     if not lavoro:
+        riga_non_archiviata(db, Lavoro, lavoro_id)
         raise HTTPException(status_code=404, detail="Lavoro non trovato")
 
     db.delete(lavoro)
+    registra_lavoro(db, lavoro, -1)
+    registra_modifica(db, "lavoro", lavoro.id, eliminata=True)
+    incrementa_versione(db, chiave_mese("lavoro", lavoro.data))
     db.commit()
+    cache_letture.invalida(chiave_lavoro(lavoro.data))
 
     return {"message": "Lavoro eliminato con successo!"}
 
 
-@router.get("/attivita")
-def get_attivita(
-    data_da: str,
-    data_a: str,
-    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
-    db: Session = Depends(get_db)
+def leggi_attivita(
+    db: Session, data_da: str, data_a: str, commessa: Optional[str], totals_only: bool,
+    limit: Optional[int] = None, cursor: Optional[str] = None, fields: Optional[str] = None
 ):
     """
     Recupera tutte le attività fatte in un mese e anno, con totale ore e importo.
+    Con limit le righe sono paginate (cursor = next_cursor della pagina precedente),
+    i totali si riferiscono sempre all'intero periodo.
     """
-    try:
-        # Converte le stringhe in oggetti datetime
-        data_da = datetime.strptime(data_da, "%Y-%m-%d").date()
-        data_a = datetime.strptime(data_a, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Formato data non valido. Usa YYYY-MM-DD.")
+    data_da, data_a = parse_intervallo(data_da, data_a)
+
+    with sessione_storica(db, data_da, data_a) as db:
+        totali = totali_lavori(db, data_da, data_a, commessa)
+
+        if totals_only:
+            return {"totali": totali}
 
-    query = db.query(Lavoro).filter(Lavoro.data.between(data_da, data_a))
+        lavori, next_cursor = leggi_pagina(
+            lambda colonne, dopo, n: lista_lavori(db, data_da, data_a, commessa, colonne, dopo, n),
+            fields, COLONNE_LAVORO, limit, cursor
+        )
 
-    if commessa:
-        query = query.filter(Lavoro.commessa == commessa)
+    return {
+        "lavori": lavori,
+        "totali": totali,
+        "next_cursor": next_cursor
+    }
 
-    lavori = query.order_by(Lavoro.data).all()
 
-    # Calcoli dei totali
+@router_letture.get("/attivita", response_model=schemas.AttivitaResponse, response_model_exclude_unset=True)
+def get_attivita(
+    data_da: str,
+    data_a: str,
+    request: Request,
+    response: Response,
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
+    totals_only: bool = Query(False, description="Restituisce solo i totali, senza le righe"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Righe per pagina (default: tutte)"),
+    cursor: Optional[str] = Query(None, description="next_cursor restituito dalla pagina precedente"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db)
+):
+    return lettura_condizionale(
+        db, request, response, chiavi_attivita(data_da, data_a),
+        leggi_attivita, data_da, data_a, commessa, totals_only, limit, cursor, fields
+    )
 
-    totale_contratto = sum(l.contratto for l in lavori)
-    # totale_saldato = sum(l.saldato for l in lavori)
-    extra_su_consegne = sum(l.extra_consegna or 0 for l in lavori)
-    percentuale_trasporto = totale_contratto * 0.06
-    totale_lordo = percentuale_trasporto + extra_su_consegne
 
-    # Totali per tipo di saldo
-    totale_contanti = sum(l.saldato for l in lavori if l.saldo == "Contanti")
-    totale_assegni = sum(l.saldato for l in lavori if l.saldo == "Assegno")
-    totale_bonifico = sum(l.saldato for l in lavori if l.saldo == "Bonifico")
-    totale_finanziamento = sum(l.saldato for l in lavori if l.saldo == "Finanziamento")
-    totale_sospeso = sum(l.saldato for l in lavori if l.saldo == "Sospeso")
-    totale_negozio = sum(l.saldato for l in lavori if l.saldo == "Pag. Negozio")
+@router.get("/dashboard/summary", response_model=schemas.DashboardSummary)
+def get_dashboard_summary(data_da: str, data_a: str, db: Session = Depends(get_db)):
+    """
+    Indicatori della dashboard per il periodo in una sola chiamata: ore per utente,
+    totali per commessa e saldo (con percentuale trasporto) e serie giornaliere.
+    """
+    data_da, data_a = parse_intervallo(data_da, data_a)
 
-    totale_saldato = totale_contanti + totale_assegni + totale_bonifico + totale_finanziamento
+    with sessione_storica(db, data_da, data_a) as db:
+        indicatori = riepilogo_dashboard(db, data_da, data_a)
 
     return {
-        "lavori": [
-            {
-                "id": l.id,
-                "data": l.data.strftime("%Y-%m-%d"),
-                "cliente": l.cliente,
-                "contratto": l.contratto,
-                "saldato": l.saldato,
-                "commessa": l.commessa,
-                "saldo": l.saldo,
-                "extra_consegna": l.extra_consegna
-            }
-            for l in lavori
-        ],
-        "totali": {
-            "contratto": totale_contratto,
-            "saldato": totale_saldato,
-            "percentuale_trasporto": percentuale_trasporto,
-            "extra_su_consegne": extra_su_consegne,
-            "totale_lordo": totale_lordo,
-            "contanti": totale_contanti,
-            "assegni": totale_assegni,
-            "bonifico": totale_bonifico,
-            "finanziamento": totale_finanziamento,
-            "negozio": totale_negozio,
-            "sospeso": totale_sospeso
-        }
+        "data_da": data_da.strftime("%Y-%m-%d"),
+        "data_a": data_a.strftime("%Y-%m-%d"),
+        **indicatori
     }
 
 
-@router.get("/esportazione/timbrature")
-def get_timbrature_utente(utente: int, mese: int, anno: int, db: Session = Depends(get_db)):
+@router.get("/esportazione/timbrature", response_model=schemas.TimbratureUtenteResponse)
+def get_timbrature_utente(
+    utente: int,
+    mese: int = Query(..., ge=1, le=12),
+    anno: int = Query(..., ge=1, le=9998),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Righe per pagina (default: tutte)"),
+    cursor: Optional[str] = Query(None, description="next_cursor restituito dalla pagina precedente"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: Session = Depends(get_db)
+):
     """
     Recupera tutte le timbrature di un utente per il mese e anno selezionati.
+    Senza limit restituisce la lista completa; con limit una pagina, il cursore
+    della successiva e i totali del mese.
     """
-    timbrature = db.query(Timbratura).filter(
-        Timbratura.id_utente == utente,
-        extract("month", Timbratura.data) == mese,
-        extract("year", Timbratura.data) == anno
-    ).order_by(Timbratura.data.asc()).all()
+    inizio, fine = intervallo_mese(anno, mese)
 
+    with sessione_storica(db, inizio, fine - timedelta(days=1)) as db:
+        timbrature, next_cursor = leggi_pagina(
+            lambda colonne, dopo, n: lista_timbrature_mese(db, utente, anno, mese, colonne, dopo, n),
+            fields, COLONNE_TIMBRATURA, limit, cursor
+        )
+
+        if limit is None:
+            return timbrature
+
+        return {
+            "timbrature": timbrature,
+            "totali": totali_timbrature_mese(db, utente, anno, mese),
+            "next_cursor": next_cursor
+        }
+
+
+# 📌 Riepiloghi mensili (letti dalle tabelle riepilogo_*, senza scorrere le righe)
+@router.get("/riepilogo/ore", response_model=List[schemas.RiepilogoOreMese])
+def get_riepilogo_ore(
+    anno: int,
+    mese: Optional[int] = Query(None, ge=1, le=12, description="Mese (default: tutto l'anno)"),
+    utente: Optional[int] = Query(None, description="Utente (default: tutti)"),
+    db: Session = Depends(get_db)
+):
     return [
         {
-            "id": t.id,
-            "data": t.data.strftime("%Y-%m-%d"),
-            "orario_ingresso": t.orario_ingresso.strftime("%H:%M"),
-            "orario_uscita": t.orario_uscita.strftime("%H:%M"),
-            "tempo_lavorativo": t.tempo_lavorativo
+            "anno": r.anno,
+            "mese": r.mese,
+            "id_utente": r.id_utente,
+            "giorni": r.giorni,
+            "tempo_lavorativo": r.tempo_lavorativo,
+            "ore": round(r.tempo_lavorativo / 60, 2)
         }
-        for t in timbrature
+        for r in ore_mensili(db, anno, mese, utente)
     ]
 
 
+@router.get("/riepilogo/lavoro", response_model=List[schemas.RiepilogoLavoroMese])
+def get_riepilogo_lavoro(
+    anno: int,
+    mese: Optional[int] = Query(None, ge=1, le=12, description="Mese (default: tutto l'anno)"),
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
+    db: Session = Depends(get_db)
+):
+    return [
+        {
+            "anno": r.anno,
+            "mese": r.mese,
+            "commessa": r.commessa,
+            "saldo": r.saldo,
+            "numero": r.numero,
+            "contratto": r.contratto,
+            "saldato": r.saldato,
+            "extra_consegna": r.extra_consegna
+        }
+        for r in lavoro_mensile(db, anno, mese, commessa)
+    ]
+
+
+def risposta_pdf(contenuto: bytes, filename: str):
+    """ Restituisce il PDF generato in memoria come risposta in streaming """
+    return StreamingResponse(
+        io.BytesIO(contenuto),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def renderizza_pdf(report: str, funzione, *argomenti) -> bytes:
+    """ Genera il PDF nel process pool di rendering.py; 503 con Retry-After se il pool è saturo """
+    try:
+        with misura_pdf(report):
+            return renderizza(funzione, *argomenti)
+    except PoolSaturo:
+        raise HTTPException(
+            status_code=503,
+            detail="Troppi report in generazione, riprova fra qualche secondo.",
+            headers={"Retry-After": str(config.PDF_RETRY_AFTER)}
+        )
+
+
 # 📌 Esporta Timbrature in PDF
-@router.get("/esporta/timbrature")
-def esporta_timbrature(utente: int, mese: int, anno: int, db: Session = Depends(get_db)):
-    import datetime
-    timbrature = db.query(Timbratura).join(User).filter(
-        Timbratura.id_utente == utente,
-        Timbratura.data >= datetime.date(anno, mese, 1),
-        Timbratura.data < datetime.date(anno, mese + 1, 1)
-    ).order_by(Timbratura.data).all()
-
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", style="B", size=16)
-    pdf.cell(200, 10, f"Timbrature - {anno}-{mese:02d}", ln=True, align="C")
-
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, f"Utente: {timbrature[0].utente.full_name if timbrature else 'Nessun dato'}", ln=True)
-
-    pdf.ln(10)
-    pdf.set_font("Arial", style="B", size=10)
-    pdf.cell(40, 10, "Data", 1)
-    pdf.cell(40, 10, "Ingresso", 1)
-    pdf.cell(40, 10, "Uscita", 1)
-    pdf.cell(40, 10, "Ore Lavorate", 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", size=10)
-    totale_ore = 0
-    for t in timbrature:
-        ore_lavorate = t.tempo_lavorativo / 60
-        totale_ore += ore_lavorate
-        pdf.cell(40, 10, str(t.data), 1)
-        pdf.cell(40, 10, str(t.orario_ingresso), 1)
-        pdf.cell(40, 10, str(t.orario_uscita), 1)
-        pdf.cell(40, 10, f"{ore_lavorate:.2f}", 1)
-        pdf.ln()
-
-    pdf.cell(120, 10, "Totale Ore", 1)
-    pdf.cell(40, 10, f"{totale_ore:.2f}", 1)
-
-    response = Response(content=pdf.output(dest="S").encode("latin1"), media_type="application/pdf")
-    response.headers["Content-Disposition"] = "attachment; filename=timbrature.pdf"
-    return response
+# Le sessioni sono aperte solo per leggere versioni e righe: il rendering avviene a sessione chiusa
+@router.get("/esporta/timbrature", response_class=StreamingResponse)
+def esporta_timbrature(utente: int, mese: int = Query(..., ge=1, le=12), anno: int = Query(..., ge=1, le=9998)):
+    inizio, fine = intervallo_mese(anno, mese)
+
+    def genera():
+        with SessionLocal() as db, sessione_storica(db, inizio, fine - timedelta(days=1)) as storico:
+            nome_utente, righe = timbrature_export(storico, utente, anno, mese)
+        timbrature = [RigaTimbratura(*r) for r in righe]
+        return renderizza_pdf("timbrature", pdf_timbrature, anno, mese, nome_utente, timbrature)
+
+    # Il PDF riporta anche il nome dell'utente: una modifica agli utenti rigenera il report
+    with SessionLocal() as db:
+        versioni = leggi_versioni(db, [chiave_mese("timbrature", inizio), "users"])
+
+    contenuto = report_da_cache(
+        "esporta_timbrature",
+        {"utente": utente, "mese": mese, "anno": anno},
+        versioni,
+        genera
+    )
+
+    return risposta_pdf(contenuto, "timbrature.pdf")
 
 
 # 📌 Esporta Attività in PDF
-@router.get("/esporta/attivita")
+@router.get("/esporta/attivita", response_class=StreamingResponse)
 def esporta_attivita(
     data_da: str,
     data_a: str,
-    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa")
+):
+    data_da, data_a = parse_intervallo(data_da, data_a)
+
+    def genera():
+        with SessionLocal() as db, sessione_storica(db, data_da, data_a) as storico:
+            # Calcolo Totali
+            totali = totali_lavori(storico, data_da, data_a, commessa)
+
+            if not totali["numero_lavori"]:
+                raise HTTPException(status_code=404, detail="Nessuna attività trovata per il periodo selezionato.")
+
+            lavori = [RigaLavoro(*r) for r in lista_lavori(storico, data_da, data_a, commessa)]
+        return renderizza_pdf("attivita", pdf_attivita, data_da, data_a, lavori, totali)
+
+    with SessionLocal() as db:
+        versioni = leggi_versioni(db, chiavi_intervallo("lavoro", data_da, data_a))
+
+    contenuto = report_da_cache(
+        "esporta_attivita",
+        {"data_da": data_da, "data_a": data_a, "commessa": commessa},
+        versioni,
+        genera
+    )
+
+    return risposta_pdf(contenuto, "attivita.pdf")
+
+
+# 📌 Esporta dati grezzi in CSV / NDJSON (streaming, memoria costante)
+@router.get("/esporta/attivita.{formato}", response_class=StreamingResponse)
+def esporta_attivita_dati(
+    formato: str,
+    data_da: str,
+    data_a: str,
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa")
+):
+    if formato not in FORMATI:
+        raise HTTPException(status_code=404, detail="Formato non supportato. Usa csv oppure ndjson.")
+
+    data_da, data_a = parse_intervallo(data_da, data_a)
+
+    return StreamingResponse(
+        stream_attivita(formato, data_da, data_a, commessa),
+        media_type=FORMATI[formato],
+        headers={"Content-Disposition": f"attachment; filename=attivita.{formato}"}
+    )
+
+
+@router.get("/esporta/timbrature.{formato}", response_class=StreamingResponse)
+def esporta_timbrature_dati(
+    formato: str,
+    anno: int,
+    mese: Optional[int] = Query(None, ge=1, le=12, description="Mese (default: tutto l'anno)"),
+    utente: Optional[int] = Query(None, description="Utente (default: tutti)")
+):
+    if formato not in FORMATI:
+        raise HTTPException(status_code=404, detail="Formato non supportato. Usa csv oppure ndjson.")
+
+    if mese is None:
+        inizio, fine = date(anno, 1, 1), date(anno + 1, 1, 1)
+    else:
+        inizio, fine = intervallo_mese(anno, mese)
+
+    return StreamingResponse(
+        stream_timbrature(formato, inizio, fine, utente),
+        media_type=FORMATI[formato],
+        headers={"Content-Disposition": f"attachment; filename=timbrature.{formato}"}
+    )
+
+
+# 📌 Esportazione batch (tutti i report del mese in un unico ZIP)
+@router.post("/esporta/batch", response_model=schemas.BatchJobResponse)
+def avvia_esportazione_batch(payload: BatchRequest):
+    if not 1 <= payload.mese <= 12:
+        raise HTTPException(status_code=400, detail="Mese non valido.")
+
+    job = avvia_batch(payload.anno, payload.mese, payload.utenti, payload.commesse)
+    return as_dict(job)
+
+
+@router.get("/esporta/batch/{job_id}", response_model=schemas.BatchJobResponse)
+def stato_esportazione_batch(job_id: str):
+    job = get_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Esportazione non trovata.")
+
+    return as_dict(job)
+
+
+@router.get("/esporta/batch/{job_id}/zip", response_class=FileResponse)
+def scarica_esportazione_batch(job_id: str):
+    job = get_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Esportazione non trovata.")
+    if job.stato != "completato":
+        raise HTTPException(status_code=409, detail="Esportazione non ancora completata.")
+
+    return FileResponse(
+        percorso_zip(job.id),
+        media_type="application/zip",
+        filename=f"report_{job.anno}-{job.mese:02d}.zip"
+    )
+
+
+# 📌 Sincronizzazione incrementale della PWA (registro modifiche, vedi sincronizzazione.py)
+@router.get("/sync/changes", response_model=schemas.SyncChanges)
+def sync_changes(
+    since: int = Query(0, ge=0, description="Versione dell'ultima sincronizzazione (0 = tutto)"),
+    limit: int = Query(MAX_MODIFICHE, ge=1, le=MAX_MODIFICHE, description="Voci del registro per risposta"),
     db: Session = Depends(get_db)
 ):
-    # import datetime
+    """
+    Righe create o modificate e id cancellati dopo la versione since.
+    Se "altre" è true il client richiama l'endpoint con since=versione.
+    """
+    if since > versione_corrente(db):
+        raise HTTPException(status_code=409, detail="Versione sconosciuta: ripetere la sincronizzazione completa (since=0).")
 
-    try:
-        # Converte le stringhe in oggetti datetime
-        data_da = datetime.strptime(data_da, "%Y-%m-%d").date()
-        data_a = datetime.strptime(data_a, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Formato data non valido. Usa YYYY-MM-DD.")
+    versione, altre, righe, eliminati = modifiche_da(db, since, limit)
+    return {
+        "versione": versione,
+        "altre": altre,
+        "modifiche": {
+            tabella: [{campo: formatta_valore(valore) for campo, valore in r._mapping.items()} for r in lista]
+            for tabella, lista in righe.items()
+        },
+        "eliminati": eliminati
+    }
 
-    query = db.query(Lavoro).filter(Lavoro.data.between(data_da, data_a))
-
-    if commessa:
-        query = query.filter(Lavoro.commessa == commessa)
-
-    lavori = query.order_by(Lavoro.data).all()
-
-    if not lavori:
-        raise HTTPException(status_code=404, detail="Nessuna attività trovata per il periodo selezionato.")
-
-    # Calcolo Totali
-    totale_contratto = sum(l.contratto for l in lavori)
-    totale_saldato = sum(l.saldato for l in lavori)
-    extra_su_consegne = sum(l.extra_consegna or 0 for l in lavori)
-    percentuale_trasporto = totale_contratto * 0.06
-    totale_lordo = percentuale_trasporto + extra_su_consegne
-
-    # Totali per tipo di saldo
-    totale_contanti = sum(l.saldato for l in lavori if l.saldo == "Contanti")
-    totale_assegni = sum(l.saldato for l in lavori if l.saldo == "Assegno")
-    totale_bonifico = sum(l.saldato for l in lavori if l.saldo == "Bonifico")
-    totale_sospeso = sum(l.saldato for l in lavori if l.saldo == "Sospeso")
-    totale_negozio = sum(l.saldato for l in lavori if l.saldo == "Pag. Negozio")
-
-    # Creazione PDF
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", style="B", size=16)
-    pdf.cell(200, 10, f"Attività | {data_da} - {data_a}", ln=True, align="C")
-
-    pdf.ln(10)
-    pdf.set_font("Arial", style="B", size=10)
-
-    # Intestazione Tabella
-    pdf.cell(20, 10, "Commessa", 1)
-    pdf.cell(25, 10, "Data", 1)
-    pdf.cell(40, 10, "Cliente", 1)
-    pdf.cell(25, 10, "Pagamento", 1)
-    pdf.cell(25, 10, "Contratto", 1)
-    pdf.cell(25, 10, "Saldo", 1)
-    pdf.cell(20, 10, "Extra", 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", size=10)
-
-    for l in lavori:
-        pdf.cell(20, 10, safe_text(l.commessa), 1)
-        pdf.cell(25, 10, safe_text(str(l.data)), 1)
-        pdf.cell(40, 10, safe_text(l.cliente), 1)
-        pdf.cell(25, 10, safe_text(l.saldo), 1)
-        pdf.cell(25, 10, safe_text(f"{l.contratto:.2f} {chr(128)}"), 1)
-        pdf.cell(25, 10, safe_text(f"{l.saldato:.2f} {chr(128)}"), 1)
-        pdf.cell(20, 10, safe_text(f"{l.extra_consegna:.2f} {chr(128)}"), 1)
-        pdf.ln()
-
-    # Totali nella tabella
-    pdf.set_font("Arial", style="B", size=10)  # Imposta il font in grassetto per la riga del totale
-    pdf.cell(110, 10, "Totale", 1, align="R")  # Colonne fino a saldo
-    pdf.cell(25, 10, safe_text(f"{totale_contratto:.2f} {chr(128)}"), 1)
-    pdf.cell(25, 10, safe_text(f"{totale_saldato:.2f} {chr(128)}"), 1)
-    pdf.cell(20, 10, safe_text(f"{extra_su_consegne:.2f} {chr(128)}"), 1)
-    pdf.ln()
-    pdf.set_font("Arial", size=10)  # Torna al font normale
-
-    # Riepilogo Totali
-    pdf.ln(10)
-    pdf.set_font("Arial", style="B", size=12)
-    pdf.cell(0, 10, "Riepilogo Totali", ln=True)
-
-    pdf.set_font("Arial", size=10)
-    pdf.cell(80, 10, "Totale Contratto:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_contratto:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.cell(80, 10, "Percentuale trasporto (6%):", 1)
-    pdf.cell(40, 10, safe_text(f"{percentuale_trasporto:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.cell(80, 10, "Extra su consegne:", 1)
-    pdf.cell(40, 10, safe_text(f"{extra_su_consegne:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", style="B", size=10)
-    pdf.cell(80, 10, "Totale Lordo:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_lordo:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    # Dettaglio Pagamenti
-    pdf.ln(5)
-    pdf.set_font("Arial", style="B", size=12)
-    pdf.cell(0, 10, "Dettaglio Saldi", ln=True)
-
-    pdf.set_font("Arial", size=10)
-    pdf.cell(80, 10, "Totale Contanti:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_contanti:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.cell(80, 10, "Totale Assegni:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_assegni:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.cell(80, 10, "Totale Bonifico:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_bonifico:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.cell(80, 10, "Totale Negozio:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_negozio:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", style="B", size=10)
-    pdf.cell(80, 10, "Totale:", 1)
-    pdf.cell(40, 10, safe_text(f"{(totale_contanti + totale_assegni + totale_bonifico + totale_negozio):.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", size=10)  # Rimuove il grassetto
-    pdf.cell(80, 10, "Totale Sospeso:", 1)
-    pdf.cell(40, 10, safe_text(f"{totale_sospeso:.2f} {chr(128)}"), 1)
-    pdf.ln()
-
-    # Salva PDF su disco e restituiscilo come risposta HTTP
-    pdf_file = "attivita.pdf"
-    pdf.output(pdf_file, "F")
-
-    with open(pdf_file, "rb") as file:
-        pdf_content = file.read()
-
-    response = Response(content=pdf_content, media_type="application/pdf")
-    response.headers["Content-Disposition"] = f"attachment; filename={pdf_file}"
-    return response
+
+def _riga_esistente(db: Session, modello, operazione: OperazioneSync):
+    riga = db.query(modello).filter(modello.id == operazione.id).first() if operazione.id is not None else None
+    if operazione.id is not None and riga is None and modello is not User:
+        verifica_non_archiviata(db, modello, operazione.id)
+    if operazione.id is not None and riga is None and operazione.operazione == "upsert":
+        raise ValueError(f"{operazione.tabella} {operazione.id} non trovata")
+    return riga
+
+
+def applica_operazione(db: Session, operazione: OperazioneSync, delta: DeltaRiepiloghi, versioni: set):
+    """
+    Applica una modifica offline nella transazione corrente; ValueError se non valida.
+    Restituisce l'esito (inserita, aggiornata, eliminata, assente) e l'id della riga.
+    """
+    if operazione.operazione not in ("upsert", "delete"):
+        raise ValueError(f"operazione non valida: {operazione.operazione}")
+
+    if operazione.tabella == "users":
+        utente = _riga_esistente(db, User, operazione)
+        versioni.add("users")
+        if operazione.operazione == "delete":
+            if utente is None:
+                return "assente", operazione.id
+            if db.query(Timbratura.id).filter(Timbratura.id_utente == utente.id).first():
+                raise ValueError("Impossibile eliminare un utente con timbrature registrate")
+            db.delete(utente)
+            registra_modifica(db, "users", utente.id, eliminata=True)
+            return "eliminata", utente.id
+
+        nome = str(operazione.dati.get("full_name") or "").strip()
+        if not nome:
+            raise ValueError("full_name: valore mancante")
+        esito = "aggiornata" if utente else "inserita"
+        if utente is None:
+            utente = User(full_name=nome)
+            db.add(utente)
+        utente.full_name = nome
+        db.flush()
+        registra_modifica(db, "users", utente.id)
+        return esito, utente.id
+
+    if operazione.tabella == "timbrature":
+        timbratura = _riga_esistente(db, Timbratura, operazione)
+        if operazione.operazione == "delete":
+            if timbratura is None:
+                return "assente", operazione.id
+            delta.timbratura(timbratura.id_utente, timbratura.data, timbratura.tempo_lavorativo, -1)
+            versioni.add(chiave_mese("timbrature", timbratura.data))
+            db.delete(timbratura)
+            registra_modifica(db, "timbrature", timbratura.id, eliminata=True)
+            return "eliminata", timbratura.id
+
+        valori = valida_timbratura(TimbraturaRequest(**operazione.dati))
+        # Una sola timbratura per utente e giorno: senza id si aggiorna quella già presente
+        stesso_giorno = db.query(Timbratura).filter(
+            Timbratura.id_utente == valori["id_utente"], Timbratura.data == valori["data"]
+        ).first()
+        if timbratura is None:
+            timbratura = stesso_giorno
+        elif stesso_giorno is not None and stesso_giorno.id != timbratura.id:
+            raise ValueError("Esiste già una timbratura per questo utente in questa data.")
+
+        esito = "aggiornata" if timbratura else "inserita"
+        if timbratura is None:
+            timbratura = Timbratura(**valori)
+            db.add(timbratura)
+        else:
+            delta.timbratura(timbratura.id_utente, timbratura.data, timbratura.tempo_lavorativo, -1)
+            versioni.add(chiave_mese("timbrature", timbratura.data))
+            for campo, valore in valori.items():
+                setattr(timbratura, campo, valore)
+        delta.timbratura(valori["id_utente"], valori["data"], valori["tempo_lavorativo"])
+        versioni.add(chiave_mese("timbrature", valori["data"]))
+        db.flush()
+        registra_modifica(db, "timbrature", timbratura.id)
+        return esito, timbratura.id
+
+    if operazione.tabella == "lavoro":
+        lavoro = _riga_esistente(db, Lavoro, operazione)
+        if lavoro is None and operazione.operazione == "delete":
+            return "assente", operazione.id
+        if lavoro is not None:
+            # Il contenuto precedente esce dai riepiloghi (cancellazione o modifica)
+            delta.lavoro_registrato(
+                lavoro.data, lavoro.commessa, lavoro.saldo, lavoro.contratto, lavoro.saldato, lavoro.extra_consegna, -1
+            )
+            versioni.add(chiave_mese("lavoro", lavoro.data))
+        if operazione.operazione == "delete":
+            db.delete(lavoro)
+            registra_modifica(db, "lavoro", lavoro.id, eliminata=True)
+            return "eliminata", lavoro.id
+
+        valori = valida_lavoro(operazione.dati)
+        esito = "aggiornata" if lavoro else "inserita"
+        if lavoro is None:
+            lavoro = Lavoro(**valori)
+            db.add(lavoro)
+        else:
+            for campo, valore in valori.items():
+                setattr(lavoro, campo, valore)
+        delta.lavoro_registrato(
+            valori["data"], valori["commessa"], valori["saldo"],
+            valori["contratto"], valori["saldato"], valori["extra_consegna"]
+        )
+        versioni.add(chiave_mese("lavoro", valori["data"]))
+        db.flush()
+        registra_modifica(db, "lavoro", lavoro.id)
+        return esito, lavoro.id
+
+    raise ValueError(f"tabella non valida: {operazione.tabella}")
+
+
+@router.post("/sync/push", response_model=schemas.SyncPushResponse, response_model_exclude_none=True)
+def sync_push(payload: SyncPushRequest, db: Session = Depends(get_db_scrittura)):
+    """
+    Applica in un'unica transazione le modifiche fatte offline, nell'ordine ricevuto
+    (l'ultima scrittura vince). Se un'operazione non è valida non viene applicato nulla.
+    """
+    delta = DeltaRiepiloghi()
+    versioni = set()
+    risultati = []
+
+    for indice, operazione in enumerate(payload.operazioni):
+        try:
+            esito, id_riga = applica_operazione(db, operazione, delta, versioni)
+        except AnnoArchiviato as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail={"indice": indice, "errore": str(e)})
+        except (ValueError, TypeError) as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail={"indice": indice, "errore": str(e)})
+        risultati.append({
+            "indice": indice, "tabella": operazione.tabella, "esito": esito, "id": id_riga, "rif": operazione.rif
+        })
+
+    delta.applica(db)
+    incrementa_versione(db, *versioni)
+    db.commit()
+    cache_letture.invalida_area(*{operazione.tabella for operazione in payload.operazioni})
+
+    return {"versione": versione_corrente(db), "risultati": risultati}
+
+
+# 📌 Metriche in formato Prometheus (latenze, query SQL per richiesta, tempi dei PDF)
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(esporta_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# 📌 Readiness: il server risponde e il database è raggiungibile (usato dai launcher, vedi avvio.py)
+@router.get("/health", response_model=schemas.Salute)
+def health(db: Session = Depends(get_db)):
+    try:
+        db.execute(text("SELECT 1"))
+    except SQLAlchemyError:
+        raise HTTPException(status_code=503, detail="Database non raggiungibile")
+    return {"status": "ok"}
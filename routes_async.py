@@ -0,0 +1,55 @@
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import schemas
+from database import get_async_db
+from routes import (
+    GiornoRequest, chiavi_attivita, lavori_giorno_in_cache, leggi_attivita, leggi_timbrature, leggi_utenti,
+    lettura_condizionale
+)
+from cache_letture import chiave_timbrature, chiave_utenti
+from versioni import chiave_mese
+
+# Versioni async delle letture di routes.router_letture (attive con MONTARREDA_DB_ASYNC=1).
+# La logica è la stessa: run_sync la esegue sulla sessione aiosqlite senza occupare il threadpool.
+router = APIRouter()
+
+
+@router.get("/timbrature", response_model=List[schemas.TimbraturaRiga], response_model_exclude_none=True)
+async def get_timbrature(utente: int, data: date, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    chiavi = [chiave_mese("timbrature", data)]
+    return await db.run_sync(
+        lettura_condizionale, request, response, chiavi, leggi_timbrature, utente, data,
+        cache=chiave_timbrature(utente, data)
+    )
+
+
+@router.get("/users", response_model=List[schemas.Utente])
+@router.post("/users/", include_in_schema=False, response_model=List[schemas.Utente])
+async def get_users(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lettura_condizionale, request, response, ["users"], leggi_utenti, cache=chiave_utenti())
+
+
+@router.post("/lavoro", response_model=List[schemas.LavoroGiorno])
+async def get_lavoro(payload: GiornoRequest, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lavori_giorno_in_cache, payload.data)
+
+
+@router.get("/attivita", response_model=schemas.AttivitaResponse, response_model_exclude_unset=True)
+async def get_attivita(
+    data_da: str,
+    data_a: str,
+    request: Request,
+    response: Response,
+    commessa: Optional[str] = Query(None, description="Filtro opzionale per commessa"),
+    totals_only: bool = Query(False, description="Restituisce solo i totali, senza le righe"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Righe per pagina (default: tutte)"),
+    cursor: Optional[str] = Query(None, description="next_cursor restituito dalla pagina precedente"),
+    fields: Optional[str] = Query(None, description="Campi da restituire, separati da virgola"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        lettura_condizionale, request, response, chiavi_attivita(data_da, data_a),
+        leggi_attivita, data_da, data_a, commessa, totals_only, limit, cursor, fields
+    )
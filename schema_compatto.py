@@ -0,0 +1,112 @@
+import argparse
+import os
+import sqlite3
+from typing import Optional
+
+# 🔹 Conversione della tabella timbrature fra lo schema testuale (Date/Time di SQLAlchemy,
+# salvati come stringhe) e lo schema compatto (giorno giuliano e minuti interi, vedi
+# models.GiornoGiuliano / MinutiGiorno). Va eseguita a server fermo, poi si imposta
+# MONTARREDA_SCHEMA_COMPATTO di conseguenza: init_db rifiuta uno schema diverso dalla configurazione.
+
+# Espressioni SQL di conversione per colonna: (verso lo schema compatto, verso lo schema testuale)
+CONVERSIONI = {
+    "data": ("CAST(julianday(data) + 0.5 AS INTEGER)", "date(data)"),
+    "orario_ingresso": (
+        "CAST(substr(orario_ingresso, 1, 2) AS INTEGER) * 60 + CAST(substr(orario_ingresso, 4, 2) AS INTEGER)",
+        "printf('%02d:%02d:00.000000', orario_ingresso / 60, orario_ingresso % 60)"
+    ),
+    "orario_uscita": (
+        "CAST(substr(orario_uscita, 1, 2) AS INTEGER) * 60 + CAST(substr(orario_uscita, 4, 2) AS INTEGER)",
+        "printf('%02d:%02d:00.000000', orario_uscita / 60, orario_uscita % 60)"
+    ),
+}
+
+
+def schema_compatto_presente(dbapi_connection) -> Optional[bool]:
+    """ True se timbrature.data è intera (schema compatto), False se testuale, None se la tabella non esiste """
+    cursor = dbapi_connection.cursor()
+    try:
+        colonne = {riga[1]: riga[2].upper() for riga in cursor.execute("PRAGMA table_info(timbrature)")}
+    finally:
+        cursor.close()
+    if "data" not in colonne:
+        return None
+    return colonne["data"] == "INTEGER"
+
+
+def _ddl(compatto: bool):
+    """ CREATE TABLE e CREATE INDEX di timbrature nello schema richiesto, generati da models.py """
+    from sqlalchemy import Date, MetaData, Time
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from models import Base, GiornoGiuliano, MinutiGiorno
+
+    # Copia dell'intero schema: la chiave esterna id_utente deve trovare la tabella users
+    metadata = MetaData()
+    for originale in Base.metadata.sorted_tables:
+        originale.to_metadata(metadata)
+    tabella = metadata.tables["timbrature"]
+    tabella.c.data.type = GiornoGiuliano() if compatto else Date()
+    for nome in ("orario_ingresso", "orario_uscita"):
+        tabella.c[nome].type = MinutiGiorno() if compatto else Time()
+
+    dialetto = sqlite.dialect()
+    return (
+        str(CreateTable(tabella).compile(dialect=dialetto)),
+        [str(CreateIndex(indice).compile(dialect=dialetto)) for indice in tabella.indexes]
+    )
+
+
+def converti(percorso: str, compatto: bool) -> bool:
+    """ Converte la tabella timbrature del file indicato; False se era già nello schema richiesto """
+    crea_tabella, crea_indici = _ddl(compatto)
+    connessione = sqlite3.connect(percorso, isolation_level=None)
+    try:
+        cursor = connessione.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            presente = schema_compatto_presente(connessione)
+            if presente is None or presente == compatto:
+                cursor.execute("ROLLBACK")
+                return False
+
+            colonne = [riga[1] for riga in cursor.execute("PRAGMA table_info(timbrature)")]
+            valori = [CONVERSIONI[c][0 if compatto else 1] if c in CONVERSIONI else c for c in colonne]
+
+            cursor.execute("ALTER TABLE timbrature RENAME TO timbrature_conversione")
+            cursor.execute(crea_tabella)
+            cursor.execute(
+                f"INSERT INTO timbrature ({', '.join(colonne)}) "
+                f"SELECT {', '.join(valori)} FROM timbrature_conversione"
+            )
+            # Gli indici della vecchia tabella spariscono con lei, poi vengono ricreati con lo stesso nome
+            cursor.execute("DROP TABLE timbrature_conversione")
+            for istruzione in crea_indici:
+                cursor.execute(istruzione)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("VACUUM")
+        return True
+    finally:
+        connessione.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converte le timbrature fra schema testuale e schema compatto.")
+    parser.add_argument("schema", choices=("compatto", "testo"))
+    parser.add_argument("--database", help="File SQLite da convertire (default: MONTARREDA_DATABASE_PATH o database.db)")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["MONTARREDA_DATABASE_PATH"] = args.database
+
+    from archivio import anni_archiviati, percorso_archivio
+    from database import DATABASE_PATH
+
+    compatto = args.schema == "compatto"
+    for percorso in [DATABASE_PATH] + [percorso_archivio(anno) for anno in anni_archiviati()]:
+        esito = "convertito" if converti(percorso, compatto) else "già nello schema richiesto"
+        print(f"✅ {percorso}: {esito}")
+    print(f"ℹ️ Imposta MONTARREDA_SCHEMA_COMPATTO={'1' if compatto else '0'} prima di avviare il server.")
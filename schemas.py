@@ -0,0 +1,208 @@
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel
+
+# 🔹 Modelli di risposta degli endpoint di routes.py: la serializzazione avviene
+# su campi dichiarati invece che per riflessione su dict e oggetti ORM
+
+
+class Messaggio(BaseModel):
+    message: str
+
+
+class Salute(BaseModel):
+    status: str
+
+
+class LoginResponse(BaseModel):
+    message: str
+    token: str
+
+
+class Utente(BaseModel):
+    id: int
+    full_name: str
+
+
+class TimbraturaRiga(BaseModel):
+    id: Optional[int] = None
+    id_utente: Optional[int] = None
+    data: str
+    orario_ingresso: str
+    orario_uscita: str
+    tempo_lavorativo: int
+
+
+class TimbraturaInserita(BaseModel):
+    message: str
+    timbratura: TimbraturaRiga
+    modifica: Optional[bool] = None
+
+
+class EsitoTimbratura(BaseModel):
+    indice: int
+    esito: str
+    id: Optional[int] = None
+    errore: Optional[str] = None
+
+
+class TimbratureBulkResponse(BaseModel):
+    message: str
+    inserite: int
+    aggiornate: int
+    scartate: int
+    risultati: List[EsitoTimbratura]
+
+
+class LavoroGiorno(BaseModel):
+    id: int
+    cliente: str
+    contratto: float
+    saldato: float
+    commessa: str
+    saldo: str
+    extra_consegna: Optional[float] = None
+
+
+class LavoroRiga(LavoroGiorno):
+    data: str
+
+
+class SuggerimentoCliente(BaseModel):
+    cliente: str
+    lavori: int
+
+
+class LavoroInserito(BaseModel):
+    message: str
+    lavoro: LavoroRiga
+
+
+class ScartoImport(BaseModel):
+    riga: int
+    errore: str
+
+
+class ImportLavoriResponse(BaseModel):
+    message: str
+    importati: int
+    scartati: int
+    dettaglio_scarti: List[ScartoImport]
+
+
+class Totali(BaseModel):
+    numero_lavori: int
+    contratto: float
+    saldato: float
+    saldato_complessivo: float
+    percentuale_trasporto: float
+    extra_su_consegne: float
+    totale_lordo: float
+    contanti: float
+    assegni: float
+    bonifico: float
+    finanziamento: float
+    negozio: float
+    sospeso: float
+
+
+class AttivitaResponse(BaseModel):
+    # Le righe dipendono dalla proiezione richiesta con fields=
+    lavori: Optional[List[Dict[str, Any]]] = None
+    totali: Totali
+    next_cursor: Optional[str] = None
+
+
+class TotaliTimbrature(BaseModel):
+    giorni: int
+    tempo_lavorativo: int
+
+
+class TimbraturePagina(BaseModel):
+    timbrature: List[Dict[str, Any]]
+    totali: TotaliTimbrature
+    next_cursor: Optional[str] = None
+
+
+TimbratureUtenteResponse = Union[TimbraturePagina, List[Dict[str, Any]]]
+
+
+class OreUtente(BaseModel):
+    id_utente: int
+    full_name: str
+    giorni: int
+    tempo_lavorativo: int
+    ore: float
+
+
+class SerieGiorno(BaseModel):
+    data: str
+    lavori: int
+    contratto: float
+    saldato: float
+    tempo_lavorativo: int
+    ore: float
+
+
+class DashboardSummary(BaseModel):
+    data_da: str
+    data_a: str
+    ore_utenti: List[OreUtente]
+    totali: Totali
+    commesse: Dict[str, Totali]
+    per_giorno: List[SerieGiorno]
+
+
+class RiepilogoOreMese(BaseModel):
+    anno: int
+    mese: int
+    id_utente: int
+    giorni: int
+    tempo_lavorativo: int
+    ore: float
+
+
+class RiepilogoLavoroMese(BaseModel):
+    anno: int
+    mese: int
+    commessa: str
+    saldo: str
+    numero: int
+    contratto: float
+    saldato: float
+    extra_consegna: float
+
+
+class ErroreBatch(BaseModel):
+    file: Optional[str] = None
+    errore: str
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    anno: int
+    mese: int
+    stato: str
+    totale: int
+    completati: int
+    errori: List[ErroreBatch]
+    creato: str
+
+
+class SyncChanges(BaseModel):
+    versione: int
+    altre: bool
+    modifiche: Dict[str, List[Dict[str, Any]]]
+    eliminati: Dict[str, List[int]]
+
+
+class EsitoSync(BaseModel):
+    indice: int
+    tabella: str
+    esito: str
+    id: Optional[int] = None
+    rif: Optional[str] = None
+
+
+class SyncPushResponse(BaseModel):
+    versione: int
+    risultati: List[EsitoSync]
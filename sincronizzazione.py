@@ -0,0 +1,96 @@
+from sqlalchemy import false, func, insert, literal, select
+from sqlalchemy.orm import Session
+from models import Lavoro, Modifica, Timbratura, User
+
+# 🔹 Registro delle modifiche per la sincronizzazione incrementale della PWA.
+# Ogni scrittura su users, timbrature e lavoro aggiunge una riga a "modifiche" nella stessa
+# transazione (come riepiloghi e versioni): GET /sync/changes?since=<versione> restituisce
+# solo le righe cambiate dopo quella versione e le cancellazioni (tombstone).
+
+TABELLE = {"users": User, "timbrature": Timbratura, "lavoro": Lavoro}
+
+# Voci del registro lette per ogni risposta di /sync/changes (il client continua con "versione")
+MAX_MODIFICHE = 5000
+
+# Id per singola query IN (limite di variabili di SQLite)
+BLOCCO_ID = 500
+
+
+def registra_modifica(db: Session, tabella: str, id_riga: int, eliminata: bool = False):
+    db.execute(insert(Modifica).values(tabella=tabella, id_riga=id_riga, eliminata=eliminata))
+
+
+def registra_modifiche(db: Session, tabella: str, id_righe, eliminata: bool = False):
+    valori = [{"tabella": tabella, "id_riga": id_riga, "eliminata": eliminata} for id_riga in id_righe]
+    if valori:
+        db.execute(insert(Modifica), valori)
+
+
+def ultimo_id(db: Session, modello) -> int:
+    """ Id più alto della tabella, da passare a registra_nuove_righe prima di un inserimento in blocco """
+    return db.query(func.max(modello.id)).scalar() or 0
+
+
+def registra_nuove_righe(db: Session, modello, dopo_id: int):
+    """
+    Registra le righe inserite in blocco (executemany, senza id restituiti): sono quelle
+    con id maggiore di dopo_id, letto nella stessa transazione di scrittura.
+    """
+    db.execute(insert(Modifica).from_select(
+        ["tabella", "id_riga", "eliminata"],
+        select(literal(modello.__tablename__), modello.id, false()).where(modello.id > dopo_id).order_by(modello.id)
+    ))
+
+
+def versione_corrente(db: Session) -> int:
+    return db.query(func.max(Modifica.id)).scalar() or 0
+
+
+def modifiche_da(db: Session, since: int, limit: int = MAX_MODIFICHE):
+    """
+    Modifiche successive alla versione since, al massimo limit voci del registro.
+    Restituisce (versione, altre, righe, eliminati): righe e eliminati sono dict tabella -> lista;
+    più modifiche della stessa riga vengono ridotte all'ultima. Se altre è True il client
+    richiama con since=versione.
+    """
+    voci = db.query(Modifica.id, Modifica.tabella, Modifica.id_riga, Modifica.eliminata).filter(
+        Modifica.id > since
+    ).order_by(Modifica.id).limit(limit + 1).all()
+
+    altre = len(voci) > limit
+    voci = voci[:limit]
+    versione = voci[-1].id if voci else since
+
+    ultime = {}  # (tabella, id_riga) -> eliminata
+    for voce in voci:
+        ultime[(voce.tabella, voce.id_riga)] = voce.eliminata
+
+    righe = {tabella: [] for tabella in TABELLE}
+    eliminati = {tabella: [] for tabella in TABELLE}
+    da_leggere = {tabella: [] for tabella in TABELLE}
+    for (tabella, id_riga), eliminata in ultime.items():
+        if tabella not in TABELLE:
+            continue
+        (eliminati if eliminata else da_leggere)[tabella].append(id_riga)
+
+    for tabella, id_righe in da_leggere.items():
+        modello = TABELLE[tabella]
+        colonne = list(modello.__table__.columns)
+        for i in range(0, len(id_righe), BLOCCO_ID):
+            # Una riga assente è stata cancellata dopo questa pagina: il tombstone arriva più avanti
+            righe[tabella].extend(
+                db.query(*colonne).filter(modello.id.in_(id_righe[i:i + BLOCCO_ID])).order_by(modello.id)
+            )
+
+    return versione, altre, righe, eliminati
+
+
+def inizializza(db: Session):
+    """ Al primo avvio con dati già presenti registra tutte le righe esistenti come modificate """
+    if db.query(Modifica.id).first():
+        return
+    if not any(db.query(modello.id).first() for modello in TABELLE.values()):
+        return
+    for modello in TABELLE.values():
+        registra_nuove_righe(db, modello, 0)
+    db.commit()
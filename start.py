@@ -1,8 +1,9 @@
 import webbrowser
 import subprocess
-import time
 import os
 import sys
+import config
+from avvio import attendi_server
 
 # Determina il percorso del progetto e del database
 project_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,29 +19,21 @@ if not os.path.exists(database_path):
 
 # Avvia il backend FastAPI
 backend_process = subprocess.Popen(
-    [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "8000"],
+    [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", config.HOST,
+        "--port", str(config.PORT),
+        "--workers", str(config.WORKERS),
+        "--timeout-graceful-shutdown", str(config.GRACEFUL_TIMEOUT)
+    ],
     cwd=project_dir,
     stdout=subprocess.DEVNULL,  # ✅ Evita che i log blocchino l'esecuzione
     stderr=subprocess.DEVNULL
 )
 
-# Attendi che il server FastAPI sia pronto
-time.sleep(3)  # 🔴 Potrebbe servire più tempo su alcuni PC
-
-# ✅ Controlla se il server è attivo prima di aprire la pagina
-import socket
-def is_server_running(host="127.0.0.1", port=8000):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        return sock.connect_ex((host, port)) == 0
-
-# Attendi fino a che il server non è pronto
-max_attempts = 2
-attempts = 0
-while attempts < max_attempts:
-    if is_server_running():
-        break
-    attempts += 1
-    time.sleep(1)  # Attendi prima di riprovare
+# ✅ Attendi che /health risponda (attese crescenti, nessun tempo fisso)
+if not attendi_server(in_esecuzione=lambda: backend_process.poll() is None):
+    print("❌ Errore: il server non risponde su /health.")
 
 # Apri automaticamente la pagina web
 frontend_path = os.path.join(project_dir, "index.html")
@@ -54,4 +47,9 @@ else:
 try:
     backend_process.wait()
 except KeyboardInterrupt:
+    # SIGTERM: uvicorn completa le richieste in corso prima di uscire
     backend_process.terminate()
+    try:
+        backend_process.wait(timeout=config.GRACEFUL_TIMEOUT + 5)
+    except subprocess.TimeoutExpired:
+        backend_process.kill()
@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('index.html', '.'), ('dashboard.html', '.'), ('esportazione.html', '.'), ('timbrature.html', '.'), ('lavoro.html', '.'), ('static', 'static')],
-    hiddenimports=[],
+    # Letture async (MONTARREDA_DB_ASYNC): il driver è scelto dall'URL, PyInstaller non lo vede
+    hiddenimports=['aiosqlite', 'greenlet', 'sqlalchemy.dialects.sqlite.aiosqlite'],
     hookspath=['hooks'],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,4 +1,14 @@
 // API Layer - Replaces FastAPI endpoints with JavaScript functions
+
+// Indirizzo del backend: le pagine aperte come file (app_launcher.py) non hanno un'origine HTTP.
+// Il launcher lo passa con ?server=http://HOST:PORT e viene ricordato per le altre pagine.
+const SERVER_URL = (() => {
+    if (location.protocol === 'http:' || location.protocol === 'https:') return location.origin;
+    const indicato = new URLSearchParams(location.search).get('server');
+    if (indicato) localStorage.setItem('serverUrl', indicato);
+    return localStorage.getItem('serverUrl') || 'http://127.0.0.1:8000';
+})();
+
 const API = {
     // ==================== AUTHENTICATION ====================
     
@@ -63,6 +73,20 @@ const API = {
         }
     },
 
+    async suggerisciClienti(testo, limit = 10) {
+        // Suggerimenti dal server (indice FTS5, /lavoro/autocomplete); offline dai lavori locali
+        try {
+            const response = await fetch(`${SERVER_URL}/lavoro/autocomplete?q=${encodeURIComponent(testo)}&limit=${limit}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return (await response.json()).map(s => s.cliente);
+        } catch (error) {
+            const cercato = testo.toLowerCase();
+            const lavori = await DB.getAll('lavori');
+            const clienti = lavori.map(l => l.cliente).filter(c => c && c.toLowerCase().startsWith(cercato));
+            return [...new Set(clienti)].slice(0, limit);
+        }
+    },
+
     // ==================== ESPORTAZIONE ====================
     
     async getAttivita(filters) {
@@ -50,6 +50,12 @@ self.addEventListener('activate', (event) => {
 
 // Gestione delle richieste - Cache First strategy
 self.addEventListener('fetch', (event) => {
+  // Ricerca e completamento clienti: sempre dal server, mai dalla cache
+  const percorso = new URL(event.request.url).pathname;
+  if (percorso === '/lavoro/search' || percorso === '/lavoro/autocomplete') {
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then((cachedResponse) => {
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Database, archivi ed esportazioni dei test in una cartella temporanea: le variabili vanno
+# impostate prima che config.py e database.py vengano importati dai moduli di test
+_cartella = tempfile.mkdtemp(prefix="montarreda_test_")
+os.environ["MONTARREDA_DATABASE_PATH"] = os.path.join(_cartella, "database.db")
+os.environ["MONTARREDA_ARCHIVIO_DIR"] = os.path.join(_cartella, "archivi")
+os.environ["MONTARREDA_ESPORTAZIONI_DIR"] = os.path.join(_cartella, "esportazioni")
+os.makedirs(os.environ["MONTARREDA_ARCHIVIO_DIR"])
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
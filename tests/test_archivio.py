@@ -0,0 +1,135 @@
+import os
+import sqlite3
+from datetime import date, time
+import pytest
+from sqlalchemy import event
+import archivio
+from archivio import TroppiArchivi, archivia, percorso_archivio, periodi_storici, sessione_storica
+from database import DATABASE_PATH, SessionLocal, SessionScrittura, engine, init_db
+from models import Lavoro, Timbratura, User
+
+
+@pytest.fixture
+def database():
+    init_db()
+    with SessionScrittura() as db:
+        for modello in (Timbratura, Lavoro, User):
+            db.query(modello).delete()
+        db.commit()
+    yield
+    for nome in os.listdir(archivio.CARTELLA):
+        os.remove(os.path.join(archivio.CARTELLA, nome))
+
+
+def lavoro(giorno: date, cliente: str = "Rossi"):
+    return Lavoro(
+        data=giorno, cliente=cliente, contratto=100.0, saldato=50.0,
+        commessa="MOV", saldo="Sospeso", extra_consegna=0.0
+    )
+
+
+def popola(anno: int):
+    """ Timbrature e lavori dell'anno, più un lavoro recente (l'ultimo id non può essere archiviato) """
+    with SessionScrittura() as db:
+        utente = User(full_name="Mario Rossi")
+        db.add(utente)
+        db.flush()
+        for mese in (1, 6, 12):
+            giorno = date(anno, mese, 10)
+            db.add(Timbratura(
+                id_utente=utente.id, data=giorno, orario_ingresso=time(8, 0), orario_uscita=time(17, 0),
+                tempo_lavorativo=540
+            ))
+            db.add(lavoro(giorno))
+        db.flush()
+        db.add(Timbratura(
+            id_utente=utente.id, data=date(anno + 5, 1, 10), orario_ingresso=time(8, 0),
+            orario_uscita=time(17, 0), tempo_lavorativo=540
+        ))
+        db.add(lavoro(date(anno + 5, 1, 10)))
+        db.commit()
+
+
+def conta(modello, anno: int):
+    with SessionLocal() as sessione, sessione_storica(sessione, date(anno, 1, 1), date(anno, 12, 31)) as db:
+        return db.query(modello).filter(modello.data >= date(anno, 1, 1), modello.data <= date(anno, 12, 31)).count()
+
+
+def test_archivia_sposta_le_righe_una_volta(database):
+    popola(2015)
+
+    assert archivia(2015) == {"timbrature": 3, "lavoro": 3}
+
+    assert os.path.exists(percorso_archivio(2015))
+    assert not os.path.exists(percorso_archivio(2015) + ".tmp")
+    with SessionLocal() as db:
+        assert db.query(Lavoro).filter(Lavoro.data < date(2016, 1, 1)).count() == 0
+    assert conta(Timbratura, 2015) == 3
+    assert conta(Lavoro, 2015) == 3
+
+
+def test_scritture_bloccate_fra_copia_e_cancellazione(database):
+    """ Copia e cancellazione sono nella stessa transazione: nessun inserimento può cadere fra le due """
+    popola(2016)
+    tentativi = []
+
+    def inserisci_durante_la_copia(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT OR REPLACE INTO archivio."):
+            concorrente = sqlite3.connect(DATABASE_PATH, timeout=0.1)
+            try:
+                concorrente.execute(
+                    "INSERT INTO lavoro (data, cliente, contratto, saldato, commessa, saldo) "
+                    "VALUES ('2016-03-01', 'Bianchi', 1, 1, 'MOV', 'Sospeso')"
+                )
+                concorrente.commit()
+                tentativi.append("inserito")
+            except sqlite3.OperationalError as e:
+                tentativi.append(str(e))
+            finally:
+                concorrente.close()
+
+    event.listen(engine, "after_cursor_execute", inserisci_durante_la_copia)
+    try:
+        archivia(2016)
+    finally:
+        event.remove(engine, "after_cursor_execute", inserisci_durante_la_copia)
+
+    assert tentativi and all("locked" in esito for esito in tentativi)
+    assert conta(Lavoro, 2016) == 3
+
+
+def test_archivia_interrotto_prima_della_pubblicazione(database, monkeypatch):
+    """ Il file viene pubblicato solo dopo il commit; una nuova esecuzione riprende il file temporaneo """
+    popola(2017)
+
+    def interruzione(*args):
+        raise OSError("interrotto")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(archivio.os, "replace", interruzione)
+        with pytest.raises(OSError):
+            archivia(2017)
+
+    assert not os.path.exists(percorso_archivio(2017))
+    assert os.path.exists(percorso_archivio(2017) + ".tmp")
+
+    assert archivia(2017) == {"timbrature": 0, "lavoro": 0}
+    assert not os.path.exists(percorso_archivio(2017) + ".tmp")
+    assert conta(Timbratura, 2017) == 3
+    assert conta(Lavoro, 2017) == 3
+
+
+def test_periodi_storici_rispettano_il_limite_di_attach(monkeypatch):
+    monkeypatch.setattr(archivio, "MAX_ARCHIVI", 2)
+    monkeypatch.setattr(archivio, "anni_archiviati", lambda: [2010, 2011, 2012, 2013, 2014])
+
+    assert periodi_storici(date.min, date.max) == [
+        (date.min, date(2011, 12, 31)),
+        (date(2012, 1, 1), date(2013, 12, 31)),
+        (date(2014, 1, 1), date.max),
+    ]
+    assert periodi_storici(date(2012, 5, 1), date(2013, 5, 1)) == [(date(2012, 5, 1), date(2013, 5, 1))]
+
+    with SessionLocal() as db, pytest.raises(TroppiArchivi):
+        with sessione_storica(db, date(2010, 1, 1), date(2012, 12, 31)):
+            pass
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+from datetime import date, time
+import pytest
+from database import SessionScrittura, init_db
+from esportazione_dati import stream_attivita, stream_timbrature
+from models import Lavoro, Timbratura, User
+
+GIORNO = date(2031, 3, 14)
+
+
+@pytest.fixture
+def dati():
+    init_db()
+    with SessionScrittura() as db:
+        utente = User(full_name="Anna Verdi")
+        db.add(utente)
+        db.flush()
+        lavoro = Lavoro(
+            data=GIORNO, cliente="Bianchi", contratto=1200.0, saldato=300.5,
+            commessa="MOV", saldo="Pagato in negozio", extra_consegna=25.0
+        )
+        timbratura = Timbratura(
+            id_utente=utente.id, data=GIORNO, orario_ingresso=time(8, 0), orario_uscita=time(16, 30),
+            tempo_lavorativo=510
+        )
+        db.add_all([lavoro, timbratura])
+        db.commit()
+        righe = [lavoro, timbratura, utente]
+    yield
+    with SessionScrittura() as db:
+        for riga in righe:
+            db.delete(db.merge(riga))
+        db.commit()
+
+
+def test_ndjson_attivita_usa_i_campi_del_modello(dati):
+    record, totali = [json.loads(riga) for riga in "".join(stream_attivita("ndjson", GIORNO, GIORNO)).splitlines()]
+
+    assert record == {
+        "commessa": "MOV",
+        "data": "2031-03-14",
+        "cliente": "Bianchi",
+        "saldo": "Pagato in negozio",
+        "contratto": 1200.0,
+        "saldato": 300.5,
+        "extra_consegna": 25.0,
+    }
+    assert totali["totali"]["numero_lavori"] == 1
+
+
+def test_csv_attivita_mantiene_le_intestazioni_dei_report(dati):
+    righe = list(csv.reader(io.StringIO("".join(stream_attivita("csv", GIORNO, GIORNO)))))
+
+    assert righe[0] == ["Commessa", "Data", "Cliente", "Pagamento", "Contratto", "Saldo", "Extra"]
+    assert righe[1] == ["MOV", "2031-03-14", "Bianchi", "Pagato in negozio", "1200.00", "300.50", "25.00"]
+
+
+def test_ndjson_timbrature(dati):
+    testo = "".join(stream_timbrature("ndjson", GIORNO, date(2031, 3, 15)))
+    record = json.loads(testo.splitlines()[0])
+
+    assert record == {
+        "utente": "Anna Verdi",
+        "data": "2031-03-14",
+        "orario_ingresso": "08:00:00",
+        "orario_uscita": "16:30:00",
+        "ore_lavorate": 8.5,
+    }
@@ -0,0 +1,69 @@
+import os
+import sys
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Base
+from queries import lista_lavori, lista_timbrature_mese, totali_lavori, totali_timbrature_mese
+
+# Le query mensili di /timbrature ed /esportazione/timbrature e quelle di /attivita
+# devono usare gli indici compositi di models.py (EXPLAIN QUERY PLAN)
+INDICI_TIMBRATURE = ("uq_timbrature_utente_data", "ix_timbrature_utente_data")
+INDICE_LAVORO = "ix_lavoro_data_commessa"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indici.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def piani(engine, lettura):
+    """ Esegue lettura(db) e restituisce il piano di ogni query SELECT emessa """
+    istruzioni = []
+
+    def registra(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            istruzioni.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", registra)
+    try:
+        with Session(engine) as db:
+            lettura(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", registra)
+
+    with engine.connect() as conn:
+        return [
+            " ".join(riga[-1] for riga in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in istruzioni
+        ]
+
+
+def test_timbrature_mese_usa_indice_utente_data(engine):
+    risultati = piani(engine, lambda db: (
+        lista_timbrature_mese(db, 1, 2024, 5),
+        totali_timbrature_mese(db, 1, 2024, 5),
+    ))
+
+    assert len(risultati) == 2
+    for piano in risultati:
+        assert any(indice in piano for indice in INDICI_TIMBRATURE), piano
+
+
+@pytest.mark.parametrize("commessa", [None, "MOV"])
+def test_attivita_usa_indice_data_commessa(engine, commessa):
+    risultati = piani(engine, lambda db: (
+        lista_lavori(db, date(2024, 1, 1), date(2024, 12, 31), commessa),
+        totali_lavori(db, date(2024, 1, 1), date(2024, 12, 31), commessa),
+    ))
+
+    assert len(risultati) == 2
+    for piano in risultati:
+        assert INDICE_LAVORO in piano, piano
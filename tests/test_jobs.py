@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from models import EsportazioneBatch
+from jobs import MAX_SILENZIO, as_dict, nome_file
+
+
+def test_nome_file_senza_percorsi():
+    assert nome_file("../../etc/passwd") == "______etc_passwd"
+    assert nome_file("MOV") == "MOV"
+    assert nome_file("OLIE-2024_b") == "OLIE-2024_b"
+    assert "/" not in nome_file("a/b\\c")
+
+
+def job(stato: str, silenzio: float):
+    adesso = datetime.now()
+    return EsportazioneBatch(
+        id="abc", anno=2024, mese=5, stato=stato, totale=3, completati=1, errori="[]",
+        creato=adesso - timedelta(seconds=silenzio), aggiornato=adesso - timedelta(seconds=silenzio)
+    )
+
+
+def test_job_senza_segnali_risulta_fallito():
+    descrizione = as_dict(job("in_corso", MAX_SILENZIO + 1))
+    assert descrizione["stato"] == "errore"
+    assert descrizione["errori"][0]["file"] is None
+
+
+def test_job_attivo_o_concluso_non_cambia():
+    assert as_dict(job("in_corso", 1))["stato"] == "in_corso"
+    assert as_dict(job("completato", MAX_SILENZIO + 1))["stato"] == "completato"
@@ -0,0 +1,18 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+client = TestClient(main.app)
+
+
+@pytest.mark.parametrize("percorso", ["/esportazione/timbrature", "/esporta/timbrature"])
+@pytest.mark.parametrize("mese", [0, 13])
+def test_mese_fuori_intervallo(percorso, mese):
+    risposta = client.get(percorso, params={"utente": 1, "mese": mese, "anno": 2024})
+    assert risposta.status_code == 422
+
+
+def test_mese_valido_senza_timbrature():
+    risposta = client.get("/esportazione/timbrature", params={"utente": 1, "mese": 12, "anno": 2024})
+    assert risposta.status_code == 200
+    assert risposta.json() == []
@@ -0,0 +1,45 @@
+from datetime import date
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import VersioneDati
+
+
+def chiave_mese(tabella: str, giorno: date) -> str:
+    """ Chiave di versione per i dati di una tabella in un mese, es. "lavoro:2024-05" """
+    return f"{tabella}:{giorno.year}-{giorno.month:02d}"
+
+
+def chiavi_intervallo(tabella: str, data_da: date, data_a: date):
+    """ Chiavi di versione di tutti i mesi coperti dall'intervallo [data_da, data_a] """
+    chiavi = []
+    anno, mese = data_da.year, data_da.month
+    while (anno, mese) <= (data_a.year, data_a.month):
+        chiavi.append(f"{tabella}:{anno}-{mese:02d}")
+        anno, mese = (anno + 1, 1) if mese == 12 else (anno, mese + 1)
+    return chiavi
+
+
+def incrementa_versione(db: Session, *chiavi: str):
+    """
+    Incrementa le versioni indicate nella transazione corrente:
+    il commit della scrittura e quello della versione coincidono.
+    Per le chiavi mensili ("lavoro:2024-05") viene incrementata anche la versione
+    dell'intera tabella ("lavoro").
+    """
+    tabelle = {chiave.split(":", 1)[0] for chiave in chiavi}
+    for chiave in set(chiavi) | tabelle:
+        stmt = insert(VersioneDati).values(chiave=chiave, versione=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VersioneDati.chiave],
+            set_={"versione": VersioneDati.versione + 1}
+        )
+        db.execute(stmt)
+
+
+def leggi_versioni(db: Session, chiavi) -> dict:
+    """ Versioni correnti delle chiavi richieste (0 se mai modificate) """
+    chiavi = list(chiavi)
+    righe = db.query(VersioneDati.chiave, VersioneDati.versione).filter(VersioneDati.chiave.in_(chiavi)).all()
+    versioni = dict.fromkeys(chiavi, 0)
+    versioni.update(righe)
+    return versioni